@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""Throughput and resync benchmark for the serial stream parsers in tools/.
+
+Generates a stream mixing valid AB CD command packets, F4HWN screenshot
+frames (FF AA 55 02 <len> <9-byte chunks> 0A), truncated command packets and
+random noise at given ratios, feeds it to every parser in chunks the size of
+a serial read, and reports:
+
+- packets/s    recovered packets per second of parser time
+- recovered    command packets (or screen frames) recovered / sent
+- spurious     packets returned that were never sent
+- worst call   longest single parser call, ms
+- worst delay  most bytes fed after a packet's last byte before it came out
+
+Parsers:
+- msg.fetch                   serialtool, looped while the buffer shrinks
+- msg.fetch (single)          one fetch per read, as _button.MsgReceiver does
+- Link._demux                  qtviewer (k5stream.py), command packets
+- Link._demux (screen)         the same pass, screen frames
+
+--fuzz runs many short streams with random ratios and reports exceptions.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(_HERE, "..", "serialtool"))
+sys.path.insert(0, os.path.join(_HERE, "..", "qtviewer"))
+
+import msg as mm  # noqa: E402
+import k5stream as ks  # noqa: E402
+
+KIND_CMD = "cmd"
+KIND_SCREEN = "screen"
+KIND_TRUNC = "trunc"
+KIND_NOISE = "noise"
+
+
+@dataclass
+class Stream:
+    data: bytes
+    # (end offset, msg type, payload) of each valid command packet
+    packets: list[tuple[int, int, bytes]] = field(default_factory=list)
+    # (end offset, chunk count) of each screen frame
+    frames: list[tuple[int, int]] = field(default_factory=list)
+
+
+@dataclass
+class Result:
+    name: str
+    sent: int = 0
+    recovered: int = 0
+    spurious: int = 0
+    elapsed: float = 0.0
+    worst_call: float = 0.0
+    worst_delay: int = 0
+    error: str | None = None
+
+
+def cmd_packet(rnd: random.Random) -> tuple[int, bytes, bytes]:
+    msg_type = rnd.choice((0x0515, 0x051C, 0x051E, 0x0528, 0x0611, rnd.randrange(0x10000)))
+    payload = rnd.randbytes(rnd.randrange(0, 64) * 2)
+    msg = mm.Msg.make(msg_type, len(payload))
+    msg.buf[4:] = payload
+    return msg_type, payload, bytes(mm.make_packet(msg.buf))
+
+
+def screen_frame(rnd: random.Random) -> tuple[int, bytes]:
+    count = 128 if rnd.random() < 0.1 else rnd.randrange(1, 24)
+    chunks = sorted(rnd.sample(range(128), count))
+    body = b"".join(bytes([c]) + rnd.randbytes(8) for c in chunks)
+    size = len(body)
+    return count, b"\xFF\xAA\x55\x02" + bytes([size >> 8, size & 0xFF]) + body + b"\x0A"
+
+
+def noise(rnd: random.Random) -> bytes:
+    data = bytearray(rnd.randbytes(rnd.randrange(1, 64)))
+    # Sprinkle in framing bytes, the worst case for resync
+    for _ in range(rnd.randrange(0, 4)):
+        i = rnd.randrange(len(data))
+        data[i : i + 2] = rnd.choice((b"\xAB\xCD", b"\xAA\x55", b"\xDC\xBA"))
+    return bytes(data)
+
+
+def make_stream(count: int, ratios: dict[str, float], seed: int) -> Stream:
+    rnd = random.Random(seed)
+    kinds = list(ratios)
+    weights = [ratios[k] for k in kinds]
+
+    out = bytearray()
+    stream = Stream(b"")
+    for _ in range(count):
+        kind = rnd.choices(kinds, weights)[0]
+        if kind == KIND_CMD:
+            msg_type, payload, packet = cmd_packet(rnd)
+            out += packet
+            stream.packets.append((len(out), msg_type, payload))
+        elif kind == KIND_SCREEN:
+            chunks, frame = screen_frame(rnd)
+            out += frame
+            stream.frames.append((len(out), chunks))
+        elif kind == KIND_TRUNC:
+            _, _, packet = cmd_packet(rnd)
+            out += packet[: rnd.randrange(1, len(packet) - 1)]
+        else:
+            out += noise(rnd)
+
+    stream.data = bytes(out)
+    return stream
+
+
+# ------------------
+#  Parser adapters: feed(buf) -> list of (msg type, payload) / chunk counts
+
+
+def fetch_loop() -> tuple[bytearray, object]:
+    buf = bytearray()
+
+    def parse() -> list:
+        out = []
+        while True:
+            len1 = len(buf)
+            msg = mm.fetch(buf)
+            if msg:
+                out.append((msg.get_msg_type(), bytes(msg.buf[4 : 4 + msg.get_data_len()])))
+            elif len(buf) == len1:
+                return out
+
+    return buf, parse
+
+
+def fetch_single() -> tuple[bytearray, object]:
+    buf = bytearray()
+
+    def parse() -> list:
+        msg = mm.fetch(buf)
+        if msg:
+            return [(msg.get_msg_type(), bytes(msg.buf[4 : 4 + msg.get_data_len()]))]
+        return []
+
+    return buf, parse
+
+
+def viewer_cmd() -> tuple[bytearray, object]:
+    link = ks.Link(None)
+    out = []
+    link._on_packet = lambda msg_type, payload: out.append((msg_type, payload))
+
+    def parse() -> list:
+        link._demux()
+        got = out[:]
+        out.clear()
+        return got
+
+    return link._buffer, parse
+
+
+def viewer_screen() -> tuple[bytearray, object]:
+    link = ks.Link(None)
+
+    def parse() -> list:
+        return [None] * link._demux()
+
+    return link._buffer, parse
+
+
+def parsers() -> list[tuple[str, object, bool]]:
+    """(name, adapter factory, parses screen frames)"""
+    items = [
+        ("msg.fetch", fetch_loop, False),
+        ("msg.fetch (single)", fetch_single, False),
+    ]
+    items.append(("Link._demux", viewer_cmd, False))
+    items.append(("Link._demux (screen)", viewer_screen, True))
+    return items
+
+
+def run(name: str, factory, screen: bool, stream: Stream, chunk: int) -> Result:
+    res = Result(name)
+    expected = stream.frames if screen else stream.packets
+    res.sent = len(expected)
+
+    buf, parse = factory()
+    data = stream.data
+    next_i = 0  # Next expected packet
+    with memoryview(data) as view:
+        for pos in range(0, len(data), chunk):
+            end = min(pos + chunk, len(data))
+            buf.extend(view[pos:end])
+
+            t0 = time.perf_counter()
+            try:
+                got = parse()
+            except Exception as exc:  # noqa: BLE001
+                res.error = f"{type(exc).__name__}: {exc} at offset {pos}"
+                return res
+            dt = time.perf_counter() - t0
+            res.elapsed += dt
+            res.worst_call = max(res.worst_call, dt)
+
+            for item in got:
+                # Screen parser reports frames only, match by order
+                if screen:
+                    match = next_i if next_i < len(expected) and expected[next_i][0] <= end else None
+                else:
+                    match = None
+                    for i in range(next_i, len(expected)):
+                        if expected[i][0] > end:
+                            break
+                        if (expected[i][1], expected[i][2]) == item:
+                            match = i
+                            break
+                if match is None:
+                    res.spurious += 1
+                    continue
+                res.recovered += 1
+                res.worst_delay = max(res.worst_delay, end - expected[match][0])
+                next_i = match + 1
+
+    return res
+
+
+def report(results: list[Result], stream: Stream) -> None:
+    print(f"Stream: {len(stream.data)} bytes, {len(stream.packets)} packets, {len(stream.frames)} screen frames")
+    print(f"{'parser':36} {'packets/s':>10} {'recovered':>10} {'spurious':>9} {'worst call':>11} {'worst delay':>12}")
+    for res in results:
+        if res.error:
+            print(f"{res.name:36} ERROR {res.error}")
+            continue
+        rate = res.recovered / res.elapsed if res.elapsed else 0.0
+        ratio = res.recovered / res.sent if res.sent else 1.0
+        print(
+            f"{res.name:36} {rate:10.0f} {ratio:10.1%} {res.spurious:9} "
+            f"{res.worst_call * 1000:9.2f}ms {res.worst_delay:10}B"
+        )
+
+
+def fuzz(rounds: int, chunk: int, seed: int) -> int:
+    rnd = random.Random(seed)
+    failures = 0
+    for n in range(rounds):
+        ratios = {k: rnd.random() for k in (KIND_CMD, KIND_SCREEN, KIND_TRUNC, KIND_NOISE)}
+        stream = make_stream(rnd.randrange(1, 200), ratios, rnd.randrange(1 << 30))
+        for name, factory, screen in parsers():
+            res = run(name, factory, screen, stream, rnd.randrange(1, chunk + 1))
+            if res.error:
+                failures += 1
+                print(f"round {n}: {name}: {res.error}")
+    print(f"{rounds} rounds, {failures} failures")
+    return 1 if failures else 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Serial stream parser benchmark")
+    ap.add_argument("--count", type=int, default=5000, help="stream items")
+    ap.add_argument("--cmd", type=float, default=1.0, help="ratio of valid command packets")
+    ap.add_argument("--screen", type=float, default=1.0, help="ratio of screen frames")
+    ap.add_argument("--trunc", type=float, default=0.2, help="ratio of truncated packets")
+    ap.add_argument("--noise", type=float, default=0.5, help="ratio of noise bursts")
+    ap.add_argument("--chunk", type=int, default=256, help="bytes fed per parser call")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--fuzz", type=int, metavar="ROUNDS", help="fuzz instead of benchmark")
+    args = ap.parse_args()
+
+    if args.fuzz:
+        return fuzz(args.fuzz, args.chunk, args.seed)
+
+    ratios = {
+        KIND_CMD: args.cmd,
+        KIND_SCREEN: args.screen,
+        KIND_TRUNC: args.trunc,
+        KIND_NOISE: args.noise,
+    }
+    stream = make_stream(args.count, ratios, args.seed)
+    results = [run(name, factory, screen, stream, args.chunk) for name, factory, screen in parsers()]
+    report(results, stream)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,16 +4,22 @@
 Features:
 - Safe parser for screenshot diff frames
 - Keepalive sender (0x55 0xAA 0x00 0x00)
-- Live byte-level TX/RX logging windows
+- Serial I/O and parsing in a worker thread, off the GUI thread
+- Live byte-level TX/RX logging windows (bounded, formatted on display)
 - LCD-like 128x64 screen renderer
 - Remote keypad (button inject over UART command protocol)
+- Several radios at once (--port A B ...), in a grid with shared logs
+- Screen recording (--record, Record button) and replay (--replay)
+- Headless mode (--headless): serves the screen and keypad to browsers
 """
 
 from __future__ import annotations
 
 import argparse
-import datetime as dt
+import math
+import os
 import sys
+import threading
 import time
 from dataclasses import dataclass
 
@@ -21,61 +27,19 @@ from PySide6 import QtCore, QtGui, QtWidgets
 import serial
 from serial.tools import list_ports
 
-WIDTH = 128
-HEIGHT = 64
-FRAME_SIZE = 1024
-KEEPALIVE = b"\x55\xAA\x00\x00"
-HEADER = b"\xAA\x55"
-TYPE_SCREENSHOT = 0x01
-TYPE_DIFF = 0x02
-
-# UART command protocol
-CMD_HEADER = b"\xAB\xCD"
-CMD_FOOTER = b"\xDC\xBA"
-OBFUS_TBL = b"\x16\x6c\x14\xe6\x2e\x91\x0d\x40\x21\x35\xd5\x40\x13\x03\xe9\x80"
-
-MSG_SESSION_INIT = 0x0514
-MSG_SESSION_INFO = 0x0515
-MSG_BUTTON_EVENT = 0x0610
-MSG_BUTTON_ACK = 0x0611
-
-ACTION_PRESS = 0
-ACTION_RELEASE = 1
-
-ACK_STATUS = {
-    0: "accepted",
-    1: "busy",
-    2: "invalid",
-    3: "stale",
-}
+import k5record
+import k5server
+from k5stream import BLOCK_SIZE, BLOCKS_PER_ROW, FRAME_SIZE, FULL_MASK, HEIGHT, ROW_MASK, WIDTH, dirty_runs
+import k5stream
 
-SESSION_TIMEOUT_MS = 500
-SESSION_RETRY_INTERVAL_MS = 300
-BUTTON_ACK_TIMEOUT_MS = 700
-BUTTON_RETRY_LIMIT = 4
-MAX_CMD_MSG_LEN = 256
-MAX_CMD_BUFFER = 8192
-
-KEY_CODES = {
-    "0": 0,
-    "1": 1,
-    "2": 2,
-    "3": 3,
-    "4": 4,
-    "5": 5,
-    "6": 6,
-    "7": 7,
-    "8": 8,
-    "9": 9,
-    "MENU": 10,
-    "UP": 11,
-    "DOWN": 12,
-    "EXIT": 13,
-    "STAR": 14,
-    "F": 15,
-    "SIDE2": 17,
-    "SIDE1": 18,
-}
+# Rows kept per log view; older rows are dropped
+LOG_CAPACITY = 10000
+LOG_FLUSH_MS = 100
+# Log column width: timestamp and tag, then 3 characters per byte
+LOG_COLUMN_CHARS = 32 + 3 * 512
+
+# Screen updates per second when the display rate is unknown
+DEFAULT_REFRESH_HZ = 60.0
 
 
 @dataclass
@@ -84,410 +48,484 @@ class Colors:
     bg: QtGui.QColor
 
 
+THEMES = {
+    "Grey": Colors(QtGui.QColor(0, 0, 0), QtGui.QColor(202, 202, 202)),
+    "Orange": Colors(QtGui.QColor(0, 0, 0), QtGui.QColor(255, 193, 37)),
+    "Blue": Colors(QtGui.QColor(0, 0, 0), QtGui.QColor(28, 134, 228)),
+    "White": Colors(QtGui.QColor(0, 0, 0), QtGui.QColor(255, 255, 255)),
+    "Invert": Colors(QtGui.QColor(202, 202, 202), QtGui.QColor(0, 0, 0)),
+}
+
+# Replay speeds offered, the default first
+REPLAY_SPEEDS = ("1x", "0.25x", "0.5x", "2x", "4x", "8x", "16x", "64x")
+REPLAY_TICK_MS = 16
+# Records applied one by one on a jump ahead; past that, decode from a keyframe
+REPLAY_MAX_STEPS = 500
+
+# Host keyboard -> radio key, for the screen with keyboard focus
+HOST_KEYS = {
+    **{getattr(QtCore.Qt, f"Key_{d}"): str(d) for d in range(10)},
+    QtCore.Qt.Key_Return: "MENU",
+    QtCore.Qt.Key_Enter: "MENU",
+    QtCore.Qt.Key_M: "MENU",
+    QtCore.Qt.Key_Up: "UP",
+    QtCore.Qt.Key_Down: "DOWN",
+    QtCore.Qt.Key_Escape: "EXIT",
+    QtCore.Qt.Key_Backspace: "EXIT",
+    QtCore.Qt.Key_Asterisk: "STAR",
+    QtCore.Qt.Key_F: "F",
+    QtCore.Qt.Key_NumberSign: "F",
+    QtCore.Qt.Key_PageUp: "SIDE1",
+    QtCore.Qt.Key_PageDown: "SIDE2",
+}
+
+
 class ScreenWidget(QtWidgets.QWidget):
+    """128x64 LCD.
+
+    The frame is the panel bit plane as App/screenshot.c sends it: row-major,
+    16 bytes per row, LSB = leftmost pixel. That is QImage.Format_MonoLSB as
+    is, so frames go straight into a 1-bit image whose palette is the theme.
+    A nearest-neighbour scaled copy is cached as a pixmap; only rows of the
+    blocks a diff changed are redrawn into it and repainted.
+    """
+
     def __init__(self, parent: QtWidgets.QWidget | None = None) -> None:
         super().__init__(parent)
-        self._frame = bytearray(FRAME_SIZE)
+        self._image = QtGui.QImage(WIDTH, HEIGHT, QtGui.QImage.Format_MonoLSB)
+        self._image.fill(0)
+        self._cache = QtGui.QPixmap()
         self._scale = 4
         self._colors = Colors(fg=QtGui.QColor(0, 0, 0), bg=QtGui.QColor(202, 202, 202))
         self.setMinimumSize(WIDTH * self._scale, HEIGHT * self._scale)
+        self._rebuild()
 
-    def set_frame(self, frame: bytearray) -> None:
-        if len(frame) == FRAME_SIZE:
-            self._frame[:] = frame
-            self.update()
+    def set_frame(self, frame: bytearray, dirty: int = FULL_MASK) -> None:
+        if len(frame) != FRAME_SIZE or not dirty:
+            return
+        self._image.bits()[:] = frame
+
+        # Pixels are (scale - 1) wide and scale high, as on the radio
+        sx, sy = self._scale - 1, self._scale
+        region = QtGui.QRegion()
+        p = QtGui.QPainter(self._cache)
+        for y0, y1 in _dirty_rows(dirty):
+            rect = QtCore.QRect(0, y0 * sy, WIDTH * sx, (y1 - y0) * sy)
+            p.drawImage(rect, self._image, QtCore.QRect(0, y0, WIDTH, y1 - y0))
+            region += rect
+        p.end()
+        self.update(region)
 
     def set_scale(self, scale: int) -> None:
         self._scale = max(2, min(12, scale))
         self.setMinimumSize(WIDTH * self._scale, HEIGHT * self._scale)
         self.updateGeometry()
-        self.update()
+        self._rebuild()
 
     def set_colors(self, colors: Colors) -> None:
         self._colors = colors
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        self._image.setColorTable([self._colors.bg.rgb(), self._colors.fg.rgb()])
+        scaled = self._image.scaled(
+            WIDTH * (self._scale - 1),
+            HEIGHT * self._scale,
+            QtCore.Qt.IgnoreAspectRatio,
+            QtCore.Qt.FastTransformation,
+        )
+        self._cache = QtGui.QPixmap.fromImage(scaled)
         self.update()
 
     def sizeHint(self) -> QtCore.QSize:
         return QtCore.QSize(WIDTH * self._scale, HEIGHT * self._scale)
 
     def paintEvent(self, event: QtGui.QPaintEvent) -> None:  # noqa: N802
-        del event
         p = QtGui.QPainter(self)
-        p.fillRect(self.rect(), self._colors.bg)
-        p.setPen(QtCore.Qt.NoPen)
-        p.setBrush(self._colors.fg)
-
-        bit_index = 0
-        pixel_w = max(1, self._scale - 1)
-        pixel_h = self._scale
-        for y in range(HEIGHT):
-            py = y * self._scale
-            for x in range(WIDTH):
-                byte_idx = bit_index // 8
-                bit_pos = bit_index % 8
-                if (self._frame[byte_idx] >> bit_pos) & 1:
-                    p.drawRect(x * (self._scale - 1), py, pixel_w, pixel_h)
-                bit_index += 1
+        p.fillRect(event.rect(), self._colors.bg)
+        rect = event.rect().intersected(self._cache.rect())
+        p.drawPixmap(rect, self._cache, rect)
+
+
+def _dirty_rows(mask: int) -> list[tuple[int, int]]:
+    """Runs of screen rows holding the blocks set in mask, as (first, end)"""
+    runs: list[tuple[int, int]] = []
+    first = None
+    for y in range(HEIGHT + 1):
+        if y < HEIGHT and (mask >> (y * BLOCKS_PER_ROW)) & ROW_MASK:
+            if first is None:
+                first = y
+        elif first is not None:
+            runs.append((first, y))
+            first = None
+    return runs
+
+
+class FrameStore:
+    """Two frame buffers shared by the I/O thread and the UI.
+
+    The UI holds one, taken with take(), while the I/O thread publishes into
+    the other. Publishing copies only the blocks that buffer is behind on.
+    A published frame stays put until taken, so nothing is copied or
+    emitted for frames the UI never got around to showing.
+    """
+
+    def __init__(self) -> None:
+        self._frames = [bytearray(FRAME_SIZE), bytearray(FRAME_SIZE)]
+        # Blocks each buffer lacks, changed while the other one was in use
+        self._behind = [0, 0]
+        self._free = 0
+        self._ready: int | None = None
+        self._lock = threading.Lock()
+
+    def publish(self, src: bytearray, dirty: int) -> bool:
+        """I/O thread. False while the previous frame is still not taken"""
+        with self._lock:
+            if self._ready is not None:
+                return False
+            i = self._free
+
+        dst = self._frames[i]
+        for first, end in dirty_runs(dirty | self._behind[i]):
+            dst[first * BLOCK_SIZE : end * BLOCK_SIZE] = src[first * BLOCK_SIZE : end * BLOCK_SIZE]
+
+        with self._lock:
+            self._behind[i] = 0
+            self._behind[1 - i] |= dirty
+            self._ready = dirty
+        return True
+
+    def take(self) -> tuple[bytearray | None, int]:
+        """UI thread. Latest frame and its dirty mask; (None, 0) if none"""
+        with self._lock:
+            dirty, self._ready = self._ready, None
+            if dirty is None:
+                return None, 0
+            i = self._free
+            self._free = 1 - i
+        return self._frames[i], dirty
 
 
 class K5Receiver(QtCore.QObject):
-    frame_ready = QtCore.Signal(bytearray)
+    """Qt side of a k5stream.Link.
+
+    Lives in its own QThread: reads, keepalives and button traffic run there,
+    and results reach the UI through the signals below, which Qt queues
+    across threads. Public methods may be called from the UI thread.
+    """
+
+    # A frame is waiting in `frames`
+    frame_ready = QtCore.Signal()
     status = QtCore.Signal(str)
     rx_log = QtCore.Signal(bytes)
     tx_log = QtCore.Signal(bytes)
     cmd_diag = QtCore.Signal(str)
 
-    def __init__(self, port: str, baud: int = 38400, parent: QtCore.QObject | None = None) -> None:
-        super().__init__(parent)
+    # UI thread -> I/O thread
+    # (action, key name); action is "tap", "press" or "release"
+    _button_requested = QtCore.Signal(str, str)
+    _record_requested = QtCore.Signal(object)
+    _stop_requested = QtCore.Signal()
+
+    def __init__(self, port: str, baud: int = 38400, refresh_hz: float = DEFAULT_REFRESH_HZ) -> None:
+        super().__init__()
         self._serial = serial.Serial(port, baud, timeout=0)
-        self._buffer = bytearray()
-        self._cmd_buffer = bytearray()
-        self._frame = bytearray(FRAME_SIZE)
+        self.link = k5stream.Link(self._serial)
+        self.link.on_status = self.status.emit
+        self.link.on_rx = self.rx_log.emit
+        self.link.on_tx = self.tx_log.emit
+        self.link.on_diag = self.cmd_diag.emit
+
+        # Blocks the link parsed pile up in link.dirty until the next display
+        # interval
+        self.frames = FrameStore()
+        self._frame_interval = 1.0 / max(1.0, refresh_hz)
+        self._next_flush = 0.0
+
+        self._thread = QtCore.QThread()
+        self.moveToThread(self._thread)
+        self._thread.started.connect(self._start_timers)
+        self._button_requested.connect(self._queue_button)
+        self._record_requested.connect(self._set_recorder)
+        self._stop_requested.connect(self._stop, QtCore.Qt.BlockingQueuedConnection)
+
+    def start(self) -> None:
+        self._thread.start()
 
-        self._session_ts: int | None = None
-        self._session_pending = False
-        self._session_deadline_ms = 0
-        self._last_session_attempt_ms = 0
+    def close(self) -> None:
+        if self._thread.isRunning():
+            self._stop_requested.emit()
+            self._thread.quit()
+            self._thread.wait()
+        if self._serial.is_open:
+            self._serial.close()
 
-        self._button_queue: list[tuple[int, int, str, int]] = []
-        self._next_seq = 1
-        self._inflight_seq: int | None = None
-        self._inflight_event: tuple[int, int, str, int] | None = None
-        self._inflight_deadline_ms = 0
+    def queue_button_tap(self, key_name: str) -> None:
+        self._button_requested.emit("tap", key_name)
 
+    def press_button(self, key_name: str) -> None:
+        """Hold the key down until release_button()"""
+        self._button_requested.emit("press", key_name)
+
+    def release_button(self, key_name: str = "") -> None:
+        """Let go of the key; without a name, of whatever key is held"""
+        self._button_requested.emit("release", key_name)
+
+    def set_recording(self, file: str | None) -> None:
+        """Record the screen to file; None stops recording"""
+        self._record_requested.emit(file)
+
+    def _start_timers(self) -> None:
+        # Timers belong to the thread that creates them: this one
         self._keepalive_timer = QtCore.QTimer(self)
-        self._keepalive_timer.timeout.connect(self.send_keepalive)
-        self._keepalive_timer.start(120)
+        self._keepalive_timer.timeout.connect(self.link.send_keepalive)
+        self._keepalive_timer.start(k5stream.KEEPALIVE_INTERVAL_MS)
 
         self._poll_timer = QtCore.QTimer(self)
         self._poll_timer.timeout.connect(self.poll)
         self._poll_timer.start(10)
 
-        self._button_timer = QtCore.QTimer(self)
-        self._button_timer.timeout.connect(self._service_button_tx)
-        self._button_timer.start(25)
-
-    def close(self) -> None:
-        self._keepalive_timer.stop()
-        self._poll_timer.stop()
-        self._button_timer.stop()
-        if self._serial.is_open:
-            self._serial.close()
+        self._flush_timer = QtCore.QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.timeout.connect(self._flush_frame)
 
-    def send_keepalive(self) -> None:
-        if not self._serial.is_open:
+        self._button_timer = QtCore.QTimer(self)
+        self._button_timer.timeout.connect(self.link.service_buttons)
+        self._button_timer.start(k5stream.BUTTON_INTERVAL_MS)
+
+    def _queue_button(self, action: str, key_name: str) -> None:
+        if action == "tap":
+            self.link.queue_button_tap(key_name)
+        elif action == "press":
+            self.link.queue_button_press(key_name)
+        elif key_name:
+            self.link.queue_button_release(key_name)
+        else:
+            self.link.release_held()
+        # Out now, not on the next timer tick
+        self.link.service_buttons()
+
+    def _set_recorder(self, file: str | None) -> None:
+        link = self.link
+        if link.recorder is not None:
+            link.recorder.close()
+            self.status.emit(f"Recording saved: {link.recorder.file}, {link.recorder.records} records")
+            link.recorder = None
+        if file is None:
             return
         try:
-            self._serial.write(KEEPALIVE)
-            self.tx_log.emit(KEEPALIVE)
-        except serial.SerialException as exc:
-            self.status.emit(f"TX error: {exc}")
-
-    def queue_button_tap(self, key_name: str) -> None:
-        key_name = key_name.upper()
-        key_code = KEY_CODES.get(key_name)
-        if key_code is None:
-            self.status.emit(f"Unknown key: {key_name}")
+            link.recorder = k5record.Recorder(file)
+        except OSError as exc:
+            self.status.emit(f"Cannot record: {exc}")
             return
+        # Starts with the frame as it stands
+        link.recorder.add(link.frame)
+        self.status.emit(f"Recording to {file}")
 
-        self._button_queue.append((key_code, ACTION_PRESS, key_name, 0))
-        self._button_queue.append((key_code, ACTION_RELEASE, key_name, 0))
-        self.status.emit(f"Queued tap: {key_name}")
+    def _stop(self) -> None:
+        self._keepalive_timer.stop()
+        self._poll_timer.stop()
+        self._flush_timer.stop()
+        self._button_timer.stop()
+        self._set_recorder(None)
 
     def poll(self) -> None:
-        if not self._serial.is_open:
-            return
-        try:
-            waiting = self._serial.in_waiting
-            if waiting:
-                data = self._serial.read(waiting)
-                if data:
-                    self.rx_log.emit(data)
-                    self._buffer.extend(data)
-                    self._cmd_buffer.extend(data)
-                    self._consume_screen_buffer()
-                    self._consume_cmd_buffer()
-        except serial.SerialException as exc:
-            self.status.emit(f"RX error: {exc}")
-
-    def _consume_screen_buffer(self) -> None:
-        while True:
-            if len(self._buffer) < 5:
-                return
-
-            hdr = self._buffer.find(HEADER)
-            if hdr < 0:
-                if len(self._buffer) > 1:
-                    self._buffer[:] = self._buffer[-1:]
-                return
-            if hdr > 0:
-                del self._buffer[:hdr]
-                if len(self._buffer) < 5:
-                    return
-
-            msg_type = self._buffer[2]
-            size = (self._buffer[3] << 8) | self._buffer[4]
-            total = 5 + size
-            if len(self._buffer) < total:
-                return
-
-            payload = bytes(self._buffer[5:total])
-            del self._buffer[:total]
-
-            if msg_type == TYPE_SCREENSHOT and size == FRAME_SIZE:
-                self._frame[:] = payload
-                self.frame_ready.emit(bytearray(self._frame))
-                self.status.emit("Full frame received")
-            elif msg_type == TYPE_DIFF and size % 9 == 0:
-                self._apply_diff(payload)
-                self.frame_ready.emit(bytearray(self._frame))
-            else:
-                self.status.emit(f"Ignored frame type=0x{msg_type:02X} size={size}")
-
-    def _consume_cmd_buffer(self) -> None:
-        while True:
-            msg = self._fetch_cmd_packet()
-            if msg is None:
-                return
-
-            msg_type, payload = msg
-            if msg_type == MSG_SESSION_INFO:
-                session_ts = self._word_from_payload(payload, 0)
-                self.cmd_diag.emit(f"RX 0x0515 session_info ts=0x{session_ts:08X}")
-                self._session_pending = False
-                self.status.emit("Remote keypad session established")
-            elif msg_type == MSG_BUTTON_ACK and len(payload) >= 4:
-                seq = payload[0] | (payload[1] << 8)
-                status = payload[2]
-                qdepth = payload[3]
-                label = ACK_STATUS.get(status, f"unknown({status})")
-                self.cmd_diag.emit(f"RX 0x0611 button_ack seq={seq} status={label} qdepth={qdepth}")
-
-                if self._inflight_seq is None:
-                    continue
-
-                if seq != self._inflight_seq:
-                    continue
+        self.link.poll()
+        self._flush_frame()
 
-                event = self._inflight_event
-                self._inflight_seq = None
-                self._inflight_event = None
-
-                if status == 0:
-                    self.status.emit(f"Button ACK: {label}, queue_depth={qdepth}")
-                elif status in (1, 3):
-                    # busy/stale -> retry event (front of queue)
-                    if event is not None:
-                        self._requeue_event(event)
-                    if status == 3:
-                        self._session_ts = None
-                        self._session_pending = False
-                    self.status.emit(f"Button ACK: {label}, retrying")
-                else:
-                    self.status.emit(f"Button ACK: {label}, dropped")
-
-    def _fetch_cmd_packet(self) -> tuple[int, bytes] | None:
-        buf = self._cmd_buffer
-
-        while True:
-            if len(buf) > MAX_CMD_BUFFER:
-                del buf[: len(buf) - MAX_CMD_BUFFER]
-
-            if len(buf) < 8:
-                return None
-
-            begin = buf.find(CMD_HEADER)
-            if begin < 0:
-                if buf.endswith(b"\xAB"):
-                    del buf[:-1]
-                else:
-                    del buf[:]
-                return None
-
-            if begin > 0:
-                del buf[:begin]
-
-            if len(buf) < 8:
-                return None
-
-            msg_len = buf[2] | (buf[3] << 8)
-            if msg_len < 4 or msg_len > MAX_CMD_MSG_LEN or (msg_len % 2) != 0:
-                del buf[0]
-                continue
-
-            packet_end = 6 + msg_len
-            total = packet_end + 2
-            if len(buf) < total:
-                return None
-
-            if buf[packet_end] != CMD_FOOTER[0] or buf[packet_end + 1] != CMD_FOOTER[1]:
-                del buf[0]
-                continue
-
-            body = bytearray(buf[4 : 4 + msg_len + 2])
-            self._obfus(body)
-
-            msg = body[:-2]
-            if len(msg) < 4:
-                del buf[:total]
-                continue
-
-            declared_payload_len = msg[2] | (msg[3] << 8)
-            if declared_payload_len > (len(msg) - 4):
-                del buf[0]
-                continue
-
-            msg_type = msg[0] | (msg[1] << 8)
-            payload = bytes(msg[4 : 4 + declared_payload_len])
-
-            del buf[:total]
-            return msg_type, payload
-
-    @staticmethod
-    def _word_from_payload(payload: bytes, off: int = 0) -> int:
-        if len(payload) < off + 4:
-            return 0
-        return payload[off] | (payload[off + 1] << 8) | (payload[off + 2] << 16) | (payload[off + 3] << 24)
-
-    def _service_button_tx(self) -> None:
-        now_ms = int(time.time() * 1000)
-
-        if self._session_pending and now_ms >= self._session_deadline_ms:
-            self._session_pending = False
-            self._session_ts = None
-            self.status.emit("Remote keypad session timeout")
-
-        if self._inflight_seq is not None and now_ms >= self._inflight_deadline_ms:
-            if self._inflight_event is not None:
-                self._requeue_event(self._inflight_event)
-            self._inflight_seq = None
-            self._inflight_event = None
-            self.status.emit("Button ACK timeout, retrying")
-
-        if self._inflight_seq is not None or not self._button_queue:
-            return
-
-        if self._session_pending:
+    def _flush_frame(self) -> None:
+        """Publish changed blocks, at most once per display interval"""
+        link = self.link
+        if not link.dirty:
             return
-
-        if not self._is_session_fresh(now_ms):
-            if (now_ms - self._last_session_attempt_ms) < SESSION_RETRY_INTERVAL_MS:
-                return
-            self._start_session(now_ms)
+        now = time.monotonic()
+        if now >= self._next_flush and self.frames.publish(link.frame, link.dirty):
+            link.dirty = 0
+            self._next_flush = now + self._frame_interval
+            self.frame_ready.emit()
+        elif not self._flush_timer.isActive():
+            wait = max(self._next_flush - now, self._frame_interval / 2)
+            self._flush_timer.start(max(1, int(wait * 1000)))
+
+
+class LogModel(QtCore.QAbstractListModel):
+    """Fixed-capacity ring of log entries for a log view.
+
+    Entries are kept raw, (timestamp, bytes or text, source), and formatted
+    only when the view asks for a visible row. append() is cheap and only
+    queues; rows reach the view in batches on flush(). The source names the
+    radio when several share a log.
+    """
+
+    def __init__(self, tag: str = "", capacity: int = LOG_CAPACITY, parent: QtCore.QObject | None = None) -> None:
+        super().__init__(parent)
+        self._tag = tag
+        self._ring: list[tuple[float, bytes | str, str] | None] = [None] * capacity
+        self._start = 0
+        self._count = 0
+        self._pending: list[tuple[float, bytes | str, str]] = []
+
+    def append(self, item: bytes | str, source: str = "") -> None:
+        self._pending.append((time.time(), item, source))
+
+    def flush(self) -> bool:
+        """Move queued entries into the ring. True if rows were added"""
+        if not self._pending:
+            return False
+        cap = len(self._ring)
+        batch = self._pending[-cap:]
+        self._pending = []
+
+        room = min(cap - self._count, len(batch))
+        if room:
+            self.beginInsertRows(QtCore.QModelIndex(), self._count, self._count + room - 1)
+            for entry in batch[:room]:
+                self._ring[(self._start + self._count) % cap] = entry
+                self._count += 1
+            self.endInsertRows()
+
+        # Full: the oldest rows are overwritten in place and every row moves
+        # up by one entry. The view only repaints what it shows
+        if len(batch) > room:
+            for entry in batch[room:]:
+                self._ring[self._start] = entry
+                self._start = (self._start + 1) % cap
+            self.dataChanged.emit(self.index(0), self.index(self._count - 1))
+        return True
+
+    def clear(self) -> None:
+        self.beginResetModel()
+        self._ring = [None] * len(self._ring)
+        self._start = 0
+        self._count = 0
+        self._pending = []
+        self.endResetModel()
+
+    def rowCount(self, parent: QtCore.QModelIndex = QtCore.QModelIndex()) -> int:  # noqa: N802
+        return 0 if parent.isValid() else self._count
+
+    def data(self, index: QtCore.QModelIndex, role: int = QtCore.Qt.DisplayRole):
+        if role != QtCore.Qt.DisplayRole or not index.isValid():
+            return None
+        ts, item, source = self._ring[(self._start + index.row()) % len(self._ring)]
+        stamp = time.strftime("%H:%M:%S", time.localtime(ts)) + f".{int(ts * 1000) % 1000:03d}"
+        if source:
+            stamp += f"] [{source}"
+        if isinstance(item, str):
+            return f"[{stamp}] {item}"
+        return f"[{stamp}] {self._tag} {len(item):3d}B | {item.hex(' ').upper()}"
+
+
+class RadioTile(QtWidgets.QFrame):
+    """Screen and status line of one radio, fed by its own receiver.
+
+    The receiver's signals connect to methods of the tile, so they are queued
+    to the UI thread. Log entries go to the shared models, named by source.
+    With keyboard focus, HOST_KEYS go to the radio as key down and key up,
+    auto-repeat left out: holding a key holds it on the radio.
+    """
+
+    # Clicked or focused: the keypad should follow
+    selected = QtCore.Signal()
+
+    def __init__(self, receiver: K5Receiver, name: str, source: str, logs: tuple[LogModel, LogModel, LogModel]) -> None:
+        super().__init__()
+        self.receiver = receiver
+        self.name = name
+        self._source = source
+        self._rx_log, self._tx_log, self._diag_log = logs
+
+        self.setFrameShape(QtWidgets.QFrame.StyledPanel)
+        self.setLineWidth(2)
+        self.setFocusPolicy(QtCore.Qt.StrongFocus)
+        # Radio key of each host key held, by scan code: Shift may change
+        # what the key is called between press and release
+        self._held: dict[int, str] = {}
+        layout = QtWidgets.QVBoxLayout(self)
+        self.title = QtWidgets.QLabel(name)
+        layout.addWidget(self.title)
+        self.screen = ScreenWidget()
+        layout.addWidget(self.screen)
+        self.status_lbl = QtWidgets.QLabel("Starting...")
+        layout.addWidget(self.status_lbl)
+
+        receiver.frame_ready.connect(self._on_frame)
+        receiver.status.connect(self.status_lbl.setText)
+        receiver.rx_log.connect(self._on_rx)
+        receiver.tx_log.connect(self._on_tx)
+        receiver.cmd_diag.connect(self._on_diag)
+
+    def set_focused(self, on: bool) -> None:
+        self.setFrameShape(QtWidgets.QFrame.Box if on else QtWidgets.QFrame.StyledPanel)
+
+    def mousePressEvent(self, event: QtGui.QMouseEvent) -> None:  # noqa: N802
+        self.setFocus(QtCore.Qt.MouseFocusReason)
+        self.selected.emit()
+        super().mousePressEvent(event)
+
+    def focusInEvent(self, event: QtGui.QFocusEvent) -> None:  # noqa: N802
+        self.selected.emit()
+        super().focusInEvent(event)
+
+    def focusOutEvent(self, event: QtGui.QFocusEvent) -> None:  # noqa: N802
+        # Key-up events go elsewhere now: do not leave a key held
+        if self._held:
+            self._held.clear()
+            self.receiver.release_button()
+        super().focusOutEvent(event)
+
+    def keyPressEvent(self, event: QtGui.QKeyEvent) -> None:  # noqa: N802
+        name = HOST_KEYS.get(event.key())
+        if name is None or event.modifiers() & (QtCore.Qt.ControlModifier | QtCore.Qt.AltModifier):
+            super().keyPressEvent(event)
             return
-
-        key_code, action, key_name, retries = self._button_queue.pop(0)
-        seq = self._next_seq & 0xFFFF
-        self._next_seq = (self._next_seq + 1) & 0xFFFF
-
-        payload = bytearray(10)
-        payload[0:4] = self._word_le(self._session_ts or 0)
-        payload[4:6] = self._hw_le(seq)
-        payload[6] = key_code
-        payload[7] = action
-        payload[8:10] = self._hw_le(0)
-
-        act = "press" if action == ACTION_PRESS else "release"
-        self.cmd_diag.emit(
-            f"TX 0x0610 button_event key={key_name} action={act} seq={seq} ts=0x{(self._session_ts or 0):08X}"
-        )
-        self._send_cmd(MSG_BUTTON_EVENT, payload)
-        self._inflight_seq = seq
-        self._inflight_event = (key_code, action, key_name, retries)
-        self._inflight_deadline_ms = now_ms + BUTTON_ACK_TIMEOUT_MS
-        self.status.emit(f"Sent {key_name} {act}")
-
-    def _start_session(self, now_ms: int) -> None:
-        self._session_pending = True
-        self._last_session_attempt_ms = now_ms
-        self._session_deadline_ms = now_ms + SESSION_TIMEOUT_MS
-        self._session_ts = now_ms & 0xFFFFFFFF
-        payload = bytearray(4)
-        payload[0:4] = self._word_le(self._session_ts)
-        self.cmd_diag.emit(f"TX 0x0514 session_init ts=0x{self._session_ts:08X}")
-        self._send_cmd(MSG_SESSION_INIT, payload)
-
-    def _requeue_event(self, event: tuple[int, int, str, int]) -> None:
-        key_code, action, key_name, retries = event
-        retries += 1
-        if retries > BUTTON_RETRY_LIMIT:
-            act = "press" if action == ACTION_PRESS else "release"
-            self.status.emit(f"Dropped {key_name} {act}: retry limit exceeded")
+        if not event.isAutoRepeat():
+            self._held[event.nativeScanCode() or event.key()] = name
+            self.receiver.press_button(name)
+        event.accept()
+
+    def keyReleaseEvent(self, event: QtGui.QKeyEvent) -> None:  # noqa: N802
+        name = self._held.get(event.nativeScanCode() or event.key())
+        if name is None:
+            super().keyReleaseEvent(event)
             return
-        self._button_queue.insert(0, (key_code, action, key_name, retries))
-
-    def _is_session_fresh(self, now_ms: int) -> bool:
-        if self._session_ts is None:
-            return False
-        return (now_ms - self._session_ts) < 5000
-
-    def _send_cmd(self, msg_type: int, payload: bytes) -> None:
-        msg = bytearray(4 + len(payload))
-        msg[0:2] = self._hw_le(msg_type)
-        msg[2:4] = self._hw_le(len(payload))
-        msg[4 : 4 + len(payload)] = payload
+        if not event.isAutoRepeat():
+            del self._held[event.nativeScanCode() or event.key()]
+            self.receiver.release_button(name)
+        event.accept()
 
-        msg_len = len(msg)
-        if msg_len % 2:
-            msg += b"\x00"
-            msg_len += 1
+    def _on_frame(self) -> None:
+        frame, dirty = self.receiver.frames.take()
+        if frame is not None:
+            self.screen.set_frame(frame, dirty)
 
-        packet = bytearray(8 + msg_len)
-        packet[0:2] = b"\xAB\xCD"
-        packet[2:4] = self._hw_le(msg_len)
-        packet[4 : 4 + msg_len] = msg
+    def _on_rx(self, data: bytes) -> None:
+        self._rx_log.append(data, self._source)
 
-        crc = self._calc_crc(packet, 4, msg_len)
-        packet[4 + msg_len : 6 + msg_len] = self._hw_le(crc)
-        packet[6 + msg_len : 8 + msg_len] = b"\xDC\xBA"
+    def _on_tx(self, data: bytes) -> None:
+        self._tx_log.append(data, self._source)
 
-        body = bytearray(packet[4 : 6 + msg_len])
-        self._obfus(body)
-        packet[4 : 6 + msg_len] = body
+    def _on_diag(self, text: str) -> None:
+        self._diag_log.append(text, self._source)
 
-        self._serial.write(packet)
-        self.tx_log.emit(bytes(packet))
-
-    @staticmethod
-    def _obfus(buf: bytearray) -> None:
-        n = len(OBFUS_TBL)
-        for i in range(len(buf)):
-            buf[i] ^= OBFUS_TBL[i % n]
 
-    @staticmethod
-    def _hw_le(n: int) -> bytes:
-        return bytes((n & 0xFF, (n >> 8) & 0xFF))
+def record_file(file: str, port: str, several: bool) -> str:
+    """Recording file of one radio: with several, the port goes in the name"""
+    if not several:
+        return file
+    root, ext = os.path.splitext(file)
+    return f"{root}-{_port_name(port)}{ext or '.k5sr'}"
 
-    @staticmethod
-    def _word_le(n: int) -> bytes:
-        return bytes((n & 0xFF, (n >> 8) & 0xFF, (n >> 16) & 0xFF, (n >> 24) & 0xFF))
 
-    @staticmethod
-    def _calc_crc(buf: bytearray, off: int, size: int) -> int:
-        crc = 0
-        for i in range(size):
-            b = buf[off + i] & 0xFF
-            crc ^= b << 8
-            for _ in range(8):
-                if (crc >> 15) & 1:
-                    crc = ((crc << 1) ^ 0x1021) & 0xFFFF
-                else:
-                    crc = (crc << 1) & 0xFFFF
-        return crc
-
-    def _apply_diff(self, payload: bytes) -> None:
-        i = 0
-        while i + 9 <= len(payload):
-            block = payload[i]
-            i += 1
-            if block >= 128:
-                break
-            self._frame[block * 8:block * 8 + 8] = payload[i:i + 8]
-            i += 8
+def _port_name(port: str) -> str:
+    return port.replace("\\", "/").rsplit("/", 1)[-1]
 
 
 class MainWindow(QtWidgets.QMainWindow):
-    def __init__(self, port: str, baud: int) -> None:
+    """Screens of one or more radios in a grid, a keypad for the focused one
+    and byte logs shared by all"""
+
+    def __init__(self, ports: list[str], baud: int, record: str | None = None) -> None:
         super().__init__()
         self.setWindowTitle("K5 Qt Viewer + Remote Keypad + Byte Logger")
         self.resize(1360, 840)
@@ -500,8 +538,8 @@ class MainWindow(QtWidgets.QMainWindow):
         root.addLayout(left, 3)
         root.addLayout(right, 2)
 
-        self.screen = ScreenWidget()
-        left.addWidget(self.screen)
+        self.grid = QtWidgets.QGridLayout()
+        left.addLayout(self.grid)
 
         controls = QtWidgets.QHBoxLayout()
         left.addLayout(controls)
@@ -509,35 +547,40 @@ class MainWindow(QtWidgets.QMainWindow):
         self.scale = QtWidgets.QSpinBox()
         self.scale.setRange(2, 12)
         self.scale.setValue(4)
-        self.scale.valueChanged.connect(self.screen.set_scale)
+        self.scale.valueChanged.connect(self._on_scale_changed)
         controls.addWidget(QtWidgets.QLabel("Scale"))
         controls.addWidget(self.scale)
 
         self.theme = QtWidgets.QComboBox()
-        self.theme.addItems(["Grey", "Orange", "Blue", "White", "Invert"])
+        self.theme.addItems(list(THEMES))
         self.theme.currentTextChanged.connect(self._on_theme_changed)
         controls.addWidget(QtWidgets.QLabel("Theme"))
         controls.addWidget(self.theme)
 
+        self.record_btn = QtWidgets.QPushButton("Record")
+        self.record_btn.setCheckable(True)
+        controls.addWidget(self.record_btn)
+
         self.clear_logs_btn = QtWidgets.QPushButton("Clear Logs")
         controls.addWidget(self.clear_logs_btn)
 
-        self.status_lbl = QtWidgets.QLabel("Starting...")
-        left.addWidget(self.status_lbl)
-
         self.remote_box = QtWidgets.QGroupBox("Remote Keypad")
         self.remote_grid = QtWidgets.QGridLayout(self.remote_box)
         right.addWidget(self.remote_box)
+        self.target = QtWidgets.QComboBox()
+        self.target.currentIndexChanged.connect(self._on_target_changed)
+
+        self.rx_log = LogModel("RX", parent=self)
+        self.tx_log = LogModel("TX", parent=self)
+        self.diag_log = LogModel(parent=self)
+        self.rx_box = self._make_log_view(self.rx_log)
+        self.tx_box = self._make_log_view(self.tx_log)
+        self.diag_box = self._make_log_view(self.diag_log)
+        self._logs = ((self.rx_box, self.rx_log), (self.tx_box, self.tx_log), (self.diag_box, self.diag_log))
 
-        self.rx_box = QtWidgets.QPlainTextEdit()
-        self.tx_box = QtWidgets.QPlainTextEdit()
-        self.diag_box = QtWidgets.QPlainTextEdit()
-        for box in (self.rx_box, self.tx_box, self.diag_box):
-            box.setReadOnly(True)
-            box.setLineWrapMode(QtWidgets.QPlainTextEdit.NoWrap)
-            font = QtGui.QFont("Courier New")
-            font.setStyleHint(QtGui.QFont.Monospace)
-            box.setFont(font)
+        self._log_timer = QtCore.QTimer(self)
+        self._log_timer.timeout.connect(self._flush_logs)
+        self._log_timer.start(LOG_FLUSH_MS)
 
         right.addWidget(QtWidgets.QLabel("RX Bytes (radio -> PC)"))
         right.addWidget(self.rx_box)
@@ -548,21 +591,66 @@ class MainWindow(QtWidgets.QMainWindow):
 
         self.setCentralWidget(central)
 
-        self.receiver = K5Receiver(port=port, baud=baud, parent=self)
-        self.receiver.frame_ready.connect(self.screen.set_frame)
-        self.receiver.status.connect(self.status_lbl.setText)
-        self.receiver.rx_log.connect(lambda b: self._append_bytes(self.rx_box, b, "RX"))
-        self.receiver.tx_log.connect(lambda b: self._append_bytes(self.tx_box, b, "TX"))
-        self.receiver.cmd_diag.connect(self._append_diag)
+        # One receiver and I/O thread per radio. Log lines name the radio
+        # only when there are several
+        refresh_hz = QtGui.QGuiApplication.primaryScreen().refreshRate() or DEFAULT_REFRESH_HZ
+        several = len(ports) > 1
+        self.tiles: list[RadioTile] = []
+        try:
+            for port in ports:
+                receiver = K5Receiver(port=port, baud=baud, refresh_hz=refresh_hz)
+                source = _port_name(port) if several else ""
+                self.tiles.append(RadioTile(receiver, port, source, (self.rx_log, self.tx_log, self.diag_log)))
+        except serial.SerialException:
+            for tile in self.tiles:
+                tile.receiver.close()
+            raise
+
+        columns = math.ceil(math.sqrt(len(self.tiles)))
+        for i, tile in enumerate(self.tiles):
+            tile.title.setVisible(several)
+            tile.selected.connect(lambda i=i: self.target.setCurrentIndex(i))
+            self.grid.addWidget(tile, i // columns, i % columns)
+            self.target.addItem(tile.name)
         self.clear_logs_btn.clicked.connect(self._clear_logs)
 
-        self._build_remote_keypad()
+        self._build_remote_keypad(several)
+        for tile in self.tiles:
+            tile.receiver.start()
+        self.tiles[0].setFocus()
+
+        self._record_file = record
+        self.record_btn.toggled.connect(self._on_record_toggled)
+        if record:
+            self.record_btn.setChecked(True)
 
     def closeEvent(self, event: QtGui.QCloseEvent) -> None:  # noqa: N802
-        self.receiver.close()
+        for tile in self.tiles:
+            tile.receiver.close()
         super().closeEvent(event)
 
-    def _build_remote_keypad(self) -> None:
+    @staticmethod
+    def _make_log_view(model: LogModel) -> QtWidgets.QTreeView:
+        # A flat QTreeView rather than a QListView: with uniform row heights
+        # its layout does not walk all rows when rows are added
+        view = QtWidgets.QTreeView()
+        view.setModel(model)
+        view.setUniformRowHeights(True)
+        view.setRootIsDecorated(False)
+        view.setHeaderHidden(True)
+        view.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        view.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
+        view.setTextElideMode(QtCore.Qt.ElideNone)
+        font = QtGui.QFont("Courier New")
+        font.setStyleHint(QtGui.QFont.Monospace)
+        view.setFont(font)
+        # No wrapping: one wide column, scrolled sideways
+        header = view.header()
+        header.setStretchLastSection(False)
+        header.resizeSection(0, QtGui.QFontMetrics(font).horizontalAdvance("0" * LOG_COLUMN_CHARS))
+        return view
+
+    def _build_remote_keypad(self, several: bool) -> None:
         # Matches radio keypad layout.
         layout = [
             ["MENU", "UP", "DOWN", "EXIT"],
@@ -572,47 +660,183 @@ class MainWindow(QtWidgets.QMainWindow):
             ["SIDE1", "SIDE2", "", ""],
         ]
 
+        top = 0
+        if several:
+            self.remote_grid.addWidget(QtWidgets.QLabel("Radio"), 0, 0)
+            self.remote_grid.addWidget(self.target, 0, 1, 1, 3)
+            top = 1
+        else:
+            self.target.hide()
+
         for r, row in enumerate(layout):
             for c, key_name in enumerate(row):
                 if not key_name:
                     continue
                 btn = QtWidgets.QPushButton(key_name)
                 btn.setMinimumHeight(34)
-                btn.clicked.connect(lambda _checked=False, name=key_name: self.receiver.queue_button_tap(name))
-                self.remote_grid.addWidget(btn, r, c)
-
-        hint = QtWidgets.QLabel("Click = key tap (press+release).")
+                # The screen keeps keyboard focus
+                btn.setFocusPolicy(QtCore.Qt.NoFocus)
+                btn.pressed.connect(lambda name=key_name: self._focused().receiver.press_button(name))
+                btn.released.connect(lambda name=key_name: self._focused().receiver.release_button(name))
+                self.remote_grid.addWidget(btn, top + r, c)
+
+        hint = QtWidgets.QLabel(
+            "Click or hold a key, or type on the screen: 0-9, Enter/M = MENU, Esc = EXIT, "
+            "arrows = UP/DOWN, * = STAR, F/# = F, PgUp/PgDn = SIDE1/SIDE2."
+            + (" Click a screen to pick the radio." if several else "")
+        )
+        hint.setWordWrap(True)
         hint.setStyleSheet("color: #777;")
-        self.remote_grid.addWidget(hint, len(layout), 0, 1, 4)
+        self.remote_grid.addWidget(hint, top + len(layout), 0, 1, 4)
+
+    def _focused(self) -> RadioTile:
+        return self.tiles[max(0, self.target.currentIndex())]
+
+    def _on_target_changed(self, index: int) -> None:
+        if len(self.tiles) > 1:
+            for i, tile in enumerate(self.tiles):
+                tile.set_focused(i == index)
 
     def _clear_logs(self) -> None:
-        self.rx_box.clear()
-        self.tx_box.clear()
-        self.diag_box.clear()
+        for _, model in self._logs:
+            model.clear()
 
-    def _append_bytes(self, box: QtWidgets.QPlainTextEdit, data: bytes, tag: str) -> None:
-        ts = dt.datetime.now().strftime("%H:%M:%S.%f")[:-3]
-        hexline = " ".join(f"{x:02X}" for x in data)
-        box.appendPlainText(f"[{ts}] {tag} {len(data):3d}B | {hexline}")
-        box.verticalScrollBar().setValue(box.verticalScrollBar().maximum())
+    def _flush_logs(self) -> None:
+        for box, model in self._logs:
+            # Follow new rows only if the view was scrolled to the end
+            bar = box.verticalScrollBar()
+            follow = bar.value() == bar.maximum()
+            if model.flush() and follow:
+                bar.setValue(bar.maximum())
 
-    def _append_diag(self, text: str) -> None:
-        ts = dt.datetime.now().strftime("%H:%M:%S.%f")[:-3]
-        self.diag_box.appendPlainText(f"[{ts}] {text}")
-        self.diag_box.verticalScrollBar().setValue(self.diag_box.verticalScrollBar().maximum())
+    def _on_scale_changed(self, scale: int) -> None:
+        for tile in self.tiles:
+            tile.screen.set_scale(scale)
 
     def _on_theme_changed(self, theme: str) -> None:
-        if theme == "Grey":
-            colors = Colors(QtGui.QColor(0, 0, 0), QtGui.QColor(202, 202, 202))
-        elif theme == "Orange":
-            colors = Colors(QtGui.QColor(0, 0, 0), QtGui.QColor(255, 193, 37))
-        elif theme == "Blue":
-            colors = Colors(QtGui.QColor(0, 0, 0), QtGui.QColor(28, 134, 228))
-        elif theme == "White":
-            colors = Colors(QtGui.QColor(0, 0, 0), QtGui.QColor(255, 255, 255))
-        else:
-            colors = Colors(QtGui.QColor(202, 202, 202), QtGui.QColor(0, 0, 0))
-        self.screen.set_colors(colors)
+        for tile in self.tiles:
+            tile.screen.set_colors(THEMES[theme])
+
+    def _on_record_toggled(self, on: bool) -> None:
+        if not on:
+            for tile in self.tiles:
+                tile.receiver.set_recording(None)
+            return
+        file = self._record_file or time.strftime("k5screen-%Y%m%d-%H%M%S.k5sr")
+        self._record_file = None
+        for tile in self.tiles:
+            tile.receiver.set_recording(record_file(file, tile.name, len(self.tiles) > 1))
+
+
+class ReplayWindow(QtWidgets.QMainWindow):
+    """Plays a screen recording back, with seeking and speed control"""
+
+    def __init__(self, rec: k5record.Recording) -> None:
+        super().__init__()
+        self.setWindowTitle(f"K5 Screen Replay - {rec.file}")
+        self.rec = rec
+
+        central = QtWidgets.QWidget()
+        root = QtWidgets.QVBoxLayout(central)
+
+        self.screen = ScreenWidget()
+        root.addWidget(self.screen)
+
+        self.slider = QtWidgets.QSlider(QtCore.Qt.Horizontal)
+        self.slider.setRange(0, rec.duration)
+        self.slider.sliderMoved.connect(self._seek)
+        root.addWidget(self.slider)
+
+        controls = QtWidgets.QHBoxLayout()
+        root.addLayout(controls)
+
+        self.play_btn = QtWidgets.QPushButton("Pause")
+        self.play_btn.clicked.connect(self._toggle_play)
+        controls.addWidget(self.play_btn)
+
+        self.speed = QtWidgets.QComboBox()
+        self.speed.addItems(REPLAY_SPEEDS)
+        controls.addWidget(QtWidgets.QLabel("Speed"))
+        controls.addWidget(self.speed)
+
+        self.scale = QtWidgets.QSpinBox()
+        self.scale.setRange(2, 12)
+        self.scale.setValue(4)
+        self.scale.valueChanged.connect(self.screen.set_scale)
+        controls.addWidget(QtWidgets.QLabel("Scale"))
+        controls.addWidget(self.scale)
+
+        self.theme = QtWidgets.QComboBox()
+        self.theme.addItems(list(THEMES))
+        self.theme.currentTextChanged.connect(self._on_theme_changed)
+        controls.addWidget(QtWidgets.QLabel("Theme"))
+        controls.addWidget(self.theme)
+
+        self.time_lbl = QtWidgets.QLabel()
+        controls.addWidget(self.time_lbl, 1)
+
+        self.setCentralWidget(central)
+
+        self._frame = bytearray(FRAME_SIZE)
+        self._index = -1
+        self._pos = 0.0
+        self._last = time.monotonic()
+        self._timer = QtCore.QTimer(self)
+        self._timer.timeout.connect(self._tick)
+        if len(rec):
+            self._seek(0)
+            self._timer.start(REPLAY_TICK_MS)
+
+    def _on_theme_changed(self, theme: str) -> None:
+        self.screen.set_colors(THEMES[theme])
+
+    def _toggle_play(self) -> None:
+        if self._timer.isActive():
+            self._timer.stop()
+            self.play_btn.setText("Play")
+            return
+        if self._pos >= self.rec.duration:
+            self._seek(0)
+        self._last = time.monotonic()
+        self._timer.start(REPLAY_TICK_MS)
+        self.play_btn.setText("Pause")
+
+    def _seek(self, ms: int) -> None:
+        self._pos = float(ms)
+        self._last = time.monotonic()
+        self._index = self.rec.index_at(ms)
+        self._frame = self.rec.frame_at(self._index)
+        self.screen.set_frame(self._frame)
+        self._show_time()
+
+    def _tick(self) -> None:
+        now = time.monotonic()
+        speed = float(self.speed.currentText().rstrip("x"))
+        self._pos = min(self._pos + (now - self._last) * 1000 * speed, self.rec.duration)
+        self._last = now
+
+        target = self.rec.index_at(self._pos)
+        if target - self._index > REPLAY_MAX_STEPS:
+            self._index = target
+            self._frame = self.rec.frame_at(target)
+            self.screen.set_frame(self._frame)
+        elif target > self._index:
+            dirty = 0
+            for i in range(self._index + 1, target + 1):
+                dirty |= self.rec.apply(i, self._frame)
+            self._index = target
+            self.screen.set_frame(self._frame, dirty)
+
+        self._show_time()
+        if self._pos >= self.rec.duration:
+            self._timer.stop()
+            self.play_btn.setText("Play")
+
+    def _show_time(self) -> None:
+        if not self.slider.isSliderDown():
+            self.slider.setValue(int(self._pos))
+        at = time.strftime("%H:%M:%S", time.localtime(self.rec.start + self._pos / 1000))
+        self.time_lbl.setText(f"{self._pos / 1000:8.1f} / {self.rec.duration / 1000:.1f} s  ({at})")
 
 
 def cmd_list_ports() -> int:
@@ -628,19 +852,55 @@ def cmd_list_ports() -> int:
 
 def main() -> int:
     parser = argparse.ArgumentParser(description="Qt screen viewer and UART logger for UV-K5")
-    parser.add_argument("--port", help="Serial port (ex: /dev/ttyUSB0, COM3)")
+    parser.add_argument(
+        "--port",
+        nargs="+",
+        action="extend",
+        help="Serial port (ex: /dev/ttyUSB0, COM3); several show a grid of radios",
+    )
     parser.add_argument("--baud", type=int, default=38400, help="Baudrate (default 38400)")
     parser.add_argument("--list-ports", action="store_true", help="List serial ports and exit")
+    parser.add_argument("--record", metavar="FILE", help="Record the screen to FILE (.k5sr) from the start")
+    parser.add_argument("--replay", metavar="FILE", help="Play back a screen recording instead of a port")
+    parser.add_argument("--headless", action="store_true", help="No window: serve the screen over HTTP/WebSocket")
+    parser.add_argument(
+        "--listen",
+        default=k5server.DEFAULT_LISTEN,
+        help=f"HOST:PORT for --headless (default {k5server.DEFAULT_LISTEN})",
+    )
+    parser.add_argument("--view-only", action="store_true", help="With --headless, ignore keypad input from clients")
+    parser.add_argument(
+        "--allow-origin",
+        metavar="ORIGIN",
+        action="append",
+        help="With --headless, also let pages from ORIGIN use the keypad; '*' for any",
+    )
     args = parser.parse_args()
 
     if args.list_ports:
         return cmd_list_ports()
+    if args.replay:
+        try:
+            rec = k5record.Recording(args.replay)
+        except (OSError, ValueError) as exc:
+            print(exc, file=sys.stderr)
+            return 1
+        app = QtWidgets.QApplication(sys.argv)
+        win = ReplayWindow(rec)
+        win.show()
+        return app.exec()
     if not args.port:
-        parser.error("--port is required unless --list-ports is used")
+        parser.error("--port is required unless --list-ports or --replay is used")
+    if args.headless:
+        if len(args.port) > 1:
+            parser.error("--headless serves one --port")
+        return k5server.run(
+            args.port[0], args.baud, args.listen, args.view_only, args.record, args.allow_origin
+        )
 
     app = QtWidgets.QApplication(sys.argv)
     try:
-        win = MainWindow(port=args.port, baud=args.baud)
+        win = MainWindow(ports=args.port, baud=args.baud, record=args.record)
     except serial.SerialException as exc:
         QtWidgets.QMessageBox.critical(None, "Serial error", str(exc))
         return 1
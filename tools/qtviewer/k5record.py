@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""Screen recordings of the UV-K5 F4HWN screenshot stream.
+
+File layout: header ('K5SR', version, start time in Unix ms), then one zlib
+stream of records
+
+    0x01 <dt> <n> <n x (block index, 8 bytes)>    changed blocks
+    0x02 <dt> <1024 bytes>                        keyframe
+
+dt is a varint, milliseconds since the previous record. Only blocks that
+really changed are stored, so the firmware re-sending an unchanged block
+every frame costs nothing and an idle screen costs nothing at all. A
+keyframe every KEYFRAME_INTERVAL seconds lets replay seek without decoding
+from the start; the zlib stream is sync-flushed there too, so a recording
+cut short by a crash reads back up to its last keyframe.
+
+Frames are the panel bit plane from App/screenshot.c: row-major, 16 bytes
+per row, LSB = leftmost pixel. NumPy decodes them in bulk; image export
+also needs Pillow.
+
+Export: k5record.py REC [OUT.gif | OUT_DIR] [--fps N] [--scale N] ...
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import os
+import struct
+import sys
+import time
+import zlib
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError as exc:
+    np = None
+    _EXPORT_ERROR = str(exc)
+
+from k5stream import BLOCK_SIZE, FRAME_SIZE, FULL_MASK, HEIGHT, WIDTH
+
+MAGIC = b"K5SR"
+VERSION = 1
+_HEADER = struct.Struct("<4sBQ")
+
+REC_DIFF = 0x01
+REC_KEY = 0x02
+
+KEYFRAME_INTERVAL = 10.0
+
+# Background, foreground of exported images: the viewer's grey theme
+PALETTE = ((202, 202, 202), (0, 0, 0))
+
+# Frames decoded per NumPy call on export
+EXPORT_BATCH = 512
+
+
+class Recorder:
+    """Appends frames to a recording file. Not thread-safe"""
+
+    def __init__(self, file: str, keyframe_interval: float = KEYFRAME_INTERVAL) -> None:
+        self.file = file
+        self.records = 0
+        self._fd = open(file, "wb")
+        self._fd.write(_HEADER.pack(MAGIC, VERSION, int(time.time() * 1000)))
+        self._z = zlib.compressobj(9)
+        self._frame = bytearray(FRAME_SIZE)
+        self._interval = keyframe_interval
+        self._t0 = time.monotonic()
+        self._last_ms = 0
+        self._next_key: float | None = None
+
+    def add(self, frame: bytes | bytearray, dirty: int = FULL_MASK) -> None:
+        """Record the blocks of frame set in dirty, if they changed"""
+        now = time.monotonic()
+        ms = int((now - self._t0) * 1000)
+
+        if self._next_key is None or now >= self._next_key:
+            self._frame[:] = frame
+            self._write(REC_KEY, ms, bytes(frame))
+            self._fd.write(self._z.flush(zlib.Z_SYNC_FLUSH))
+            self._next_key = now + self._interval
+            return
+
+        out = bytearray(1)
+        for block in _blocks(dirty):
+            a = block * BLOCK_SIZE
+            chunk = frame[a : a + BLOCK_SIZE]
+            if chunk != self._frame[a : a + BLOCK_SIZE]:
+                self._frame[a : a + BLOCK_SIZE] = chunk
+                out.append(block)
+                out += chunk
+        if len(out) > 1:
+            out[0] = (len(out) - 1) // (1 + BLOCK_SIZE)
+            self._write(REC_DIFF, ms, out)
+
+    def close(self) -> None:
+        if self._fd.closed:
+            return
+        self._fd.write(self._z.flush())
+        self._fd.close()
+
+    def _write(self, kind: int, ms: int, payload: bytes | bytearray) -> None:
+        head = bytearray((kind,))
+        _put_varint(head, ms - self._last_ms)
+        self._fd.write(self._z.compress(bytes(head)))
+        self._fd.write(self._z.compress(bytes(payload)))
+        self._last_ms = ms
+        self.records += 1
+
+
+class Recording:
+    """A recording loaded into memory, indexed for seeking"""
+
+    def __init__(self, file: str) -> None:
+        with open(file, "rb") as fd:
+            raw = fd.read()
+        if len(raw) < _HEADER.size:
+            raise ValueError(f"{file}: not a screen recording")
+        magic, version, start_ms = _HEADER.unpack_from(raw)
+        if magic != MAGIC:
+            raise ValueError(f"{file}: not a screen recording")
+        if version != VERSION:
+            raise ValueError(f"{file}: recording version {version} not supported")
+
+        self.file = file
+        self.start = start_ms / 1000
+        self.size = len(raw)
+        # Decompresses what is there: a truncated stream is not an error
+        self._data = zlib.decompressobj().decompress(raw[_HEADER.size :])
+
+        # Per record: time (ms), kind, payload offset
+        self.times: list[int] = []
+        self._kinds: list[int] = []
+        self._offsets: list[int] = []
+        # Record indices of keyframes
+        self.keyframes: list[int] = []
+        self._index()
+
+    def _index(self) -> None:
+        data = self._data
+        pos = 0
+        ms = 0
+        while pos < len(data):
+            kind = data[pos]
+            dt, p = _get_varint(data, pos + 1)
+            if p < 0 or p >= len(data):
+                break
+            if kind == REC_KEY:
+                end = p + FRAME_SIZE
+            elif kind == REC_DIFF:
+                end = p + 1 + data[p] * (1 + BLOCK_SIZE)
+            else:
+                break
+            if end > len(data) or (kind == REC_DIFF and not self.keyframes):
+                break
+
+            ms += dt
+            if kind == REC_KEY:
+                self.keyframes.append(len(self.times))
+            self.times.append(ms)
+            self._kinds.append(kind)
+            self._offsets.append(p)
+            pos = end
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @property
+    def duration(self) -> int:
+        """Milliseconds from the first to the last record"""
+        return self.times[-1] if self.times else 0
+
+    def index_at(self, ms: float) -> int:
+        """Last record at or before ms"""
+        return max(0, bisect.bisect_right(self.times, ms) - 1)
+
+    def frame_at(self, index: int) -> bytearray:
+        """Frame as shown after record index, decoded from its keyframe"""
+        key = self.keyframes[bisect.bisect_right(self.keyframes, index) - 1]
+        frame = bytearray(FRAME_SIZE)
+        for i in range(key, index + 1):
+            self.apply(i, frame)
+        return frame
+
+    def apply(self, index: int, frame: bytearray) -> int:
+        """Apply record index to frame, return its dirty-block mask"""
+        data = self._data
+        p = self._offsets[index]
+        if self._kinds[index] == REC_KEY:
+            frame[:] = data[p : p + FRAME_SIZE]
+            return FULL_MASK
+        dirty = 0
+        n = data[p]
+        p += 1
+        for _ in range(n):
+            block = data[p]
+            a = block * BLOCK_SIZE
+            frame[a : a + BLOCK_SIZE] = data[p + 1 : p + 1 + BLOCK_SIZE]
+            dirty |= 1 << block
+            p += 1 + BLOCK_SIZE
+        return dirty
+
+    def frames(self, fps: float | None = None, start: float = 0, end: float | None = None):
+        """(ms, frame) from start to end seconds: every change, or fps samples"""
+        if not self.times:
+            return
+        end_ms = self.duration if end is None else min(end * 1000, self.duration)
+        i = self.index_at(start * 1000)
+        frame = self.frame_at(i)
+
+        if fps is None:
+            yield self.times[i], bytes(frame)
+            for i in range(i + 1, len(self.times)):
+                if self.times[i] > end_ms:
+                    return
+                self.apply(i, frame)
+                yield self.times[i], bytes(frame)
+            return
+
+        step = 1000 / fps
+        ms = start * 1000
+        while ms <= end_ms:
+            while i + 1 < len(self.times) and self.times[i + 1] <= ms:
+                i += 1
+                self.apply(i, frame)
+            yield int(ms), bytes(frame)
+            ms += step
+
+
+def to_pixels(frames: list[bytes]) -> "np.ndarray":
+    """N frames -> (N, HEIGHT, WIDTH) array of 0/1"""
+    raw = np.frombuffer(b"".join(frames), dtype=np.uint8).reshape(len(frames), FRAME_SIZE)
+    return np.unpackbits(raw, axis=1, bitorder="little").reshape(len(frames), HEIGHT, WIDTH)
+
+
+def export(
+    rec: Recording,
+    out: str,
+    fps: float | None = None,
+    scale: int = 4,
+    start: float = 0,
+    end: float | None = None,
+) -> int:
+    """Write frames as a PNG sequence into directory out, or an animated GIF
+    if out ends in .gif. Returns the frame count"""
+    if np is None:
+        raise RuntimeError(f"Export needs numpy and Pillow ({_EXPORT_ERROR})")
+
+    # Pixels (scale - 1) wide and scale high, as in the viewer
+    sx, sy = max(1, scale - 1), scale
+    palette = [c for rgb in PALETTE for c in rgb]
+    gif = out.lower().endswith(".gif")
+    if not gif:
+        os.makedirs(out, exist_ok=True)
+
+    images = []
+    times: list[int] = []
+    count = 0
+    source = rec.frames(fps, start, end)
+    while True:
+        batch = [item for _, item in zip(range(EXPORT_BATCH), source)]
+        if not batch:
+            break
+        pixels = to_pixels([frame for _, frame in batch])
+        pixels = pixels.repeat(sy, axis=1).repeat(sx, axis=2)
+        for (ms, _), px in zip(batch, pixels):
+            img = Image.fromarray(px, "L")
+            img.putpalette(palette)
+            if gif:
+                images.append(img)
+                times.append(ms)
+            else:
+                img.save(os.path.join(out, f"{count:06d}-{ms:09d}.png"), optimize=False)
+            count += 1
+
+    if gif and images:
+        durations = [max(20, b - a) for a, b in zip(times, times[1:])] + [1000]
+        images[0].save(out, save_all=True, append_images=images[1:], duration=durations, loop=0)
+    return count
+
+
+def _blocks(mask: int):
+    block = 0
+    while mask:
+        if mask & 1:
+            yield block
+        mask >>= 1
+        block += 1
+
+
+def _put_varint(buf: bytearray, n: int) -> None:
+    while n >= 0x80:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def _get_varint(data: bytes, pos: int) -> tuple[int, int]:
+    """(value, position after it); position -1 if data ends first"""
+    n = 0
+    shift = 0
+    while pos < len(data):
+        b = data[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return n, pos
+        shift += 7
+    return 0, -1
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Show or export a K5 screen recording")
+    parser.add_argument("file", help="Recording (.k5sr)")
+    parser.add_argument("out", nargs="?", help="Directory for a PNG sequence, or a .gif file")
+    parser.add_argument("--fps", type=float, help="Frames per second (default: one per screen change)")
+    parser.add_argument("--scale", type=int, default=4, help="Pixel scale, 2-12 (default 4)")
+    parser.add_argument("--start", type=float, default=0, help="From second (default 0)")
+    parser.add_argument("--end", type=float, help="To second (default: end)")
+    args = parser.parse_args()
+
+    try:
+        rec = Recording(args.file)
+    except (OSError, ValueError) as exc:
+        print(exc, file=sys.stderr)
+        return 1
+
+    began = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(rec.start))
+    print(
+        f"{args.file}: {began}, {rec.duration / 1000:.1f} s, {len(rec)} records, "
+        f"{len(rec.keyframes)} keyframes, {rec.size} bytes"
+    )
+    if not args.out:
+        return 0
+
+    t0 = time.perf_counter()
+    try:
+        count = export(rec, args.out, args.fps, max(2, min(12, args.scale)), args.start, args.end)
+    except (OSError, RuntimeError) as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    print(f"Exported {count} frames to {args.out} in {time.perf_counter() - t0:.1f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,590 @@
+#!/usr/bin/env python3
+"""Headless screen server for UV-K5 F4HWN firmware.
+
+One process owns the serial port, keeps the keepalive going and decodes the
+screenshot stream with k5stream, without Qt or a display. Any number of
+clients watch over HTTP:
+
+    /            page with the live screen and a keypad
+    /ws          WebSocket: screen pushes out, keys in
+    /frame.png   current screen
+    /stream      multipart PNG stream, a part per screen change
+
+WebSocket messages to the client are binary: 0x01 + 1024 bytes for the
+whole frame (the first message), then 0x02 + n x (block index, 8 bytes) for
+changed blocks, the same diff layout as the radio sends. Each client gets the
+blocks changed since its last push, so a slow client skips frames instead of
+queueing them. Status lines go out as text. Clients send "tap KEY", or
+"press KEY" and "release KEY" to hold a key, as text messages; KEY from
+k5stream.KEY_CODES. A key a client holds is released when it goes away.
+
+Browsers let any page open a WebSocket anywhere, so a /ws upgrade whose
+Origin is not this server (or an --allow-origin one) is refused: another
+site in the operator's browser cannot press keys. Clients that send no
+Origin, ie. not browsers, are let in. On a loopback address the Host must
+be a loopback name too, so a rebound DNS name does not pass as this server.
+
+Standard library and pyserial only.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import queue
+import ipaddress
+import struct
+import sys
+import threading
+import time
+import urllib.parse
+import zlib
+
+import serial
+
+from k5stream import BLOCK_SIZE, FRAME_SIZE, FULL_MASK, HEIGHT, KEY_CODES, WIDTH, dirty_runs
+import k5stream
+
+DEFAULT_LISTEN = "127.0.0.1:8055"
+# Screen pushes per second, at most
+PUSH_HZ = 30.0
+# I/O thread sleep when the port is idle
+IDLE_SLEEP = 0.005
+
+MSG_FRAME = 0x01
+MSG_DIFF = 0x02
+
+# Background, foreground of PNGs: the viewer's grey theme
+PALETTE = ((202, 202, 202), (0, 0, 0))
+
+_WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_WS_TEXT = 0x1
+_WS_BINARY = 0x2
+_WS_CLOSE = 0x8
+_WS_PING = 0x9
+_WS_PONG = 0xA
+# Client messages are short; anything bigger is not a keypad client
+_WS_MAX_IN = 1024
+
+_MAX_REQUEST = 8192
+_BOUNDARY = b"k5frame"
+
+# PNG rows are MSB = leftmost pixel, frames LSB first
+_BIT_REVERSE = bytes(int(f"{i:08b}"[::-1], 2) for i in range(256))
+
+
+def frame_png(frame: bytes | bytearray) -> bytes:
+    """Frame as a 1-bit palette PNG"""
+    raw = bytearray()
+    stride = WIDTH // 8
+    for y in range(HEIGHT):
+        raw.append(0)
+        raw += frame[y * stride : (y + 1) * stride].translate(_BIT_REVERSE)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    return b"".join(
+        (
+            b"\x89PNG\r\n\x1a\n",
+            chunk(b"IHDR", struct.pack(">IIBBBBB", WIDTH, HEIGHT, 1, 3, 0, 0, 0)),
+            chunk(b"PLTE", bytes(c for rgb in PALETTE for c in rgb)),
+            chunk(b"IDAT", zlib.compress(bytes(raw), 9)),
+            chunk(b"IEND", b""),
+        )
+    )
+
+
+def diff_message(frame: bytes | bytearray, dirty: int) -> bytes:
+    """Client message for the blocks of frame set in dirty"""
+    if dirty == FULL_MASK:
+        return bytes((MSG_FRAME,)) + bytes(frame)
+    out = bytearray((MSG_DIFF,))
+    for first, end in dirty_runs(dirty):
+        for block in range(first, end):
+            a = block * BLOCK_SIZE
+            out.append(block)
+            out += frame[a : a + BLOCK_SIZE]
+    return bytes(out)
+
+
+class _Client:
+    """A connection waiting for screen changes"""
+
+    def __init__(self) -> None:
+        self.dirty = FULL_MASK
+        self.changed = asyncio.Event()
+        self.changed.set()
+
+
+class Server:
+    """Serial link in an I/O thread, HTTP and WebSocket clients in asyncio"""
+
+    def __init__(
+        self,
+        port: str,
+        baud: int = 38400,
+        push_hz: float = PUSH_HZ,
+        view_only: bool = False,
+        record: str | None = None,
+        allow_origins: list[str] | None = None,
+    ) -> None:
+        self._serial = serial.Serial(port, baud, timeout=0)
+        self.link = k5stream.Link(self._serial)
+        self.link.on_status = self._on_link_status
+        self.port = port
+        self.view_only = view_only
+        # Origins besides this server's own that may open /ws; "*" for any
+        self.allow_origins = {o.rstrip("/").lower() for o in allow_origins or ()}
+        self._loopback = False
+
+        if record:
+            import k5record
+
+            self.link.recorder = k5record.Recorder(record)
+
+        # Latest frame as the clients see it; asyncio side only
+        self.frame = bytes(FRAME_SIZE)
+        self._clients: set[_Client] = set()
+        self._ws: set[asyncio.StreamWriter] = set()
+        self._interval = 1.0 / max(1.0, push_hz)
+
+        # (command, key name) from clients, for the I/O thread
+        self._keys: queue.SimpleQueue[tuple[str, str]] = queue.SimpleQueue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run_link, name="k5-link", daemon=True)
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    async def serve(self, host: str, port: int) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loopback = _is_loopback(host)
+        server = await asyncio.start_server(self._handle, host, port, limit=_MAX_REQUEST)
+        self._thread.start()
+        print(f"{self.port}: serving on http://{host}:{port}/")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        if self.link.recorder is not None:
+            self.link.recorder.close()
+            self.link.recorder = None
+        if self._serial.is_open:
+            self._serial.close()
+
+    # I/O thread
+
+    def _run_link(self) -> None:
+        link = self.link
+        keepalive = k5stream.KEEPALIVE_INTERVAL_MS / 1000
+        buttons = k5stream.BUTTON_INTERVAL_MS / 1000
+        next_keepalive = next_buttons = next_push = 0.0
+
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now >= next_keepalive:
+                link.send_keepalive()
+                next_keepalive = now + keepalive
+            while True:
+                try:
+                    cmd, key = self._keys.get_nowait()
+                except queue.Empty:
+                    break
+                if cmd == "tap":
+                    link.queue_button_tap(key)
+                elif cmd == "press":
+                    link.queue_button_press(key)
+                else:
+                    link.queue_button_release(key)
+                # Out now, not on the next tick
+                next_buttons = 0.0
+            if now >= next_buttons:
+                link.service_buttons()
+                next_buttons = now + buttons
+
+            link.poll()
+            if link.dirty and now >= next_push:
+                self._loop.call_soon_threadsafe(self._publish, bytes(link.frame), link.dirty)
+                link.dirty = 0
+                next_push = now + self._interval
+
+            try:
+                busy = self._serial.in_waiting
+            except OSError:
+                busy = 0
+            if not busy:
+                time.sleep(IDLE_SLEEP)
+
+    def _on_link_status(self, text: str) -> None:
+        self._loop.call_soon_threadsafe(self._status, text)
+
+    # asyncio side
+
+    def _publish(self, frame: bytes, dirty: int) -> None:
+        self.frame = frame
+        for client in self._clients:
+            client.dirty |= dirty
+            client.changed.set()
+
+    def _status(self, text: str) -> None:
+        print(f"{time.strftime('%H:%M:%S')} {text}")
+        message = _ws_frame(_WS_TEXT, f"status {text}".encode())
+        for writer in self._ws:
+            writer.write(message)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            method, path = lines[0].split(" ")[:2]
+            headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            path = path.split("?", 1)[0]
+            if method != "GET":
+                _reply(writer, 405, "text/plain", b"GET only\n")
+            elif path == "/":
+                _reply(writer, 200, "text/html; charset=utf-8", _PAGE)
+            elif path == "/frame.png":
+                _reply(writer, 200, "image/png", frame_png(self.frame))
+            elif path == "/stream":
+                await self._serve_stream(writer)
+            elif path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                if self._origin_ok(headers):
+                    await self._serve_ws(reader, writer, headers)
+                else:
+                    _reply(writer, 403, "text/plain", b"Origin not allowed, see --allow-origin\n")
+            else:
+                _reply(writer, 404, "text/plain", b"Not found\n")
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _origin_ok(self, headers: dict) -> bool:
+        """May this WebSocket upgrade press keys: same origin, or allowed"""
+        origin = headers.get("origin")
+        if origin is None:
+            return True
+        origin = origin.rstrip("/").lower()
+        if "*" in self.allow_origins or origin in self.allow_origins:
+            return True
+        host = headers.get("host", "").lower()
+        if not host or urllib.parse.urlsplit(origin).netloc != host:
+            return False
+        # DNS rebinding: evil.example resolving to 127.0.0.1 is same-origin with itself
+        return not self._loopback or _is_loopback(urllib.parse.urlsplit("//" + host).hostname or "")
+
+    async def _watch(self, push) -> None:
+        """Call push(dirty) on every screen change until the client goes"""
+        client = _Client()
+        self._clients.add(client)
+        try:
+            while True:
+                await client.changed.wait()
+                client.changed.clear()
+                dirty, client.dirty = client.dirty, 0
+                if dirty:
+                    await push(dirty)
+        finally:
+            self._clients.discard(client)
+
+    async def _serve_stream(self, writer: asyncio.StreamWriter) -> None:
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: multipart/x-mixed-replace; boundary=" + _BOUNDARY + b"\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+
+        async def push(_dirty: int) -> None:
+            png = frame_png(self.frame)
+            writer.write(
+                b"--" + _BOUNDARY + b"\r\n"
+                b"Content-Type: image/png\r\n"
+                b"Content-Length: %d\r\n\r\n" % len(png) + png + b"\r\n"
+            )
+            await writer.drain()
+
+        await self._watch(push)
+
+    async def _serve_ws(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, headers: dict) -> None:
+        key = headers.get("sec-websocket-key", "").encode()
+        accept = base64.b64encode(hashlib.sha1(key + _WS_GUID).digest())
+        writer.write(
+            b"HTTP/1.1 101 Switching Protocols\r\n"
+            b"Upgrade: websocket\r\n"
+            b"Connection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+        )
+
+        async def push(dirty: int) -> None:
+            writer.write(_ws_frame(_WS_BINARY, diff_message(self.frame, dirty)))
+            await writer.drain()
+
+        self._ws.add(writer)
+        pusher = asyncio.create_task(self._watch(push))
+        held: set[str] = set()
+        try:
+            while not pusher.done():
+                opcode, data = await _ws_read(reader)
+                if opcode == _WS_CLOSE:
+                    writer.write(_ws_frame(_WS_CLOSE, data[:2]))
+                    break
+                if opcode == _WS_PING:
+                    writer.write(_ws_frame(_WS_PONG, data))
+                elif opcode == _WS_TEXT:
+                    self._on_ws_text(writer, data.decode("utf-8", "replace"), held)
+        finally:
+            for key in held:
+                self._keys.put(("release", key))
+            self._ws.discard(writer)
+            if pusher.done() and not pusher.cancelled():
+                # A failed push just ends the connection
+                pusher.exception()
+            pusher.cancel()
+
+    def _on_ws_text(self, writer: asyncio.StreamWriter, text: str, held: set[str]) -> None:
+        cmd, _, key = text.strip().partition(" ")
+        key = key.upper()
+        if cmd not in ("tap", "press", "release"):
+            writer.write(_ws_frame(_WS_TEXT, f"error unknown command: {cmd}".encode()))
+        elif self.view_only:
+            writer.write(_ws_frame(_WS_TEXT, b"error keypad disabled (--view-only)"))
+        elif key not in KEY_CODES:
+            writer.write(_ws_frame(_WS_TEXT, f"error unknown key: {key}".encode()))
+        else:
+            if cmd == "press":
+                held.add(key)
+            else:
+                held.discard(key)
+            self._keys.put((cmd, key))
+
+
+def _reply(writer: asyncio.StreamWriter, code: int, ctype: str, body: bytes) -> None:
+    reason = {200: "OK", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed"}[code]
+    writer.write(
+        f"HTTP/1.1 {code} {reason}\r\n"
+        f"Content-Type: {ctype}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Cache-Control: no-cache\r\n"
+        "Connection: close\r\n\r\n".encode() + body
+    )
+
+
+def _ws_frame(opcode: int, data: bytes) -> bytes:
+    """Unmasked, unfragmented server frame"""
+    n = len(data)
+    if n < 126:
+        head = struct.pack(">BB", 0x80 | opcode, n)
+    elif n < 0x10000:
+        head = struct.pack(">BBH", 0x80 | opcode, 126, n)
+    else:
+        head = struct.pack(">BBQ", 0x80 | opcode, 127, n)
+    return head + data
+
+
+async def _ws_read(reader: asyncio.StreamReader) -> tuple[int, bytes]:
+    """Next client message as (opcode, payload), fragments joined"""
+    message = bytearray()
+    opcode = None
+    while True:
+        b0, b1 = await reader.readexactly(2)
+        n = b1 & 0x7F
+        if n == 126:
+            (n,) = struct.unpack(">H", await reader.readexactly(2))
+        elif n == 127:
+            (n,) = struct.unpack(">Q", await reader.readexactly(8))
+        if n + len(message) > _WS_MAX_IN:
+            raise ValueError("WebSocket message too large")
+        mask = await reader.readexactly(4) if b1 & 0x80 else b"\0\0\0\0"
+        data = bytearray(await reader.readexactly(n))
+        for i in range(n):
+            data[i] ^= mask[i & 3]
+
+        op = b0 & 0x0F
+        if op >= 0x8:
+            # Control frames may come between fragments
+            return op, bytes(data)
+        if opcode is None:
+            opcode = op
+        message += data
+        if b0 & 0x80:
+            return opcode, bytes(message)
+
+
+_KEYPAD = (
+    ("MENU", "UP", "DOWN", "EXIT"),
+    ("1", "2", "3", "STAR"),
+    ("4", "5", "6", "0"),
+    ("7", "8", "9", "F"),
+    ("SIDE1", "SIDE2"),
+)
+
+_PAGE = (
+    """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>K5 screen</title>
+<style>
+body { font-family: sans-serif; background: #333; color: #ddd; }
+canvas { width: 512px; height: 256px; image-rendering: pixelated; }
+button { width: 60px; height: 32px; margin: 2px; }
+#status { font-family: monospace; height: 1.2em; }
+</style></head><body>
+<canvas id="screen" width="128" height="64"></canvas>
+<div id="keys">"""
+    + "".join(
+        "<div>" + "".join(f'<button data-key="{k}">{k}</button>' for k in row) + "</div>"
+        for row in _KEYPAD
+    )
+    + """</div>
+<div id="status">connecting</div>
+<script>
+const canvas = document.getElementById("screen");
+const ctx = canvas.getContext("2d");
+const img = ctx.createImageData(128, 64);
+const frame = new Uint8Array(1024);
+const status = document.getElementById("status");
+const BG = [202, 202, 202], FG = [0, 0, 0];
+let ws;
+
+function draw(first, end) {
+  for (let i = first * 8; i < end * 8; i++) {
+    const y = i >> 4, x0 = (i & 15) * 8;
+    for (let b = 0; b < 8; b++) {
+      const c = (frame[i] >> b) & 1 ? FG : BG;
+      const p = (y * 128 + x0 + b) * 4;
+      img.data[p] = c[0]; img.data[p + 1] = c[1]; img.data[p + 2] = c[2]; img.data[p + 3] = 255;
+    }
+  }
+}
+
+function connect() {
+  ws = new WebSocket((location.protocol === "https:" ? "wss://" : "ws://") + location.host + "/ws");
+  ws.binaryType = "arraybuffer";
+  ws.onopen = () => { status.textContent = "connected"; };
+  ws.onclose = () => { status.textContent = "disconnected, retrying"; setTimeout(connect, 1000); };
+  ws.onmessage = (ev) => {
+    if (typeof ev.data === "string") { status.textContent = ev.data; return; }
+    const m = new Uint8Array(ev.data);
+    if (m[0] === 1) {
+      frame.set(m.subarray(1, 1025));
+      draw(0, 128);
+    } else {
+      for (let i = 1; i + 9 <= m.length; i += 9) {
+        frame.set(m.subarray(i + 1, i + 9), m[i] * 8);
+        draw(m[i], m[i] + 1);
+      }
+    }
+    ctx.putImageData(img, 0, 0);
+  };
+}
+
+function send(cmd, key) { if (ws.readyState === 1) ws.send(cmd + " " + key); }
+
+// Buttons and host keys hold the radio key while held
+for (const b of document.querySelectorAll("button")) {
+  b.onpointerdown = () => send("press", b.dataset.key);
+  b.onpointerup = b.onpointerleave = () => send("release", b.dataset.key);
+}
+const HOST_KEYS = {
+  Enter: "MENU", m: "MENU", ArrowUp: "UP", ArrowDown: "DOWN", Escape: "EXIT", Backspace: "EXIT",
+  "*": "STAR", f: "F", "#": "F", PageUp: "SIDE1", PageDown: "SIDE2",
+};
+const held = {};
+document.onkeydown = (e) => {
+  const key = /^[0-9]$/.test(e.key) ? e.key : HOST_KEYS[e.key];
+  if (!key || e.ctrlKey || e.altKey) return;
+  e.preventDefault();
+  if (e.repeat) return;
+  held[e.code] = key;
+  send("press", key);
+};
+document.onkeyup = (e) => {
+  const key = held[e.code];
+  if (!key) return;
+  delete held[e.code];
+  send("release", key);
+};
+window.onblur = () => {
+  for (const code in held) { send("release", held[code]); delete held[code]; }
+};
+connect();
+</script></body></html>
+"""
+).encode()
+
+
+def _is_loopback(host: str) -> bool:
+    if host.lower() == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def parse_listen(spec: str) -> tuple[str, int]:
+    """'HOST:PORT', ':PORT' or 'PORT' -> (host, port)"""
+    host, _, port = spec.rpartition(":")
+    return host.strip("[]") or "127.0.0.1", int(port)
+
+
+def run(
+    port: str,
+    baud: int,
+    listen: str,
+    view_only: bool = False,
+    record: str | None = None,
+    allow_origins: list[str] | None = None,
+) -> int:
+    try:
+        host, http_port = parse_listen(listen)
+    except ValueError:
+        print(f"Invalid --listen '{listen}', use HOST:PORT", file=sys.stderr)
+        return 1
+    try:
+        server = Server(port, baud, view_only=view_only, record=record, allow_origins=allow_origins)
+    except (serial.SerialException, OSError) as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    try:
+        asyncio.run(server.serve(host, http_port))
+    except KeyboardInterrupt:
+        pass
+    except OSError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    finally:
+        server.close()
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Headless UV-K5 screen server")
+    parser.add_argument("--port", required=True, help="Serial port (ex: /dev/ttyUSB0, COM3)")
+    parser.add_argument("--baud", type=int, default=38400, help="Baudrate (default 38400)")
+    parser.add_argument("--listen", default=DEFAULT_LISTEN, help=f"HOST:PORT to serve on (default {DEFAULT_LISTEN})")
+    parser.add_argument("--view-only", action="store_true", help="Ignore keypad input from clients")
+    parser.add_argument("--record", metavar="FILE", help="Record the screen to FILE (.k5sr)")
+    parser.add_argument(
+        "--allow-origin",
+        metavar="ORIGIN",
+        action="append",
+        help="Also let pages from ORIGIN (ex: http://dash.lan:8080) use the keypad; '*' for any",
+    )
+    args = parser.parse_args()
+    return run(args.port, args.baud, args.listen, args.view_only, args.record, args.allow_origin)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
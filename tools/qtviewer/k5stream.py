@@ -0,0 +1,570 @@
+#!/usr/bin/env python3
+"""Serial link to a UV-K5 running F4HWN firmware, without Qt.
+
+Link owns no thread and no timers. Its owner calls poll() often,
+send_keepalive() every KEEPALIVE_INTERVAL_MS and service_buttons() every
+BUTTON_INTERVAL_MS, and right after queueing a key so it goes out at once,
+all from one thread; results come back through the on_* callbacks, in that
+same thread. The Qt viewer drives it from its I/O
+thread, the headless server (k5server.py) from a plain one.
+
+Screen frames are the panel bit plane from App/screenshot.c: row-major,
+16 bytes per row, LSB = leftmost pixel, sent as diffs of 8-byte blocks.
+"""
+
+from __future__ import annotations
+
+import time
+from collections import deque
+
+WIDTH = 128
+HEIGHT = 64
+FRAME_SIZE = 1024
+BLOCK_SIZE = 8
+BLOCKS_PER_ROW = WIDTH // 8 // BLOCK_SIZE
+ROW_MASK = (1 << BLOCKS_PER_ROW) - 1
+# Dirty-block mask: bit n set if block n (bytes n*8..n*8+7) changed
+FULL_MASK = (1 << (FRAME_SIZE // BLOCK_SIZE)) - 1
+KEEPALIVE = b"\x55\xAA\x00\x00"
+KEEPALIVE_INTERVAL_MS = 120
+BUTTON_INTERVAL_MS = 10
+HEADER = b"\xAA\x55"
+TYPE_SCREENSHOT = 0x01
+TYPE_DIFF = 0x02
+# Closes every frame of firmware that sends the 0xFF version marker
+FRAME_TRAILER = 0x0A
+# Every block changed
+MAX_DIFF_SIZE = FRAME_SIZE // BLOCK_SIZE * 9
+
+# UART command protocol
+CMD_HEADER = b"\xAB\xCD"
+CMD_FOOTER = b"\xDC\xBA"
+OBFUS_TBL = b"\x16\x6c\x14\xe6\x2e\x91\x0d\x40\x21\x35\xd5\x40\x13\x03\xe9\x80"
+
+MSG_SESSION_INIT = 0x0514
+MSG_SESSION_INFO = 0x0515
+MSG_BUTTON_EVENT = 0x0610
+MSG_BUTTON_ACK = 0x0611
+
+ACTION_PRESS = 0
+ACTION_RELEASE = 1
+
+ACK_STATUS = {
+    0: "accepted",
+    1: "busy",
+    2: "invalid",
+    3: "stale",
+}
+
+SESSION_TIMEOUT_MS = 500
+SESSION_RETRY_INTERVAL_MS = 300
+BUTTON_ACK_TIMEOUT_MS = 700
+BUTTON_RETRY_LIMIT = 4
+# Remote key FIFO of the firmware (App/app/remote_key.c). It is drained on
+# every 10 ms key scan and keys debounce over 20 ms, so a press is held
+# BUTTON_HOLD_MS before its release goes out, and BUTTON_GAP_MS separates a
+# release from the next press. That also caps events at 25/s.
+REMOTE_KEY_QUEUE_SIZE = 16
+BUTTON_HOLD_MS = 40
+BUTTON_GAP_MS = 40
+MAX_CMD_MSG_LEN = 256
+
+KEY_CODES = {
+    "0": 0,
+    "1": 1,
+    "2": 2,
+    "3": 3,
+    "4": 4,
+    "5": 5,
+    "6": 6,
+    "7": 7,
+    "8": 8,
+    "9": 9,
+    "MENU": 10,
+    "UP": 11,
+    "DOWN": 12,
+    "EXIT": 13,
+    "STAR": 14,
+    "F": 15,
+    "SIDE2": 17,
+    "SIDE1": 18,
+}
+
+
+def dirty_runs(mask: int) -> list[tuple[int, int]]:
+    """Runs of blocks set in mask, as (first, end)"""
+    runs: list[tuple[int, int]] = []
+    n = 0
+    while mask:
+        skip = (mask & -mask).bit_length() - 1
+        mask >>= skip
+        n += skip
+        length = (~mask & (mask + 1)).bit_length() - 1
+        runs.append((n, n + length))
+        mask >>= length
+        n += length
+    return runs
+
+
+def _ignore(_value) -> None:
+    pass
+
+
+# States of a sent key event
+_PENDING = 0
+_ACCEPTED = 1
+_FAILED = 2
+_DROPPED = 3
+
+
+def _now_ms() -> int:
+    return int(time.monotonic() * 1000)
+
+
+class Link:
+    """Screen stream, keepalive and remote keypad session of one radio"""
+
+    def __init__(self, ser) -> None:
+        self._serial = ser
+        # Received bytes not parsed yet, frames and packets alike
+        self._buffer = bytearray()
+        # Bytes that were neither, frames dropped for a missing trailer
+        self.skipped = 0
+        self.bad_frames = 0
+
+        # Parsed frames go into frame; changed blocks pile up in dirty until
+        # the owner takes them
+        self.frame = bytearray(FRAME_SIZE)
+        self.dirty = 0
+        # k5record.Recorder, set by the owner
+        self.recorder = None
+
+        self.on_status = _ignore
+        self.on_rx = _ignore
+        self.on_tx = _ignore
+        self.on_diag = _ignore
+
+        self._session_ts: int | None = None
+        self._session_pending = False
+        self._session_deadline_ms = 0
+        self._last_session_attempt_ms = 0
+
+        # Key events (key code, action, key name, retries) not sent yet, and
+        # [seq, event, ACK deadline, state] of those sent, oldest first
+        self._button_queue: deque[tuple[int, int, str, int]] = deque()
+        self._inflight: list[list] = []
+        self._next_seq = 1
+        self._next_button_ms = 0
+        # Firmware queue depth from the last ACK
+        self._queue_depth = 0
+        # Key held down as far as the queued events go
+        self._key_down: str | None = None
+
+    def send_keepalive(self) -> None:
+        if not self._serial.is_open:
+            return
+        try:
+            self._serial.write(KEEPALIVE)
+            self.on_tx(KEEPALIVE)
+        except OSError as exc:
+            self.on_status(f"TX error: {exc}")
+
+    def queue_button_tap(self, key_name: str) -> None:
+        if self.queue_button_press(key_name):
+            self.queue_button_release(key_name)
+            self.on_status(f"Queued tap: {key_name.upper()}")
+
+    def queue_button_press(self, key_name: str) -> bool:
+        """Hold key_name down until queue_button_release(). The radio takes
+        one key at a time: a key still held is released first, as when a
+        second key is pressed on the radio itself. False if unknown"""
+        key_name = key_name.upper()
+        key_code = KEY_CODES.get(key_name)
+        if key_code is None:
+            self.on_status(f"Unknown key: {key_name}")
+            return False
+        if self._key_down == key_name:
+            return True
+        self.release_held()
+        self._button_queue.append((key_code, ACTION_PRESS, key_name, 0))
+        self._key_down = key_name
+        return True
+
+    def queue_button_release(self, key_name: str) -> None:
+        """Let go of key_name, if it is the key held"""
+        if self._key_down == key_name.upper():
+            self.release_held()
+
+    def release_held(self) -> None:
+        """Let go of whatever key is held"""
+        if self._key_down is not None:
+            self._button_queue.append((KEY_CODES[self._key_down], ACTION_RELEASE, self._key_down, 0))
+            self._key_down = None
+
+    def poll(self) -> None:
+        """Read and parse whatever came in. New frame blocks are in dirty"""
+        if not self._serial.is_open:
+            return
+        try:
+            waiting = self._serial.in_waiting
+            if waiting:
+                data = self._serial.read(waiting)
+                if data:
+                    self.on_rx(data)
+                    self._buffer.extend(data)
+                    self._demux()
+        except OSError as exc:
+            self.on_status(f"RX error: {exc}")
+
+    def _demux(self) -> int:
+        """Route screen frames and command packets out of _buffer in one
+        pass, return how many frames were parsed.
+
+        Screen frames are [FF] AA 55 type size(BE) payload [0A]: firmware
+        that sends the FF version marker closes every frame with 0A, and a
+        frame whose trailer is not there lost bytes on the way. Command
+        packets are AB CD size(LE) body crc DC BA. Bytes that start neither
+        are skipped; what may still become one stays for the next read.
+        """
+        buf = self._buffer
+        pos = 0
+        frames = 0
+        # Next candidate header of each kind at or after pos, -1 if none
+        scr = buf.find(HEADER)
+        cmd = buf.find(CMD_HEADER)
+
+        while True:
+            if 0 <= scr < pos:
+                scr = buf.find(HEADER, pos)
+            if 0 <= cmd < pos:
+                cmd = buf.find(CMD_HEADER, pos)
+
+            if scr >= 0 and (cmd < 0 or scr < cmd):
+                marker = scr > pos and buf[scr - 1] == 0xFF
+                end = self._take_frame(scr, marker)
+                if end is None:
+                    self.skipped += scr - marker - pos
+                    del buf[: scr - marker]
+                    return frames
+                if end < 0:
+                    self.skipped += scr + 1 - pos
+                    pos = scr + 1
+                    continue
+                self.skipped += scr - marker - pos
+                frames += 1
+                pos = end
+            elif cmd >= 0:
+                end = self._take_packet(cmd)
+                if end is None:
+                    self.skipped += cmd - pos
+                    del buf[:cmd]
+                    return frames
+                if end < 0:
+                    self.skipped += cmd + 1 - pos
+                    pos = cmd + 1
+                    continue
+                self.skipped += cmd - pos
+                pos = end
+            else:
+                # Keep a tail that may be the start of a header
+                keep = len(buf)
+                if buf.endswith(b"\xFF\xAA"):
+                    keep -= 2
+                elif buf[-1:] in (b"\xFF", b"\xAA", b"\xAB"):
+                    keep -= 1
+                keep = max(pos, keep)
+                self.skipped += keep - pos
+                del buf[:keep]
+                return frames
+
+    def _take_frame(self, start: int, marker: bool) -> int | None:
+        """Parse the screen frame whose AA 55 is at start.
+
+        Returns the position after it, None if it is not all there yet, or
+        -1 if it is no frame.
+        """
+        buf = self._buffer
+        if len(buf) < start + 5:
+            return None
+        msg_type = buf[start + 2]
+        size = (buf[start + 3] << 8) | buf[start + 4]
+        if msg_type == TYPE_DIFF:
+            if not 0 < size <= MAX_DIFF_SIZE or size % 9:
+                return -1
+        elif msg_type != TYPE_SCREENSHOT or size != FRAME_SIZE:
+            return -1
+
+        end = start + 5 + size + marker
+        if len(buf) < end:
+            return None
+        if marker and buf[end - 1] != FRAME_TRAILER:
+            self.bad_frames += 1
+            self.on_status(f"Dropped truncated frame type=0x{msg_type:02X} size={size}")
+            return -1
+
+        payload = bytes(buf[start + 5 : start + 5 + size])
+        if msg_type == TYPE_SCREENSHOT:
+            self.frame[:] = payload
+            self.dirty = FULL_MASK
+            if self.recorder is not None:
+                self.recorder.add(self.frame)
+            self.on_status("Full frame received")
+        else:
+            dirty = self._apply_diff(payload)
+            self.dirty |= dirty
+            if self.recorder is not None:
+                self.recorder.add(self.frame, dirty)
+        return end
+
+    def _take_packet(self, start: int) -> int | None:
+        """Parse the command packet whose AB CD is at start, as _take_frame"""
+        buf = self._buffer
+        if len(buf) < start + 8:
+            return None
+
+        msg_len = buf[start + 2] | (buf[start + 3] << 8)
+        if msg_len < 4 or msg_len > MAX_CMD_MSG_LEN or (msg_len % 2) != 0:
+            return -1
+
+        packet_end = start + 6 + msg_len
+        end = packet_end + 2
+        if len(buf) < end:
+            return None
+        if buf[packet_end : end] != CMD_FOOTER:
+            return -1
+
+        body = bytearray(buf[start + 4 : packet_end])
+        self._obfus(body)
+        msg = body[:-2]
+
+        declared_payload_len = msg[2] | (msg[3] << 8)
+        if declared_payload_len > (len(msg) - 4):
+            return -1
+
+        msg_type = msg[0] | (msg[1] << 8)
+        self._on_packet(msg_type, bytes(msg[4 : 4 + declared_payload_len]))
+        return end
+
+    def _on_packet(self, msg_type: int, payload: bytes) -> None:
+        if msg_type == MSG_SESSION_INFO:
+            session_ts = self._word_from_payload(payload, 0)
+            self.on_diag(f"RX 0x0515 session_info ts=0x{session_ts:08X}")
+            self._session_pending = False
+            self.on_status("Remote keypad session established")
+        elif msg_type == MSG_BUTTON_ACK and len(payload) >= 4:
+            seq = payload[0] | (payload[1] << 8)
+            status = payload[2]
+            qdepth = payload[3]
+            label = ACK_STATUS.get(status, f"unknown({status})")
+            self.on_diag(f"RX 0x0611 button_ack seq={seq} status={label} qdepth={qdepth}")
+
+            i = next((i for i, sent in enumerate(self._inflight) if sent[0] == seq), None)
+            if i is None:
+                # A late ACK of an event since sent again, or given up on
+                return
+            self._queue_depth = qdepth
+
+            # ACKs come back in the order events went out: any sent before
+            # this one and still unanswered was lost, or its ACK was
+            for sent in self._inflight[:i]:
+                if sent[3] == _PENDING:
+                    sent[3] = _FAILED
+            sent = self._inflight[i]
+
+            if status == 0:
+                sent[3] = _ACCEPTED
+                self.on_status(f"Button ACK: {label}, queue_depth={qdepth}")
+            elif status in (1, 3) or any(prev[3] == _FAILED for prev in self._inflight[:i]):
+                # busy/stale, or invalid only because an earlier event did not
+                # get through -> retry
+                sent[3] = _FAILED
+                if status == 3:
+                    self._session_ts = None
+                    self._session_pending = False
+                self.on_status(f"Button ACK: {label}, retrying")
+            else:
+                sent[3] = _DROPPED
+                self.on_status(f"Button ACK: {label}, dropped")
+            self._settle_inflight(_now_ms())
+
+    @staticmethod
+    def _word_from_payload(payload: bytes, off: int = 0) -> int:
+        if len(payload) < off + 4:
+            return 0
+        return payload[off] | (payload[off + 1] << 8) | (payload[off + 2] << 16) | (payload[off + 3] << 24)
+
+    def service_buttons(self) -> None:
+        """Send queued key events as pacing and the firmware queue allow"""
+        now_ms = _now_ms()
+
+        if self._session_pending and now_ms >= self._session_deadline_ms:
+            self._session_pending = False
+            self._session_ts = None
+            self.on_status("Remote keypad session timeout")
+
+        expired = [sent for sent in self._inflight if sent[3] == _PENDING and now_ms >= sent[2]]
+        if expired:
+            for sent in expired:
+                sent[3] = _FAILED
+            self.on_status("Button ACK timeout, retrying")
+            self._settle_inflight(now_ms)
+
+        if not self._button_queue or self._session_pending:
+            return
+
+        if self._session_ts is None:
+            if (now_ms - self._last_session_attempt_ms) < SESSION_RETRY_INTERVAL_MS:
+                return
+            self._start_session(now_ms)
+            return
+
+        if now_ms < self._next_button_ms or self._credits() <= 0:
+            return
+
+        event = self._button_queue.popleft()
+        key_code, action, key_name, _retries = event
+        seq = self._next_seq & 0xFFFF
+        self._next_seq = (self._next_seq + 1) & 0xFFFF
+
+        payload = bytearray(10)
+        payload[0:4] = self._word_le(self._session_ts)
+        payload[4:6] = self._hw_le(seq)
+        payload[6] = key_code
+        payload[7] = action
+        payload[8:10] = self._hw_le(0)
+
+        act = "press" if action == ACTION_PRESS else "release"
+        self.on_diag(
+            f"TX 0x0610 button_event key={key_name} action={act} seq={seq} ts=0x{self._session_ts:08X}"
+        )
+        self._send_cmd(MSG_BUTTON_EVENT, payload)
+        self._inflight.append([seq, event, now_ms + BUTTON_ACK_TIMEOUT_MS, _PENDING])
+        self._next_button_ms = now_ms + (BUTTON_HOLD_MS if action == ACTION_PRESS else BUTTON_GAP_MS)
+        self.on_status(f"Sent {key_name} {act}")
+
+    def _credits(self) -> int:
+        """Events that may be sent now without overflowing the firmware queue.
+
+        None while an event that failed is being sorted out. Otherwise the
+        free slots of the last ACK's queue depth, less the events sent since
+        that may land on top. With nothing in flight one event always goes,
+        so a full queue is probed rather than waited on forever.
+        """
+        if any(sent[3] == _FAILED for sent in self._inflight):
+            return 0
+        pending = sum(1 for sent in self._inflight if sent[3] == _PENDING)
+        if not pending:
+            return 1
+        return REMOTE_KEY_QUEUE_SIZE - self._queue_depth - pending
+
+    def _settle_inflight(self, now_ms: int) -> None:
+        """Retire answered events; once none is pending, queue failed ones again.
+
+        The firmware checks each press and release against the ones queued
+        before it, so a failed event may not be overtaken: nothing new goes
+        out until every event in flight is answered. Failed events are then
+        sent again in their order, except those a later accepted event
+        already overtook; sending those now would reorder or repeat keys.
+        """
+        inflight = self._inflight
+        while inflight and inflight[0][3] in (_ACCEPTED, _DROPPED):
+            inflight.pop(0)
+        if not inflight or any(sent[3] == _PENDING for sent in inflight):
+            return
+
+        last_accepted = max((i for i, sent in enumerate(inflight) if sent[3] == _ACCEPTED), default=-1)
+        resend = []
+        for i, (_seq, event, _deadline, state) in enumerate(inflight):
+            if state != _FAILED:
+                continue
+            key_code, action, key_name, retries = event
+            act = "press" if action == ACTION_PRESS else "release"
+            if i < last_accepted:
+                self.on_status(f"Dropped {key_name} {act}: overtaken by later keys")
+            elif retries >= BUTTON_RETRY_LIMIT:
+                self.on_status(f"Dropped {key_name} {act}: retry limit exceeded")
+            else:
+                resend.append((key_code, action, key_name, retries + 1))
+        inflight.clear()
+        self._button_queue.extendleft(reversed(resend))
+        self._next_button_ms = now_ms + BUTTON_GAP_MS
+
+    def _start_session(self, now_ms: int) -> None:
+        self._session_pending = True
+        self._last_session_attempt_ms = now_ms
+        self._session_deadline_ms = now_ms + SESSION_TIMEOUT_MS
+        # Any 32-bit value the firmware echoes back; it stays valid until
+        # an ACK says stale
+        self._session_ts = int(time.time() * 1000) & 0xFFFFFFFF
+        payload = bytearray(4)
+        payload[0:4] = self._word_le(self._session_ts)
+        self.on_diag(f"TX 0x0514 session_init ts=0x{self._session_ts:08X}")
+        self._send_cmd(MSG_SESSION_INIT, payload)
+
+    def _send_cmd(self, msg_type: int, payload: bytes) -> None:
+        msg = bytearray(4 + len(payload))
+        msg[0:2] = self._hw_le(msg_type)
+        msg[2:4] = self._hw_le(len(payload))
+        msg[4 : 4 + len(payload)] = payload
+
+        msg_len = len(msg)
+        if msg_len % 2:
+            msg += b"\x00"
+            msg_len += 1
+
+        packet = bytearray(8 + msg_len)
+        packet[0:2] = b"\xAB\xCD"
+        packet[2:4] = self._hw_le(msg_len)
+        packet[4 : 4 + msg_len] = msg
+
+        crc = self._calc_crc(packet, 4, msg_len)
+        packet[4 + msg_len : 6 + msg_len] = self._hw_le(crc)
+        packet[6 + msg_len : 8 + msg_len] = b"\xDC\xBA"
+
+        body = bytearray(packet[4 : 6 + msg_len])
+        self._obfus(body)
+        packet[4 : 6 + msg_len] = body
+
+        self._serial.write(packet)
+        self.on_tx(bytes(packet))
+
+    @staticmethod
+    def _obfus(buf: bytearray) -> None:
+        n = len(OBFUS_TBL)
+        for i in range(len(buf)):
+            buf[i] ^= OBFUS_TBL[i % n]
+
+    @staticmethod
+    def _hw_le(n: int) -> bytes:
+        return bytes((n & 0xFF, (n >> 8) & 0xFF))
+
+    @staticmethod
+    def _word_le(n: int) -> bytes:
+        return bytes((n & 0xFF, (n >> 8) & 0xFF, (n >> 16) & 0xFF, (n >> 24) & 0xFF))
+
+    @staticmethod
+    def _calc_crc(buf: bytearray, off: int, size: int) -> int:
+        crc = 0
+        for i in range(size):
+            b = buf[off + i] & 0xFF
+            crc ^= b << 8
+            for _ in range(8):
+                if (crc >> 15) & 1:
+                    crc = ((crc << 1) ^ 0x1021) & 0xFFFF
+                else:
+                    crc = (crc << 1) & 0xFFFF
+        return crc
+
+    def _apply_diff(self, payload: bytes) -> int:
+        """Apply diff chunks to the frame, return the dirty-block mask"""
+        dirty = 0
+        i = 0
+        while i + 9 <= len(payload):
+            block = payload[i]
+            i += 1
+            if block >= 128:
+                break
+            self.frame[block * 8:block * 8 + 8] = payload[i:i + 8]
+            dirty |= 1 << block
+            i += 8
+        return dirty
@@ -0,0 +1,222 @@
+# Copyright (c) 2025 muzkr
+#
+#   https://github.com/muzkr
+#
+# Licensed under the MIT License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at the root of this repository.
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+
+"""
+Host-side read-through cache of radio memory
+
+One image per radio and firmware version, keyed '<uid>-<version>'. 0x0515
+carries no UID, so unless one is given the UID is a hash of the unit's
+calibration block, which is read on every connect anyway to check it.
+
+Binding a session: calibration read -> image loaded -> SPOT_CHECKS reads of
+cached spans compared against the radio. Any mismatch drops the whole image.
+Regions the radio itself rewrites in normal use (VFO, settings) are never
+trusted from a previous connect.
+
+Once bound, reads of known blocks are served from the image and every reply
+updates the image. A write is acknowledged without sending only if the
+radio was seen holding that data in this session: a block known from a
+previous connect may have been edited on the keypad since, and the spot
+checks cover only a few spans. Images are saved when the session goes idle.
+
+Image file: 64 KiB of memory (the whole 0x051B address space), then one
+byte per 16-byte block, 1 if known.
+"""
+
+import hashlib
+import os
+import random
+import re
+import _layout as ll
+import _session as ss
+
+SPACE = 0x10000
+_BS = ll.BLOCK_SIZE
+
+# Spans of READ_MAX bytes compared on connect
+SPOT_CHECKS = 8
+
+# Rewritten by the radio itself: VFO state, settings
+VOLATILE = ((ll.VFO_BASE, ll.VFO_END), (ll.SETTINGS_BASE, ll.SETTINGS_END))
+
+
+class MemCache:
+
+    def __init__(self, root: str, uid: str | None = None):
+        self.root = root
+        self.uid = uid
+        self.hits = 0
+        self.misses = 0
+        self.skipped_writes = 0
+        os.makedirs(root, exist_ok=True)
+
+    def bind(self, session: ss.Session, version: str) -> "Binder":
+        return Binder(self, session, version)
+
+    def load(self, key: str) -> "Image":
+
+        img = Image(self, key)
+        file = img.file()
+        if os.path.exists(file):
+            with open(file, "rb") as fd:
+                raw = fd.read()
+            if SPACE + SPACE // _BS == len(raw):
+                img.data[:] = raw[:SPACE]
+                img.valid[:] = raw[SPACE:]
+        return img
+
+    def save(self, img: "Image"):
+
+        file = img.file()
+        tmp = file + ".tmp"
+        with open(tmp, "wb") as fd:
+            fd.write(img.data)
+            fd.write(img.valid)
+        os.replace(tmp, file)
+        img.dirty = False
+
+    def report(self) -> str:
+        return "Cache: {} reads served, {} sent, {} writes skipped".format(
+            self.hits, self.misses, self.skipped_writes
+        )
+
+
+class Image:
+
+    def __init__(self, cache: MemCache, key: str):
+        self.cache = cache
+        self.key = key
+        self.data = bytearray(b"\xff" * SPACE)
+        self.valid = bytearray(SPACE // _BS)
+        # Blocks read or written in this session; not saved
+        self.seen = bytearray(SPACE // _BS)
+        self.dirty = False
+
+    def file(self) -> str:
+        return os.path.join(self.cache.root, self.key + ".img")
+
+    def known(self) -> int:
+        return sum(self.valid)
+
+    def has(self, off: int, size: int) -> bool:
+        if off + size > SPACE:
+            return False
+        first, last = off // _BS, (off + size - 1) // _BS
+        return all(self.valid[first : last + 1])
+
+    def get(self, off: int, size: int) -> bytes:
+        return bytes(self.data[off : off + size])
+
+    def same(self, off: int, data: bytes) -> bool:
+        """True if the radio is known to hold `data` at `off` already"""
+        return self.has(off, len(data)) and self.data[off : off + len(data)] == data
+
+    def held(self, off: int, data: bytes) -> bool:
+        """True if the radio was seen holding `data` at `off` in this session"""
+        if not self.same(off, data):
+            return False
+        first, last = off // _BS, (off + len(data) - 1) // _BS
+        return all(self.seen[first : last + 1])
+
+    def update(self, off: int, data: bytes):
+
+        end = min(off + len(data), SPACE)
+        if end <= off:
+            return
+        self.data[off:end] = data[: end - off]
+
+        # Only fully covered blocks become known
+        first = -(-off // _BS)
+        for blk in range(first, end // _BS):
+            self.valid[blk] = 1
+            self.seen[blk] = 1
+        self.dirty = True
+
+    def forget(self, start: int, end: int):
+        for blk in range(start // _BS, -(-end // _BS)):
+            self.valid[blk] = 0
+            self.seen[blk] = 0
+        self.dirty = True
+
+    def clear(self):
+        self.valid[:] = bytes(len(self.valid))
+        self.seen[:] = bytes(len(self.seen))
+        self.dirty = True
+
+
+class Binder:
+    """Identifies the radio behind a session and checks its cached image"""
+
+    def __init__(self, cache: MemCache, session: ss.Session, version: str):
+        self.cache = cache
+        self.session = session
+        self.version = version
+        self.image: Image | None = None
+        self.calib = bytearray(ll.CALIB_END - ll.CALIB_BASE)
+        self.calib_left = len(self.calib)
+        self.spots = 0
+        self.stale = False
+
+        session.read_raw(ll.CALIB_BASE, len(self.calib), self.on_calib)
+
+    def on_calib(self, off: int, data: bytes):
+
+        self.calib[off - ll.CALIB_BASE : off - ll.CALIB_BASE + len(data)] = data
+        self.calib_left -= len(data)
+        if self.calib_left > 0:
+            return
+
+        uid = self.cache.uid or hashlib.sha256(self.calib).hexdigest()[:16]
+        key = re.sub(r"[^A-Za-z0-9._-]", "_", f"{uid}-{self.version}")
+        img = self.image = self.cache.load(key)
+
+        # Spot-check spans that are fully cached, outside what was just read
+        spans = [
+            off
+            for off in range(0, SPACE, ss.READ_MAX)
+            if img.has(off, ss.READ_MAX)
+            and not ll.CALIB_BASE <= off < ll.CALIB_END
+        ]
+        for off in random.sample(spans, min(SPOT_CHECKS, len(spans))):
+            self.spots += 1
+            self.session.read_raw(off, ss.READ_MAX, self.on_spot)
+
+        if 0 == self.spots:
+            self.done()
+
+    def on_spot(self, off: int, data: bytes):
+
+        if not self.image.same(off, data):
+            self.stale = True
+        self.spots -= 1
+        if 0 == self.spots:
+            self.done()
+
+    def done(self):
+
+        img = self.image
+        known = img.known()
+        if self.stale:
+            print("Cache: radio changed since last time, image dropped")
+            img.clear()
+        elif known:
+            print(f"Cache: {img.key}, {known} blocks known")
+        else:
+            print(f"Cache: {img.key}, new image")
+
+        for start, end in VOLATILE:
+            img.forget(start, end)
+        img.update(ll.CALIB_BASE, bytes(self.calib))
+        self.session.bound(img)
@@ -0,0 +1,314 @@
+# Copyright (c) 2025 muzkr
+#
+#   https://github.com/muzkr
+#
+# Licensed under the MIT License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at the root of this repository.
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+
+"""
+Memory channel export / import
+
+Only the channel, name and attribute blocks of the selected channels are
+read, and only the 16-byte blocks whose content actually changes are written.
+"""
+
+from serial import Serial
+import csv
+import json
+import _layout as ll
+import _session as ss
+
+
+def parse_channels(spec: str | None) -> list[int]:
+    """'1-50,60' -> 0-based channel list. None -> all channels"""
+
+    if not spec:
+        return list(range(ll.CHANNEL_COUNT))
+
+    chs = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            a, b = part.split("-", 1)
+            a, b = int(a), int(b)
+        else:
+            a = b = int(part)
+        if a < 1 or b > ll.CHANNEL_COUNT or a > b:
+            raise ValueError("Invalid channel range '{}'".format(part))
+        chs.update(range(a - 1, b))
+
+    return sorted(chs)
+
+
+def load_rows(file: str) -> list[dict]:
+
+    if file.lower().endswith(".json"):
+        with open(file, "r") as fd:
+            rows = json.load(fd)
+    else:
+        with open(file, "r", newline="") as fd:
+            rows = list(csv.DictReader(fd))
+
+    for row in rows:
+        ch = int(row["channel"])
+        if ch < 1 or ch > ll.CHANNEL_COUNT:
+            raise ValueError("Invalid channel number {}".format(ch))
+
+    return rows
+
+
+def save_rows(file: str, rows: list[dict]):
+
+    if file.lower().endswith(".json"):
+        with open(file, "w") as fd:
+            json.dump(rows, fd, indent=1)
+    else:
+        with open(file, "w", newline="") as fd:
+            w = csv.DictWriter(fd, fieldnames=ll.CHANNEL_FIELDS)
+            w.writeheader()
+            w.writerows(rows)
+
+
+def channel_blocks(chs) -> set:
+    """Blocks holding the record, name and attribute of each channel"""
+
+    blocks = set()
+    for ch in chs:
+        blocks.add(ll.block_of(ll.channel_addr(ch)))
+        blocks.add(ll.block_of(ll.name_addr(ch)))
+        blocks.add(ll.block_of(ll.attr_addr(ch)))
+    return blocks
+
+
+def apply_rows(image: dict, rows: list[dict]) -> dict:
+    """
+    Apply channel rows onto `image` ({block addr: bytes}).
+    Returns the blocks whose content changes
+    """
+
+    new = {blk: bytearray(data) for blk, data in image.items()}
+
+    def view(addr: int, size: int) -> bytes:
+        blk = ll.block_of(addr)
+        off = addr - blk
+        return bytes(new[blk][off : off + size])
+
+    def put(addr: int, data: bytes):
+        blk = ll.block_of(addr)
+        off = addr - blk
+        new[blk][off : off + len(data)] = data
+
+    for row in rows:
+        ch = int(row["channel"]) - 1
+
+        rec = view(ll.channel_addr(ch), ll.CHANNEL_SIZE)
+        name = view(ll.name_addr(ch), ll.NAME_SIZE)
+        attr = int.from_bytes(view(ll.attr_addr(ch), ll.ATTR_SIZE), "little")
+
+        if "rx_freq" not in row:
+            # No frequency column: edit the channel as it is
+            if not ll.is_channel_used(rec, attr):
+                raise ValueError("Channel {} is empty and has no rx_freq".format(ch + 1))
+            row = {**ll.decode_channel(ch, rec, name, attr), **row}
+
+        if str(row["rx_freq"]).strip() in ("", "0"):
+            # Delete channel
+            if not ll.is_channel_used(rec, attr):
+                continue
+            rec2, attr2 = ll.empty_channel()
+            name2 = bytes(ll.NAME_SIZE)
+        else:
+            rec2, attr2 = ll.encode_channel(row, rec, attr)
+
+            name2 = name
+            name_str = str(row.get("name") or "").strip()
+            if "name" in row and ll.decode_name(name) != name_str:
+                name2 = ll.encode_name(name_str)
+
+            # Same meaning, keep raw bytes as they are
+            if ll.is_channel_used(rec, attr) and ll.decode_channel(
+                ch, rec, name, attr
+            ) == ll.decode_channel(ch, rec2, name, attr2):
+                rec2, attr2 = rec, attr
+
+        put(ll.channel_addr(ch), rec2)
+        put(ll.name_addr(ch), name2)
+        put(ll.attr_addr(ch), attr2.to_bytes(ll.ATTR_SIZE, "little"))
+
+    return {blk: bytes(data) for blk, data in new.items() if data != image[blk]}
+
+
+class ChannelExport:
+
+    def __init__(self, ser: Serial, file: str, chs: list[int], all: bool = False):
+        self._session = ss.Session(ser)
+        self._file = file
+        self._chs = chs
+        self._all = all
+        self._state = _Connect(self)
+
+    def loop(self) -> bool:
+        return ss.step(self)
+
+    def after_connect(self):
+        return _ReadBlocks(self, channel_blocks(self._chs))
+
+    def after_read(self, image: dict) -> bool:
+
+        rows = []
+        for ch in self._chs:
+            rec = _get(image, ll.channel_addr(ch), ll.CHANNEL_SIZE)
+            name = _get(image, ll.name_addr(ch), ll.NAME_SIZE)
+            attr = int.from_bytes(
+                _get(image, ll.attr_addr(ch), ll.ATTR_SIZE), "little"
+            )
+            if self._all or ll.is_channel_used(rec, attr):
+                rows.append(ll.decode_channel(ch, rec, name, attr))
+
+        save_rows(self._file, rows)
+        print("{} channels saved to {}".format(len(rows), self._file))
+        return False
+
+
+class ChannelImport:
+
+    def __init__(
+        self,
+        ser: Serial,
+        rows: list[dict],
+        dry_run: bool = False,
+        reboot: bool = True,
+    ):
+        self._session = ss.Session(ser)
+        self._rows = rows
+        self._dry_run = dry_run
+        self._reboot = reboot
+        self._state = _Connect(self)
+
+    def loop(self) -> bool:
+        return ss.step(self)
+
+    def after_connect(self):
+        chs = [int(row["channel"]) - 1 for row in self._rows]
+        # From the radio: blocks are patched, and written only if they change
+        return _ReadBlocks(self, channel_blocks(chs), cached=False)
+
+    def after_read(self, image: dict):
+
+        try:
+            changes = apply_rows(image, self._rows)
+        except (KeyError, ValueError) as e:
+            print("Invalid channel data: {}".format(e))
+            return False
+
+        print(
+            "{} channels, {} of {} blocks changed".format(
+                len(self._rows), len(changes), len(image)
+            )
+        )
+
+        if self._dry_run:
+            for blk in sorted(changes):
+                print(f"  {blk:04x}: {changes[blk].hex(' ')}")
+            return False
+
+        if not changes:
+            print("Nothing to write")
+            return False
+
+        return _WriteBlocks(self, changes)
+
+    def after_write(self):
+        if self._reboot:
+            print("Rebooting device..")
+            self._session.reboot()
+        return False
+
+
+class _State:
+    def __init__(self, op):
+        self.op = op
+        self.session: ss.Session = op._session
+
+    def loop(self) -> bool | object:
+        raise NotImplementedError()
+
+
+class _Connect(_State):
+
+    def loop(self):
+        if not self.session.connect():
+            return None
+        return self.op.after_connect()
+
+
+class _ReadBlocks(_State):
+
+    def __init__(self, op, blocks, cached: bool = True):
+        super().__init__(op)
+        self.image = {}
+        self.total = len(blocks)
+        self.per = -1
+
+        def on_data(off: int, data: bytes):
+            for i in range(0, len(data), ll.BLOCK_SIZE):
+                self.image[off + i] = data[i : i + ll.BLOCK_SIZE]
+
+        for off, size in ss.coalesce(blocks):
+            self.session.read(off, size, on_data, cached)
+
+    def loop(self):
+
+        if self.session.loop():
+            per = len(self.image) * 100 // max(1, self.total)
+            if per != self.per:
+                self.per = per
+                print(f"Fetching data.. {per}%")
+            return None
+
+        print("Fetching data.. 100%")
+        return self.op.after_read(self.image)
+
+
+class _WriteBlocks(_State):
+
+    def __init__(self, op, blocks: dict):
+        super().__init__(op)
+        self.done = 0
+        self.total = len(blocks)
+        self.per = -1
+
+        def on_done(off: int):
+            self.done += 1
+
+        for off in sorted(blocks):
+            self.session.write(off, blocks[off], on_done)
+
+    def loop(self):
+
+        if self.session.loop():
+            per = self.done * 100 // self.total
+            if per != self.per:
+                self.per = per
+                print(f"Writting data.. {per}%")
+            return None
+
+        print("Writting data.. 100%")
+        print("Done")
+        return self.op.after_write()
+
+
+def _get(image: dict, addr: int, size: int) -> bytes:
+    blk = ll.block_of(addr)
+    off = addr - blk
+    return image[blk][off : off + size]
@@ -0,0 +1,245 @@
+# Copyright (c) 2025 muzkr
+#
+#   https://github.com/muzkr
+#
+# Licensed under the MIT License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at the root of this repository.
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+
+"""
+Radio-to-radio clone
+
+The source is read once. Every target reads its own copy of the same blocks
+at the same time, and as soon as a block is known on both sides it is written
+if it differs, then read back. All sessions are pipelined and stepped from one
+loop, so targets write while the source read is still going. Reads and
+writes bypass the memory cache: a cached block may be out of date.
+"""
+
+from serial import Serial
+import time
+import _layout as ll
+import _session as ss
+
+# Re-writes of a block whose read-back does not match
+VERIFY_RETRY = 3
+
+
+def clone_blocks(calib: bool = False) -> list[int]:
+    """Block addresses to clone, calibration only if asked for"""
+
+    blocks = []
+    for name, start, end in ll.REGIONS:
+        if "calibration" == name and not calib:
+            continue
+        blocks.extend(range(ll.block_of(start), end, ll.BLOCK_SIZE))
+    return blocks
+
+
+class Clone:
+
+    def __init__(
+        self,
+        ser: Serial,
+        targets: list[tuple[str, Serial]],
+        calib: bool = False,
+        reboot: bool = True,
+    ):
+        self._session = ss.Session(ser)
+        self._targets = [_Target(name, ss.Session(t)) for name, t in targets]
+        self._blocks = clone_blocks(calib)
+        self._reboot = reboot
+        self._state = _Connect(self)
+
+    def loop(self) -> bool:
+        return ss.step(self)
+
+
+class _Target:
+
+    def __init__(self, name: str, session: ss.Session):
+        self.name = name
+        self.session = session
+        self.src = {}
+        self.own = {}
+        self.retries = {}
+        self.written = set()
+        self.done = set()
+        self.failed = set()
+        self.error = None
+
+    def start(self, blocks: list[int]):
+        for off, size in ss.coalesce(blocks):
+            self.session.read(off, size, self.on_own, cached=False)
+
+    def on_own(self, off: int, data: bytes):
+        for i in range(0, len(data), ll.BLOCK_SIZE):
+            blk = off + i
+            self.own[blk] = data[i : i + ll.BLOCK_SIZE]
+            self.check(blk)
+
+    def on_src(self, blk: int, data: bytes):
+        self.src[blk] = data
+        self.check(blk)
+
+    def check(self, blk: int):
+        if blk not in self.src or blk not in self.own:
+            return
+        if self.src[blk] == self.own[blk]:
+            self.done.add(blk)
+        else:
+            self.write(blk)
+
+    def write(self, blk: int):
+        self.written.add(blk)
+        self.session.write(blk, self.src[blk], self.on_written, cached=False)
+
+    def on_written(self, blk: int):
+        self.session.read(blk, ll.BLOCK_SIZE, self.on_read_back, cached=False)
+
+    def on_read_back(self, blk: int, data: bytes):
+
+        if data == self.src[blk]:
+            self.done.add(blk)
+            return
+
+        n = self.retries.get(blk, 0) + 1
+        self.retries[blk] = n
+        if n > VERIFY_RETRY:
+            print(f"{self.name}: verify failed at {blk:04x}")
+            self.failed.add(blk)
+            return
+
+        self.write(blk)
+
+    def loop(self) -> bool:
+        """Returns False when idle or failed"""
+
+        if self.error:
+            return False
+        try:
+            return self.session.loop()
+        except ss.SessionError as e:
+            print(f"{self.name}: {e}")
+            self.error = str(e)
+            return False
+
+
+class _State:
+    def __init__(self, op: Clone):
+        self.op = op
+        self.session: ss.Session = op._session
+        self.targets: list[_Target] = op._targets
+
+    def loop(self) -> bool | object:
+        raise NotImplementedError()
+
+
+class _Connect(_State):
+
+    def __init__(self, op: Clone):
+        super().__init__(op)
+        self.src_ready = False
+        self.ready = set()
+
+    def loop(self):
+
+        if not self.src_ready and self.session.connect():
+            print("Source ready")
+            self.src_ready = True
+
+        for t in self.targets:
+            if t.name in self.ready or t.error:
+                continue
+            try:
+                if t.session.connect():
+                    print(f"{t.name} ready")
+                    self.ready.add(t.name)
+            except ss.SessionError as e:
+                print(f"{t.name}: {e}")
+                t.error = str(e)
+
+        if not self.src_ready:
+            return None
+        if any(t.name not in self.ready and not t.error for t in self.targets):
+            return None
+
+        return _Copy(self.op)
+
+
+class _Copy(_State):
+
+    def __init__(self, op: Clone):
+        super().__init__(op)
+        self.blocks = op._blocks
+        self.received = 0
+        self.t0 = time.monotonic()
+        self.next_report = self.t0 + 1.0
+
+        for t in self.targets:
+            if not t.error:
+                t.start(self.blocks)
+
+        for off, size in ss.coalesce(self.blocks):
+            self.session.read(off, size, self.on_src, cached=False)
+
+    def on_src(self, off: int, data: bytes):
+        self.received += len(data) // ll.BLOCK_SIZE
+        for i in range(0, len(data), ll.BLOCK_SIZE):
+            for t in self.targets:
+                if not t.error:
+                    t.on_src(off + i, data[i : i + ll.BLOCK_SIZE])
+
+    def report(self):
+        total = len(self.blocks)
+        parts = [f"source {self.received * 100 // total}%"]
+        for t in self.targets:
+            if t.error:
+                parts.append(f"{t.name} failed")
+            else:
+                parts.append(f"{t.name} {len(t.done) * 100 // total}%")
+        print(", ".join(parts))
+
+    def loop(self):
+
+        busy = self.session.loop()
+        for t in self.targets:
+            if t.loop():
+                busy = True
+
+        now = time.monotonic()
+        if busy:
+            if now >= self.next_report:
+                self.next_report = now + 1.0
+                self.report()
+            return None
+
+        self.report()
+        print(f"Clone done in {now - self.t0:.1f} s")
+
+        for t in self.targets:
+            if t.error or t.failed or len(t.done) != len(self.blocks):
+                print(
+                    "{}: FAILED, {} of {} blocks verified".format(
+                        t.name, len(t.done), len(self.blocks)
+                    )
+                )
+                continue
+
+            print(
+                "{}: {} blocks written, {} re-written, all verified".format(
+                    t.name, len(t.written), len(t.retries)
+                )
+            )
+            if t.written and self.op._reboot:
+                print(f"{t.name}: rebooting..")
+                t.session.reboot()
+
+        return False
@@ -0,0 +1,212 @@
+# Copyright (c) 2025 muzkr
+#
+#   https://github.com/muzkr
+#
+# Licensed under the MIT License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at the root of this repository.
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+
+"""
+Block-level diff of dump images
+
+Dumps are images in the _layout address space (_layout.IMAGES); a config dump
+and a calibration dump share no address, a full dump and a config dump are
+compared over the configuration. Differences are named by address.
+
+Dumps are compared 16 bytes at a time against a reference image. With NumPy
+installed, a whole fleet is compared in one vectorized pass; otherwise
+identical images are skipped with a single bytes compare and the rest are
+narrowed down 256 bytes, then 16 bytes at a time.
+"""
+
+from collections import Counter
+import os
+import _layout as ll
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_CHUNK = 256
+
+
+def list_dumps(paths: list[str]) -> list[str]:
+    """Expand directories to the files in them"""
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                file = os.path.join(path, name)
+                if os.path.isfile(file):
+                    files.append(file)
+        else:
+            files.append(path)
+    return files
+
+
+def image_base(file: str, data: bytes) -> int:
+    """Address of the first byte of a dump image. ValueError if it is none"""
+    try:
+        return ll.image_span(len(data))[1]
+    except ValueError as e:
+        raise ValueError("{}: {}".format(file, e))
+
+
+def _common(a: bytes, b: bytes) -> tuple[int, int]:
+    """Address range both images cover, (lo, hi); empty if lo >= hi"""
+    base_a = ll.image_span(len(a))[1]
+    base_b = ll.image_span(len(b))[1]
+    return max(base_a, base_b), min(base_a + len(a), base_b + len(b))
+
+
+def _part(data: bytes, lo: int, hi: int) -> bytes:
+    base = ll.image_span(len(data))[1]
+    return data[lo - base : hi - base]
+
+
+def diff_blocks(a: bytes, b: bytes) -> list[int]:
+    """Addresses of the 16-byte blocks that differ over the common length"""
+
+    n = min(len(a), len(b))
+    blocks = []
+    if a[:n] == b[:n]:
+        return blocks
+
+    BS = ll.BLOCK_SIZE
+    with memoryview(a) as va, memoryview(b) as vb:
+        for off in range(0, n, _CHUNK):
+            end = min(off + _CHUNK, n)
+            if va[off:end] == vb[off:end]:
+                continue
+            for blk in range(off, end, BS):
+                if va[blk : blk + BS] != vb[blk : blk + BS]:
+                    blocks.append(blk)
+
+    return blocks
+
+
+def diff_fleet(ref: bytes, images: list[bytes]) -> list[list[int]]:
+    """diff_blocks() of every image against `ref`"""
+
+    if np is None or not images:
+        return [diff_blocks(ref, img) for img in images]
+
+    BS = ll.BLOCK_SIZE
+    result = [None] * len(images)
+
+    # Stack same-sized images so that each size group is one compare
+    groups: dict[int, list[int]] = {}
+    for i, img in enumerate(images):
+        n = min(len(ref), len(img)) // BS * BS
+        groups.setdefault(n, []).append(i)
+
+    for n, idx in groups.items():
+        if 0 == n:
+            for i in idx:
+                result[i] = diff_blocks(ref, images[i])
+            continue
+
+        r = np.frombuffer(ref, np.uint8, n).reshape(-1, BS)
+        m = np.stack([np.frombuffer(images[i], np.uint8, n) for i in idx])
+        m = m.reshape(len(idx), -1, BS)
+        diff = (m != r).any(axis=2)
+        for k, i in enumerate(idx):
+            result[i] = [int(blk) * BS for blk in np.flatnonzero(diff[k])]
+            tail = diff_blocks(ref[n:], images[i][n:])
+            result[i].extend(n + blk for blk in tail)
+
+    return result
+
+
+def describe_block(a: bytes, b: bytes, blk: int, base: int = 0) -> list[str]:
+    """Names of the fields that differ within one block; `base` is the address of a[0]"""
+
+    names = []
+    end = min(blk + ll.BLOCK_SIZE, len(a), len(b))
+    for off in range(blk, end):
+        if a[off] != b[off]:
+            name = ll.describe(base + off)
+            if name not in names:
+                names.append(name)
+    return names
+
+
+def report_pair(file_a: str, a: bytes, file_b: str, b: bytes, verbose: bool):
+
+    lo, hi = _common(a, b)
+    if lo >= hi:
+        print(f"{file_a} <-> {file_b}: no address in common")
+        return
+    if len(a) != len(b):
+        print(f"Size differs: {file_a} {len(a)}, {file_b} {len(b)}; compared {lo:04x}-{hi:04x}")
+    a = _part(a, lo, hi)
+    b = _part(b, lo, hi)
+
+    blocks = diff_blocks(a, b)
+    print(f"{file_a} <-> {file_b}: {len(blocks)} blocks differ")
+
+    for blk in blocks:
+        print(f"  {lo + blk:04x}  {', '.join(describe_block(a, b, blk, lo))}")
+        if verbose:
+            end = blk + ll.BLOCK_SIZE
+            print(f"     - {a[blk:end].hex(' ')}")
+            print(f"     + {b[blk:end].hex(' ')}")
+
+
+def report_fleet(file_ref: str, ref: bytes, files: list[str], images: list[bytes]):
+
+    # One diff_fleet() per address range the images share with `ref`
+    ranges: dict[tuple[int, int], list[int]] = {}
+    for i, img in enumerate(images):
+        ranges.setdefault(_common(ref, img), []).append(i)
+
+    # Per image: (address of the parts, part of ref, part of image, blocks)
+    results = [None] * len(images)
+    for (lo, hi), idx in ranges.items():
+        if lo >= hi:
+            continue
+        r = _part(ref, lo, hi)
+        parts = [_part(images[i], lo, hi) for i in idx]
+        for i, part, blocks in zip(idx, parts, diff_fleet(r, parts)):
+            results[i] = (lo, r, part, blocks)
+
+    same = 0
+    counter = Counter()
+    for file, img, result in zip(files, images, results):
+
+        if result is None:
+            print(f"{file}: no address in common")
+            continue
+        lo, r, part, blocks = result
+        if not blocks and len(img) == len(ref):
+            same += 1
+            continue
+
+        names = []
+        for blk in blocks:
+            for name in describe_block(r, part, blk, lo):
+                if name not in names:
+                    names.append(name)
+        counter.update(names)
+
+        size = "" if len(img) == len(ref) else f", size {len(img)}"
+        shown = ", ".join(names[:6])
+        if len(names) > 6:
+            shown += f", .. +{len(names) - 6}"
+        print(f"{file}: {len(blocks)} blocks{size} ({shown})")
+
+    print(f"{same} of {len(files)} identical to {file_ref}")
+
+    if counter:
+        print("Most frequent differences:")
+        for name, cnt in counter.most_common(10):
+            print(f"  {cnt:5}  {name}")
@@ -0,0 +1,289 @@
+# Copyright (c) 2025 muzkr
+#
+#   https://github.com/muzkr
+#
+# Licensed under the MIT License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at the root of this repository.
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+
+"""
+Cross-fleet channel and settings index
+
+Dumps are decoded once into an SQLite file:
+
+    dumps       one row per indexed dump: source, radio UID, time
+    channels    one row per used channel of a dump, CHANNEL_FIELDS columns
+    settings    one row per dump, one column per SETTINGS_FIELDS entry
+                (numbers up to 2 bytes, hex otherwise), plus aes_key_set
+
+Dumps are full or config images in the _layout address space; anything else
+(a calibration dump, an old 0x2000-byte dump) is skipped with a message.
+
+Dump files are keyed by path, mtime and size, backups in a store by manifest
+id, so an update only decodes what is new or changed. The 'latest' view
+holds the newest dump of each radio; queries run against it unless asked
+otherwise.
+"""
+
+from datetime import datetime
+import os
+import sqlite3
+import _layout as ll
+import _store as st
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dumps (
+    id INTEGER PRIMARY KEY,
+    source TEXT UNIQUE,
+    stamp TEXT,
+    uid TEXT,
+    time TEXT
+);
+CREATE TABLE IF NOT EXISTS channels (
+    dump INTEGER,
+    {channel_cols}
+);
+CREATE TABLE IF NOT EXISTS settings (
+    dump INTEGER PRIMARY KEY,
+    {settings_cols},
+    aes_key_set INTEGER
+);
+CREATE INDEX IF NOT EXISTS channels_dump ON channels (dump);
+CREATE INDEX IF NOT EXISTS channels_channel ON channels (channel);
+CREATE INDEX IF NOT EXISTS dumps_uid ON dumps (uid, time);
+CREATE VIEW IF NOT EXISTS latest AS
+    SELECT * FROM dumps d WHERE time = (
+        SELECT MAX(time) FROM dumps WHERE uid = d.uid
+    );
+""".format(
+    channel_cols=",\n    ".join(f'"{k}"' for k in ll.CHANNEL_FIELDS),
+    settings_cols=",\n    ".join(f'"{name}"' for _, _, name in ll.SETTINGS_FIELDS),
+)
+
+TABLES = ("channels", "settings")
+
+
+class FleetIndex:
+
+    def __init__(self, file: str):
+        self._db = sqlite3.connect(file)
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    # ------------------
+    #  Update
+
+    def _known(self) -> dict[str, tuple[int, str]]:
+        return {
+            source: (id, stamp)
+            for id, source, stamp in self._db.execute(
+                "SELECT id, source, stamp FROM dumps"
+            )
+        }
+
+    def _drop(self, id: int):
+        for table in ("channels", "settings"):
+            self._db.execute(f"DELETE FROM {table} WHERE dump = ?", (id,))
+        self._db.execute("DELETE FROM dumps WHERE id = ?", (id,))
+
+    def _add(self, source: str, stamp: str, uid: str, when: str, data: bytes):
+
+        check_image(data)
+        cur = self._db.execute(
+            "INSERT INTO dumps (source, stamp, uid, time) VALUES (?, ?, ?, ?)",
+            (source, stamp, uid, when),
+        )
+        id = cur.lastrowid
+
+        rows = [
+            (id, *(ch[k] for k in ll.CHANNEL_FIELDS)) for ch in decode_channels(data)
+        ]
+        self._db.executemany(
+            "INSERT INTO channels VALUES ({})".format(
+                ", ".join("?" * (1 + len(ll.CHANNEL_FIELDS)))
+            ),
+            rows,
+        )
+
+        settings = decode_settings(data)
+        self._db.execute(
+            "INSERT INTO settings VALUES ({})".format(", ".join("?" * (2 + len(settings)))),
+            (id, *settings.values(), _aes_key_set(data)),
+        )
+
+    def update_files(self, files: list[str]) -> tuple[int, int, int, int]:
+        """
+        Index dump files; UID is the file name without extension.
+        Files that went away are dropped.
+        Returns (added, unchanged, dropped, skipped)
+        """
+
+        known = {
+            source: v
+            for source, v in self._known().items()
+            if not source.startswith("store:")
+        }
+        added = same = skipped = 0
+        for file in files:
+            source = os.path.abspath(file)
+            stat = os.stat(file)
+            stamp = f"{stat.st_mtime_ns}:{stat.st_size}"
+
+            old = known.pop(source, None)
+            if old is not None:
+                if old[1] == stamp:
+                    same += 1
+                    continue
+                self._drop(old[0])
+
+            with open(file, "rb") as fd:
+                data = fd.read()
+            uid = os.path.splitext(os.path.basename(file))[0]
+            when = datetime.fromtimestamp(stat.st_mtime).isoformat(timespec="seconds")
+            try:
+                self._add(source, stamp, uid, when, data)
+            except ValueError as e:
+                print("Skipped {}: {}".format(file, e))
+                skipped += 1
+                continue
+            added += 1
+
+        for id, _ in known.values():
+            self._drop(id)
+
+        self._db.commit()
+        return added, same, len(known), skipped
+
+    def update_store(self, store: st.BackupStore) -> tuple[int, int, int, int]:
+        """Index every backup in a store. Returns (added, unchanged, dropped, skipped)"""
+
+        prefix = "store:{}:".format(os.path.abspath(store.root))
+        known = {
+            source: v
+            for source, v in self._known().items()
+            if source.startswith(prefix)
+        }
+        seen = set()
+        added = same = skipped = 0
+        for uid in store.uids():
+            for when, h, _ in store.history(uid):
+                # Manifests are content-addressed: a known source is unchanged
+                source = f"{prefix}{uid}@{when}/{h}"
+                if source in seen:
+                    continue
+                seen.add(source)
+                if known.pop(source, None) is not None:
+                    same += 1
+                    continue
+
+                try:
+                    self._add(source, h, uid, when, store.get(h))
+                except ValueError as e:
+                    print("Skipped {}@{}: {}".format(uid, when, e))
+                    skipped += 1
+                    continue
+                added += 1
+
+        for id, _ in known.values():
+            self._drop(id)
+
+        self._db.commit()
+        return added, same, len(known), skipped
+
+    # ------------------
+    #  Query
+
+    def query(self, table: str, where: str, all: bool = False) -> tuple[list, list]:
+        """(column names, rows) of `table` matching an SQL condition"""
+
+        if table not in TABLES:
+            raise ValueError("Unknown table '{}'".format(table))
+
+        dumps = "dumps" if all else "latest"
+        try:
+            cur = self._db.execute(
+                f"SELECT d.uid, d.time, t.* FROM {table} t JOIN {dumps} d ON t.dump = d.id"
+                f" WHERE {where or '1'} ORDER BY d.uid, d.time"
+            )
+        except sqlite3.Error as e:
+            raise ValueError("Bad query: {}".format(e))
+        cols = [c[0] for c in cur.description]
+        return cols, cur.fetchall()
+
+    def stats(self) -> tuple[int, int, int]:
+        """(dumps, radios, channel rows)"""
+        return self._db.execute(
+            "SELECT (SELECT COUNT(*) FROM dumps), (SELECT COUNT(DISTINCT uid) FROM dumps),"
+            " (SELECT COUNT(*) FROM channels)"
+        ).fetchone()
+
+
+def check_image(data: bytes):
+    """ValueError unless `data` is an image covering channels and settings"""
+
+    name, base = ll.image_span(len(data))
+    if base > ll.CHANNEL_BASE or base + len(data) < ll.SETTINGS_END:
+        raise ValueError("{} dump does not cover channels and settings".format(name))
+
+
+def decode_channels(data: bytes) -> list[dict]:
+    """Used channels of a check_image() image"""
+
+    chs = []
+    for ch in range(ll.CHANNEL_COUNT):
+        rec = data[ll.channel_addr(ch) : ll.channel_addr(ch) + ll.CHANNEL_SIZE]
+        attr = int.from_bytes(data[ll.attr_addr(ch) : ll.attr_addr(ch) + ll.ATTR_SIZE], "little")
+        if not ll.is_channel_used(rec, attr):
+            continue
+        name = data[ll.name_addr(ch) : ll.name_addr(ch) + ll.NAME_SIZE]
+        chs.append(ll.decode_channel(ch, rec, name, attr))
+    return chs
+
+
+def decode_settings(data: bytes) -> dict:
+    """Settings fields of a check_image() image"""
+
+    fields = {}
+    for addr, size, name in ll.SETTINGS_FIELDS:
+        raw = data[addr : addr + size]
+        fields[name] = int.from_bytes(raw, "little") if size <= 2 else raw.hex()
+    return fields
+
+
+def _aes_key_set(data: bytes) -> int:
+    for addr, size, name in ll.SETTINGS_FIELDS:
+        if "aes_key" == name:
+            key = data[addr : addr + size]
+            return int(key != b"\xff" * size and key != bytes(size))
+    return 0
+
+
+def print_rows(cols: list, rows: list, limit: int | None = None):
+
+    # Leave the internal dump id out
+    keep = [i for i, c in enumerate(cols) if "dump" != c]
+    cols = [cols[i] for i in keep]
+    rows = [[row[i] for i in keep] for row in rows]
+
+    shown = rows if limit is None else rows[:limit]
+    widths = [len(c) for c in cols]
+    for row in shown:
+        for i, v in enumerate(row):
+            widths[i] = max(widths[i], len(str(v)))
+
+    print("  ".join(c.ljust(w) for c, w in zip(cols, widths)))
+    for row in shown:
+        print("  ".join(str(v).ljust(w) for v, w in zip(row, widths)))
+
+    if len(shown) < len(rows):
+        print(f".. {len(rows) - len(shown)} more")
+    print(f"{len(rows)} rows, {len(set(row[0] for row in rows))} radios")
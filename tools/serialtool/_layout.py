@@ -0,0 +1,413 @@
+# Copyright (c) 2025 muzkr
+#
+#   https://github.com/muzkr
+#
+# Licensed under the MIT License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at the root of this repository.
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+
+"""
+Memory map of the radio as seen through 0x051B / 0x051D
+
+Addresses follow `App/driver/eeprom_compat.c`. Gaps between regions read
+back as 0xFF and ignore writes.
+"""
+
+BLOCK_SIZE = 16
+
+CHANNEL_COUNT = 1024
+VFO_ATTR_COUNT = 7
+
+CHANNEL_BASE = 0x0000
+CHANNEL_SIZE = 16
+NAME_BASE = 0x4000
+NAME_SIZE = 16
+NAME_LEN = 10
+ATTR_BASE = 0x8000
+ATTR_SIZE = 2
+VFO_BASE = 0x9000
+VFO_END = 0x90D6
+SETTINGS_BASE = 0xA000
+SETTINGS_END = 0xA170
+CALIB_BASE = 0xB000
+CALIB_END = 0xB200
+
+IMAGE_SIZE = CALIB_END
+
+# (name, begin, end)
+REGIONS = (
+    ("channels", CHANNEL_BASE, CHANNEL_BASE + CHANNEL_COUNT * CHANNEL_SIZE),
+    ("names", NAME_BASE, NAME_BASE + CHANNEL_COUNT * NAME_SIZE),
+    ("attributes", ATTR_BASE, ATTR_BASE + (CHANNEL_COUNT + VFO_ATTR_COUNT) * ATTR_SIZE),
+    ("vfo", VFO_BASE, VFO_END),
+    ("settings", SETTINGS_BASE, SETTINGS_END),
+    ("calibration", CALIB_BASE, CALIB_END),
+)
+
+# Dump images: the address space from `begin` to `end`, byte for byte, so a
+# file offset is an address once `begin` is added. Gaps are 0xFF.
+# (name, begin, end)
+IMAGES = (
+    ("all", 0, IMAGE_SIZE),
+    ("config", 0, SETTINGS_END),
+    ("calibration", CALIB_BASE, CALIB_END),
+)
+
+# (addr, size, name), from SETTINGS_InitEEPROM() / SETTINGS_SaveSettings()
+SETTINGS_FIELDS = (
+    (0xA000, 1, "audio_profile"),
+    (0xA001, 1, "squelch"),
+    (0xA002, 1, "tx_timeout"),
+    (0xA003, 1, "noaa_auto_scan"),
+    (0xA004, 1, "key_lock"),
+    (0xA005, 1, "vox_switch"),
+    (0xA006, 1, "vox_level"),
+    (0xA007, 1, "mic_sensitivity"),
+    (0xA008, 1, "backlight_level"),
+    (0xA009, 1, "channel_display_mode"),
+    (0xA00A, 1, "cross_band"),
+    (0xA00B, 1, "battery_save"),
+    (0xA00C, 1, "dual_watch"),
+    (0xA00D, 1, "backlight_time"),
+    (0xA00E, 1, "tail_tone"),
+    (0xA00F, 1, "vfo_open"),
+    (0xA010, 2, "screen_channel_a"),
+    (0xA012, 2, "mr_channel_a"),
+    (0xA014, 2, "freq_channel_a"),
+    (0xA016, 2, "screen_channel_b"),
+    (0xA018, 2, "mr_channel_b"),
+    (0xA01A, 2, "freq_channel_b"),
+    (0xA01C, 2, "noaa_channel_a"),
+    (0xA01E, 2, "noaa_channel_b"),
+    (0xA020, 8, "fm_config"),
+    (0xA028, 0x80, "fm_channels"),
+    (0xA0A8, 1, "beep_control"),
+    (0xA0A9, 1, "key1_short"),
+    (0xA0AA, 1, "key1_long"),
+    (0xA0AB, 1, "key2_short"),
+    (0xA0AC, 1, "key2_long"),
+    (0xA0AD, 1, "scan_resume_mode"),
+    (0xA0AE, 1, "auto_keypad_lock"),
+    (0xA0AF, 1, "power_on_display_mode"),
+    (0xA0B0, 8, "power_on_password"),
+    (0xA0B8, 1, "voice_prompt"),
+    (0xA0B9, 1, "s0_level"),
+    (0xA0BA, 1, "s9_level"),
+    (0xA0C0, 1, "alarm_mode"),
+    (0xA0C1, 1, "roger"),
+    (0xA0C2, 1, "repeater_tail_tone"),
+    (0xA0C3, 1, "tx_vfo"),
+    (0xA0C4, 1, "battery_type"),
+    (0xA0C8, 0x20, "logo_lines"),
+    (0xA0E8, 1, "dtmf_side_tone"),
+    (0xA0E9, 1, "dtmf_separate_code"),
+    (0xA0EA, 1, "dtmf_group_call_code"),
+    (0xA0EB, 1, "dtmf_decode_response"),
+    (0xA0EC, 1, "dtmf_auto_reset_time"),
+    (0xA0ED, 1, "dtmf_preload_time"),
+    (0xA0EE, 1, "dtmf_first_code_persist"),
+    (0xA0EF, 1, "dtmf_hash_code_persist"),
+    (0xA0F0, 1, "dtmf_code_persist"),
+    (0xA0F1, 1, "dtmf_code_interval"),
+    (0xA0F2, 1, "permit_remote_kill"),
+    (0xA0F8, 8, "ani_dtmf_id"),
+    (0xA100, 8, "kill_code"),
+    (0xA108, 8, "revive_code"),
+    (0xA110, 0x10, "dtmf_up_code"),
+    (0xA120, 0x10, "dtmf_down_code"),
+    (0xA130, 1, "scan_list_default"),
+    (0xA131, 2, "scan_priority_ch1"),
+    (0xA133, 2, "scan_priority_ch2"),
+    (0xA135, 2, "chan_1_call"),
+    (0xA138, 0x10, "aes_key"),
+    (0xA150, 1, "f_lock"),
+    (0xA151, 1, "tx_350"),
+    (0xA152, 1, "killed"),
+    (0xA153, 1, "tx_200"),
+    (0xA154, 1, "tx_500"),
+    (0xA155, 1, "en_350"),
+    (0xA156, 1, "scramble_enable"),
+    (0xA157, 1, "display_flags"),
+    (0xA15C, 1, "set_timer"),
+    (0xA15D, 1, "set_display"),
+    (0xA15E, 1, "set_tot_eot"),
+    (0xA15F, 1, "set_pwr_ptt"),
+    (0xA160, 0x10, "version"),
+)
+
+# (addr, size, name), from SETTINGS_LoadCalibration() / RADIO_ConfigureSquelchAndOutputPower()
+CALIB_FIELDS = (
+    (0xB000, 0xC0, "squelch"),
+    (0xB0C0, 0x10, "rssi"),
+    (0xB0D0, 0x70, "tx_power"),
+    (0xB140, 0x10, "battery"),
+    (0xB150, 0x30, "vox"),
+    (0xB188, 0x08, "misc"),
+)
+
+MODULATIONS = ("FM", "AM", "USB", "BYP", "RAW")
+CODE_TYPES = ("OFF", "CT", "DCS", "DCSR")
+SHIFTS = ("", "+", "-")
+BANDWIDTHS = ("W", "N")
+
+# Lower edges of the frequency bands, in 10 Hz units (App/frequencies.c)
+_BAND_LOWER = (5000000, 10800000, 13700000, 17400000, 35000000, 40000000, 47000000)
+BAND_NONE = 7
+
+
+def channel_addr(ch: int) -> int:
+    return CHANNEL_BASE + ch * CHANNEL_SIZE
+
+
+def name_addr(ch: int) -> int:
+    return NAME_BASE + ch * NAME_SIZE
+
+
+def attr_addr(ch: int) -> int:
+    return ATTR_BASE + ch * ATTR_SIZE
+
+
+def block_of(addr: int) -> int:
+    return addr - (addr % BLOCK_SIZE)
+
+
+def region_blocks(begin: int, end: int) -> list[int]:
+    """Addresses of the blocks of REGIONS that lie within begin..end"""
+
+    blocks = []
+    for _, start, stop in REGIONS:
+        if begin <= start and stop <= end:
+            blocks.extend(range(block_of(start), stop, BLOCK_SIZE))
+    return blocks
+
+
+def image_span(size: int) -> tuple[str, int]:
+    """(name, begin) of the IMAGES entry a dump of `size` bytes is"""
+
+    for name, begin, end in IMAGES:
+        if end - begin == size:
+            return name, begin
+    raise ValueError(
+        "not a dump image: {} bytes, expect {}".format(
+            size, ", ".join(f"{end - begin} ({name})" for name, begin, end in IMAGES)
+        )
+    )
+
+
+def describe(addr: int) -> str:
+    """Name of whatever lives at `addr`, eg. 'channel 5', 'settings squelch'"""
+
+    if addr < CHANNEL_BASE + CHANNEL_COUNT * CHANNEL_SIZE:
+        return "channel {}".format((addr - CHANNEL_BASE) // CHANNEL_SIZE + 1)
+
+    if NAME_BASE <= addr < NAME_BASE + CHANNEL_COUNT * NAME_SIZE:
+        return "name {}".format((addr - NAME_BASE) // NAME_SIZE + 1)
+
+    if ATTR_BASE <= addr < ATTR_BASE + (CHANNEL_COUNT + VFO_ATTR_COUNT) * ATTR_SIZE:
+        ch = (addr - ATTR_BASE) // ATTR_SIZE
+        if ch < CHANNEL_COUNT:
+            return "attr {}".format(ch + 1)
+        return "vfo attr {}".format(ch - CHANNEL_COUNT)
+
+    if VFO_BASE <= addr < VFO_END:
+        return "vfo {}".format((addr - VFO_BASE) // 16)
+
+    for prefix, fields in (("settings", SETTINGS_FIELDS), ("calib", CALIB_FIELDS)):
+        for off, size, name in fields:
+            if off <= addr < off + size:
+                return prefix + " " + name
+
+    if SETTINGS_BASE <= addr < SETTINGS_END:
+        return f"settings +{addr - SETTINGS_BASE:03x}"
+
+    if CALIB_BASE <= addr < CALIB_END:
+        return f"calib +{addr - CALIB_BASE:03x}"
+
+    return f"unmapped {addr:04x}"
+
+
+def freq_band(freq: int) -> int:
+    """Band index of a frequency in 10 Hz units, as FREQUENCY_GetBand()"""
+    for band in range(len(_BAND_LOWER) - 1, -1, -1):
+        if freq >= _BAND_LOWER[band]:
+            return band
+    return 0
+
+
+# -----------------------
+#  Channel records
+
+CHANNEL_FIELDS = (
+    "channel",
+    "name",
+    "rx_freq",
+    "offset",
+    "shift",
+    "modulation",
+    "rx_code_type",
+    "rx_code",
+    "tx_code_type",
+    "tx_code",
+    "power",
+    "bandwidth",
+    "busy_lock",
+    "tx_lock",
+    "reverse",
+    "ptt_id",
+    "dtmf_decode",
+    "step",
+    "compander",
+    "scanlist",
+)
+
+
+def is_channel_used(rec: bytes, attr: int) -> bool:
+    band = attr & 0x07
+    if 0xFFFF == attr or band > 6:
+        return False
+    return _get_word_LE(rec) != 0xFFFFFFFF
+
+
+def decode_channel(ch: int, rec: bytes, name: bytes, attr: int) -> dict:
+    """Decode one memory channel. `ch` is 0-based; the result is 1-based like the radio UI"""
+
+    d4 = rec[12]
+    if 0xFF == d4:
+        d4 = 0x40  # Defaults: TX lock on, everything else off
+    d5 = rec[13]
+    if 0xFF == d5:
+        d5 = 0
+
+    mod = rec[11] >> 4
+    shift = rec[11] & 0x0F
+
+    return {
+        "channel": ch + 1,
+        "name": decode_name(name),
+        "rx_freq": _get_word_LE(rec) * 10,
+        "offset": _get_word_LE(rec, 4) * 10,
+        "shift": SHIFTS[shift] if shift < len(SHIFTS) else "",
+        "modulation": MODULATIONS[mod] if mod < len(MODULATIONS) else "FM",
+        "rx_code_type": _code_type_str(rec[10] & 0x0F),
+        "rx_code": rec[8],
+        "tx_code_type": _code_type_str(rec[10] >> 4),
+        "tx_code": rec[9],
+        "power": (d4 >> 2) & 7,
+        "bandwidth": BANDWIDTHS[(d4 >> 1) & 1],
+        "busy_lock": (d4 >> 5) & 1,
+        "tx_lock": (d4 >> 6) & 1,
+        "reverse": d4 & 1,
+        "ptt_id": (d5 >> 1) & 7,
+        "dtmf_decode": d5 & 1,
+        "step": rec[14],
+        "compander": (attr >> 3) & 3,
+        "scanlist": (attr >> 8) & 0xFF,
+    }
+
+
+def encode_channel(fields: dict, rec: bytes, attr: int = BAND_NONE) -> tuple[bytes, int]:
+    """
+    Encode a decoded channel on top of the current raw record and attribute,
+    so bytes and bits not covered by `fields` (the scan exclude flag and the
+    unused attribute bits) are kept as they are. Returns (record, attribute)
+    """
+
+    rx_freq = int(fields["rx_freq"]) // 10
+    rec = bytearray(rec)
+
+    _put_word_LE(rx_freq, rec)
+    _put_word_LE(int(fields.get("offset", 0) or 0) // 10, rec, 4)
+    rec[8] = int(fields.get("rx_code", 0) or 0) & 0xFF
+    rec[9] = int(fields.get("tx_code", 0) or 0) & 0xFF
+    rec[10] = (_code_type(fields.get("tx_code_type")) << 4) | _code_type(
+        fields.get("rx_code_type")
+    )
+    rec[11] = (_index(MODULATIONS, fields.get("modulation") or "FM", "modulation") << 4) | _index(
+        SHIFTS, fields.get("shift") or "", "shift"
+    )
+    rec[12] = (
+        (_flag(fields.get("tx_lock")) << 6)
+        | (_flag(fields.get("busy_lock")) << 5)
+        | ((int(fields.get("power", 0) or 0) & 7) << 2)
+        | (_index(BANDWIDTHS, fields.get("bandwidth") or "W", "bandwidth") << 1)
+        | _flag(fields.get("reverse"))
+    )
+    rec[13] = ((int(fields.get("ptt_id", 0) or 0) & 7) << 1) | _flag(
+        fields.get("dtmf_decode")
+    )
+    if fields.get("step") not in (None, ""):
+        rec[14] = int(fields["step"]) & 0xFF
+    elif 0xFF == rec[14]:
+        rec[14] = 4  # STEP_12_5kHz
+
+    if (attr & 0x07) > 6:
+        attr = 0  # Empty channel, nothing to keep
+    attr = (
+        (attr & 0xE0)  # exclude (bit 7), unused (bits 5-6)
+        | freq_band(rx_freq)
+        | ((int(fields.get("compander", 0) or 0) & 3) << 3)
+        | ((int(fields.get("scanlist", 0) or 0) & 0xFF) << 8)
+    )
+
+    return bytes(rec), attr
+
+
+def empty_channel() -> tuple[bytes, int]:
+    """Raw record and attribute of a deleted channel"""
+    return b"\xff" * CHANNEL_SIZE, BAND_NONE
+
+
+def decode_name(name: bytes) -> str:
+    name = bytes(name[:NAME_LEN])
+    end = len(name)
+    for i, b in enumerate(name):
+        if 0 == b or 0xFF == b:
+            end = i
+            break
+    return name[:end].decode("ascii", errors="replace").rstrip()
+
+
+def encode_name(s: str) -> bytes:
+    raw = s.encode("ascii", errors="replace")[:NAME_LEN]
+    return raw + bytes(NAME_SIZE - len(raw))
+
+
+def _code_type_str(n: int) -> str:
+    return CODE_TYPES[n] if n < len(CODE_TYPES) else "OFF"
+
+
+def _code_type(s) -> int:
+    if s in (None, ""):
+        return 0
+    return _index(CODE_TYPES, str(s).upper(), "code type")
+
+
+def _index(table: tuple, value, what: str) -> int:
+    if isinstance(value, int):
+        return value
+    value = "" if value is None else str(value).upper()
+    try:
+        return table.index(value)
+    except ValueError:
+        raise ValueError("Invalid {}: '{}'".format(what, value))
+
+
+def _flag(value) -> int:
+    if isinstance(value, str):
+        return 1 if value.strip().lower() in ("1", "y", "yes", "true", "on") else 0
+    return 1 if value else 0
+
+
+def _get_word_LE(buf: bytes, off: int = 0) -> int:
+    return int.from_bytes(buf[off : off + 4], "little")
+
+
+def _put_word_LE(n: int, buf: bytearray, off: int = 0):
+    buf[off : off + 4] = (0xFFFFFFFF & n).to_bytes(4, "little")
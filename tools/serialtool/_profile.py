@@ -0,0 +1,200 @@
+# Copyright (c) 2025 muzkr
+#
+#   https://github.com/muzkr
+#
+# Licensed under the MIT License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at the root of this repository.
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+
+"""
+Profiling of a serialtool run
+
+While active, every _session.step() pass is accounted to the class of the
+state it ran. A pass during which no byte came in counts as waiting, one that
+received data as processing; time between passes is the host loop itself.
+cProfile runs over the whole run, and tracemalloc too if asked for.
+
+Report: plain text, written when the run ends; the raw cProfile data goes
+next to it as <report>.pstats for other viewers.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import time
+import tracemalloc
+import _session as ss
+
+# Lines of cProfile and tracemalloc listings in the report
+TOP = 25
+
+
+class _StateStats:
+
+    def __init__(self):
+        self.passes = 0
+        self.waiting = 0
+        self.wait_time = 0.0
+        self.busy_time = 0.0
+
+
+class Profile:
+
+    def __init__(self, file: str, alloc: bool = False):
+        self._file = file
+        self._alloc = alloc
+        self._cpu = cProfile.Profile()
+        self._states: dict[str, _StateStats] = {}
+        self._t0 = 0.0
+        self._t1 = 0.0
+        self._last = None
+        self._outside = 0.0
+        self._alloc_peak = 0
+        self._snapshot = None
+
+    def start(self):
+        if self._alloc:
+            tracemalloc.start(10)
+        ss.profile = self
+        self._t0 = time.perf_counter()
+        self._cpu.enable()
+
+    def stop(self):
+        self._cpu.disable()
+        self._t1 = time.perf_counter()
+        ss.profile = None
+        if self._alloc:
+            self._alloc_peak = tracemalloc.get_traced_memory()[1]
+            self._snapshot = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+
+    def step(self, op, run) -> bool:
+        """Run one step() pass and account it"""
+
+        name = type(op._state).__name__
+        rx = ss.Session.rx_total
+        t0 = time.perf_counter()
+        if self._last is not None:
+            self._outside += t0 - self._last
+
+        ok = run(op)
+
+        t1 = time.perf_counter()
+        self._last = t1
+
+        st = self._states.get(name)
+        if st is None:
+            st = self._states[name] = _StateStats()
+        st.passes += 1
+        if rx == ss.Session.rx_total:
+            st.waiting += 1
+            st.wait_time += t1 - t0
+        else:
+            st.busy_time += t1 - t0
+
+        return ok
+
+    # ------------------
+    #  Report
+
+    def write(self):
+        self._cpu.dump_stats(self._file + ".pstats")
+        with open(self._file, "w") as fd:
+            fd.write(self.report())
+        print("Profile report saved to {}".format(self._file))
+
+    def report(self) -> str:
+
+        out = io.StringIO()
+        wall = self._t1 - self._t0
+        stats = pstats.Stats(self._cpu, stream=out)
+
+        out.write(f"Wall time {wall:.3f} s (cProfile overhead included)\n\n")
+
+        wait = sum(st.wait_time for st in self._states.values())
+        busy = sum(st.busy_time for st in self._states.values())
+        rest = wall - wait - busy - self._outside
+        out.write("Where the time went\n")
+        for label, t in (
+            ("waiting (no input in pass)", wait),
+            ("processing (input in pass)", busy),
+            ("host loop between passes", self._outside),
+            ("outside step() passes", rest),
+        ):
+            out.write(f"  {label:28} {t:9.3f} s  {_pct(t, wall)}\n")
+
+        out.write("\nOf which, from cProfile\n")
+        for label, match in (
+            ("serial I/O", _is_serial_io),
+            ("packet codec", _is_codec),
+            ("console output", _is_print),
+        ):
+            t = _cumulative(stats, match)
+            out.write(f"  {label:28} {t:9.3f} s  {_pct(t, wall)}\n")
+
+        out.write("\nloop() passes per state\n")
+        out.write(
+            f"  {'state':24} {'passes':>9} {'waiting':>9} {'wait s':>9} {'busy s':>9}\n"
+        )
+        for name, st in self._states.items():
+            out.write(
+                f"  {name:24} {st.passes:9} {st.waiting:9}"
+                f" {st.wait_time:9.3f} {st.busy_time:9.3f}\n"
+            )
+
+        out.write(f"\nTop {TOP} functions by cumulative time\n")
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP)
+
+        if self._snapshot is not None:
+            out.write(f"Allocations: peak {self._alloc_peak / 1024:.1f} KiB\n")
+            snapshot = self._snapshot.filter_traces(
+                (
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+                )
+            )
+            out.write(f"Top {TOP} live allocation sites at the end\n")
+            for s in snapshot.statistics("lineno")[:TOP]:
+                out.write(f"  {s}\n")
+
+        return out.getvalue()
+
+
+def _pct(t: float, wall: float) -> str:
+    return f"{t * 100 / wall:5.1f}%" if wall > 0 else ""
+
+
+def _cumulative(stats: pstats.Stats, match) -> float:
+    """Cumulative time of matching functions, not counting nested matches"""
+
+    total = 0.0
+    for key, (_, _, _, ct, callers) in stats.stats.items():
+        if match(key) and not any(match(c) for c in callers):
+            total += ct
+    return total
+
+
+def _is_serial_io(key) -> bool:
+    file, _, name = key
+    return (
+        name in ("read", "readinto", "write", "flush")
+        and os.sep + "serial" + os.sep in file
+    )
+
+
+def _is_codec(key) -> bool:
+    file, _, name = key
+    return name in ("fetch", "make_packet") and "msg.py" == os.path.basename(file)
+
+
+def _is_print(key) -> bool:
+    return "<built-in method builtins.print>" == key[2]
@@ -16,11 +16,16 @@
 
 from serial import Serial
 import msg as mm
+import _session as ss
 from datetime import datetime
 import math
 
 
-_QUIT = "quit"
+# Programming attempts of a page the bootloader reports an error for
+PAGE_RETRY = 3
+
+# Page write includes a flash erase / program
+PAGE_TIMEOUT = 1.0
 
 
 class Programmer:
@@ -29,62 +34,30 @@ class Programmer:
         self._ser = ser
         self._fw_image = fw_image
         self.bl_ver = bl_ver
+        self._session = ss.Session(ser)
         self._state = _Init(self)
         # self._state = _Logging(self)
 
-    def loop(self) -> bool:
-        next = self._state.loop()
-        if isinstance(next, str) and next == _QUIT:
-            return False
-
-        if next:
-            self._state = next
-
-        return True
-
-
-class _MsgReceiver:
-
-    def __init__(self, ser: Serial):
-        self.ser = ser
-        self.rx_buf = bytearray(256)
-        self.msg_buf = bytearray()
+        # Set when every page is programmed
+        self.ok = False
 
-    def recv_msg(self) -> mm.Msg | None:
-        self._rx()
-        return mm.fetch(self.msg_buf)
-
-    def _rx(self) -> int:
-
-        len1 = 0
-        buf = self.rx_buf
-        while True:
-            len2 = self.ser.readinto(buf)
-            if len2 > 0:
-                self.msg_buf.extend(memoryview(buf)[:len2])
-                len1 += len2
-            if len2 < len(buf):
-                break
-
-        return len1
+    def loop(self) -> bool:
+        return ss.step(self)
 
 
 class _State:
     def __init__(self, prog: Programmer):
         self.prog = prog
-        self.msg_receiver = _MsgReceiver(prog._ser)
+        self.session: ss.Session = prog._session
 
-    def loop(self) -> str | object | None:
+    def loop(self) -> bool | object | None:
         raise NotImplementedError()
 
     def recv_msg(self) -> mm.Msg | None:
-        return self.msg_receiver.recv_msg()
+        return self.session.recv_msg()
 
     def send_msg(self, msg: mm.Msg):
-        pack = mm.make_packet(msg.buf)
-        ser = self.prog._ser
-        ser.write(pack)
-        ser.flush()
+        self.session.send_msg(msg)
 
 
 class _Init(_State):
@@ -228,55 +201,57 @@ class _ProgFw(_State):
         self.x4 = 0xFFFFFFFF & _timestamp()
         self.page_index = 0
         self.page_cnt = page_cnt
-        self.expect_resp = False
+        self.tries = 0
+        self.err = None
 
-    def loop(self) -> _State | None:
+        self.send_page()
 
-        if not self.expect_resp:
+    def send_page(self):
 
-            print(
-                "Programming page {} / {}..".format(self.page_index + 1, self.page_cnt)
-            )
-
-            msg = self.make_msg(self.page_index)
-            self.send_msg(msg)
+        print("Programming page {} / {}..".format(self.page_index + 1, self.page_cnt))
 
-            self.expect_resp = True
-            return None
+        def on_reply(msg: mm.Msg):
+            self.err = msg.get_hw_LE(10)
 
-        # ------------
-        #  Receive response
+        msg = self.make_msg(self.page_index)
+        self.session.submit(
+            ss.Request(
+                msg, mm.MSG_PROG_FW_RESP, self.page_index, on_reply, PAGE_TIMEOUT
+            )
+        )
+        self.tries += 1
+        self.err = None
 
-        msg = self.recv_msg()
-        if not msg:
-            return None
+    def loop(self) -> bool | None:
 
-        if mm.MSG_PROG_FW_RESP != msg.get_msg_type():
+        if self.session.loop():
             return None
 
-        assert 8 == msg.get_data_len()
-
-        x4 = msg.get_word_LE(4)
-        page_index = msg.get_hw_LE(8)
-        err = msg.get_hw_LE(10)
-
-        if 0 != err:
+        if 0 != self.err:
             print(
-                "Programming failed: err = {}, page index = {}".format(err, page_index)
+                "Programming failed: err = {}, page index = {}".format(
+                    self.err, self.page_index
+                )
             )
+            if self.tries >= PAGE_RETRY:
+                print("Giving up")
+                return False
+
             # Retry
-            self.expect_resp = False
+            self.send_page()
             return None
 
         self.page_index += 1
-        self.expect_resp = False
+        self.tries = 0
 
         if self.page_index < self.page_cnt:
+            self.send_page()
             return None
 
         print("Firmware program done")
+        self.prog.ok = True
         # return _Logging(self.prog)
-        return _QUIT
+        return False
 
     def make_msg(self, page_index: int):
 
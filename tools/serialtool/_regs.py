@@ -0,0 +1,281 @@
+# Copyright (c) 2025 muzkr
+#
+#   https://github.com/muzkr
+#
+# Licensed under the MIT License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at the root of this repository.
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+
+"""
+BK4819 register snapshot, diff and batch write
+
+0x0602 has no reply, so each write travels in one packet run with a 0x0601
+read of the same register: the read's reply both acknowledges the write and
+verifies it, and keeps the pipeline within the firmware's receive ring.
+
+Snapshot file: one 'reg value' line per register, both hex.
+"""
+
+from serial import Serial
+import msg as mm
+import _session as ss
+
+MSG_READ_REG = 0x0601
+MSG_WRITE_REG = 0x0602
+
+REG_COUNT = 0x80
+
+# Re-writes of a register whose read-back does not match
+WRITE_RETRY = 3
+
+# Status and result registers: interrupt flags (02, 0C), DTMF and scan
+# results (0B, 0D, 0E, 68-6A), FSK FIFO (5F), glitch, voice, noise, RSSI
+# (63-67), AF indicators (6F). They change by themselves, so a write never
+# verifies; writing some of them clears flags the firmware waits on
+READ_ONLY = frozenset(
+    (0x02, 0x0B, 0x0C, 0x0D, 0x0E, 0x5F, 0x63, 0x64, 0x65, 0x66, 0x67, 0x68, 0x69, 0x6A, 0x6F)
+)
+
+
+def parse_regs(spec: str | None) -> list[int]:
+    """'0-3f,67' (hex) -> register list. None -> all registers"""
+
+    if not spec:
+        return list(range(REG_COUNT))
+
+    regs = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            a, b = part.split("-", 1)
+            a, b = int(a, 16), int(b, 16)
+        else:
+            a = b = int(part, 16)
+        if a < 0 or b >= REG_COUNT or a > b:
+            raise ValueError("Invalid register range '{}'".format(part))
+        regs.update(range(a, b + 1))
+
+    return sorted(regs)
+
+
+def select_regs(values: dict[int, int], spec: str | None) -> dict[int, int]:
+    """Registers of `values` to write: those in `spec`, or all but READ_ONLY"""
+
+    if spec:
+        regs = set(parse_regs(spec))
+        return {reg: v for reg, v in values.items() if reg in regs}
+    return {reg: v for reg, v in values.items() if reg not in READ_ONLY}
+
+
+def load_snapshot(file: str) -> dict[int, int]:
+
+    regs = {}
+    with open(file, "r") as fd:
+        for line in fd:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            reg, value = line.split()
+            reg, value = int(reg, 16), int(value, 16)
+            if reg >= REG_COUNT or value > 0xFFFF:
+                raise ValueError("Invalid register line '{}'".format(line))
+            regs[reg] = value
+
+    return regs
+
+
+def save_snapshot(file: str, regs: dict[int, int]):
+
+    with open(file, "w") as fd:
+        for reg in sorted(regs):
+            fd.write(f"{reg:02x} {regs[reg]:04x}\n")
+
+
+def diff_snapshots(a: dict, b: dict) -> list[tuple]:
+    """(reg, value in a, value in b) of registers that differ; None if missing"""
+
+    return [
+        (reg, a.get(reg), b.get(reg))
+        for reg in sorted(set(a) | set(b))
+        if a.get(reg) != b.get(reg)
+    ]
+
+
+def report_diff(file_a: str, file_b: str, diff: list[tuple]):
+
+    print(f"{file_a} <-> {file_b}: {len(diff)} registers differ")
+    for reg, va, vb in diff:
+        va = "----" if va is None else f"{va:04x}"
+        vb = "----" if vb is None else f"{vb:04x}"
+        print(f"  REG_{reg:02X}  {va} -> {vb}")
+
+
+def read_reg(session: ss.Session, reg: int, on_value):
+    """`on_value(reg, value)` on reply"""
+    session.submit(read_request(reg, on_value))
+
+
+def write_reg(session: ss.Session, reg: int, value: int, on_value):
+    """Write, then read back: `on_value(reg, value read)`"""
+
+    req = read_request(reg, on_value)
+    req.packet = write_packet(reg, value) + req.packet
+    session.submit(req)
+
+
+def write_packet(reg: int, value: int) -> bytes:
+    """0x0602 packet. No reply comes for it"""
+
+    msg = mm.Msg(7)
+    msg.set_msg_type(MSG_WRITE_REG)
+    msg.buf[4] = reg
+    msg.set_hw_LE(5, value)
+    return mm.make_packet(msg.buf)
+
+
+def read_request(reg: int, on_value) -> ss.Request:
+
+    msg = mm.Msg(5)
+    msg.set_msg_type(MSG_READ_REG)
+    msg.buf[4] = reg
+
+    def on_reply(msg: mm.Msg):
+        on_value(reg, msg.get_hw_LE(5))
+
+    return ss.Request(msg, MSG_READ_REG, reg, on_reply)
+
+
+class RegSnapshot:
+
+    def __init__(self, ser: Serial, file: str, regs: list[int]):
+        self._session = ss.Session(ser)
+        self._file = file
+        self._regs = regs
+        self._state = _Connect(self)
+
+    def loop(self) -> bool:
+        return ss.step(self)
+
+    def after_connect(self):
+        return _ReadRegs(self, self._regs)
+
+    def after_read(self, values: dict):
+        save_snapshot(self._file, values)
+        print("{} registers saved to {}".format(len(values), self._file))
+        return False
+
+
+class RegWrite:
+
+    def __init__(self, ser: Serial, values: dict[int, int], dry_run: bool = False):
+        self._session = ss.Session(ser)
+        self._values = values
+        self._dry_run = dry_run
+        self._state = _Connect(self)
+
+    def loop(self) -> bool:
+        return ss.step(self)
+
+    def after_connect(self):
+        return _ReadRegs(self, sorted(self._values))
+
+    def after_read(self, values: dict):
+
+        diff = diff_snapshots(values, self._values)
+        report_diff("device", "file", diff)
+
+        if self._dry_run:
+            return False
+        if not diff:
+            print("Nothing to write")
+            return False
+
+        return _WriteRegs(
+            self, {reg: vb for reg, _, vb in diff if vb is not None}
+        )
+
+
+class _State:
+    def __init__(self, op):
+        self.op = op
+        self.session: ss.Session = op._session
+
+    def loop(self) -> bool | object:
+        raise NotImplementedError()
+
+
+class _Connect(_State):
+
+    def loop(self):
+        if not self.session.wait_quiet():
+            return None
+        return self.op.after_connect()
+
+
+class _ReadRegs(_State):
+
+    def __init__(self, op, regs: list[int]):
+        super().__init__(op)
+        self.values = {}
+        self.total = len(regs)
+
+        def on_value(reg: int, value: int):
+            self.values[reg] = value
+
+        for reg in regs:
+            read_reg(self.session, reg, on_value)
+
+    def loop(self):
+
+        if self.session.loop():
+            return None
+
+        print(f"Read {len(self.values)} of {self.total} registers")
+        return self.op.after_read(self.values)
+
+
+class _WriteRegs(_State):
+
+    def __init__(self, op, values: dict[int, int]):
+        super().__init__(op)
+        self.values = values
+        self.retries = {}
+        self.verified = set()
+        self.failed = set()
+
+        for reg, value in values.items():
+            write_reg(self.session, reg, value, self.on_value)
+
+    def on_value(self, reg: int, value: int):
+
+        if value == self.values[reg]:
+            self.verified.add(reg)
+            return
+
+        n = self.retries.get(reg, 0) + 1
+        self.retries[reg] = n
+        if n > WRITE_RETRY:
+            print(
+                f"Verify failed at REG_{reg:02X}: wrote {self.values[reg]:04x}, read {value:04x}"
+            )
+            self.failed.add(reg)
+            return
+
+        write_reg(self.session, reg, self.values[reg], self.on_value)
+
+    def loop(self):
+
+        if self.session.loop():
+            return None
+
+        print(f"Wrote {len(self.verified)} of {len(self.values)} registers")
+        return False
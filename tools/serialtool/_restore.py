@@ -14,198 +14,123 @@
 #
 
 from serial import Serial
-from datetime import datetime
 import msg as mm
+import _layout as ll
+import _session as ss
+import _dump as dd
 
 DUMP_CONFIG = 1
 DUMP_CALIB = 2
 DUMP_ALL = 0xFF
 
+# Re-writes of a block whose read-back does not match
+VERIFY_RETRY = 3
+
+# Blocks holding the AES key (settings aes_key)
+_AES_KEY_BLOCKS = next(
+    set(range(ll.block_of(addr), addr + size, ll.BLOCK_SIZE))
+    for addr, size, name in ll.SETTINGS_FIELDS
+    if "aes_key" == name
+)
+
 
 class EepromDump:
 
-    def __init__(self, ser: Serial, dump_what: int, dump_file: str):
+    def __init__(
+        self,
+        ser: Serial,
+        dump_what: int,
+        dump_file: str,
+        dump_data: bytes = None,
+        verify: bool = False,
+    ):
         self._ser = ser
         self._dump_what = dump_what
         self._dump_file = dump_file
+        self._dump_data = dump_data
+        self._verify = verify
+        self._session = ss.Session(ser)
         self._state = _Init(self)
-        # self._dev_info = None
-
-    def loop(self) -> bool:
-        next = self._state.loop()
-        if isinstance(next, bool):
-            return next
-        elif next:
-            self._state = next
-
-        return True
 
+        # Set when all blocks are written (and verified, if asked for)
+        self.ok = False
 
-class _DevInfo:
-
-    def __init__(self):
-        self.ver = None
-        self.has_AES_key = False
-        self.lock_screen = False
-        self.AES_challenge = None
+    def loop(self) -> bool:
+        return ss.step(self)
 
 
 class _State:
     def __init__(self, dump: EepromDump):
         self.dump = dump
-        self.ser = dump._ser
-        self.rx_buf = bytearray(256)
-        self.msg_buf = bytearray()
+        self.session: ss.Session = dump._session
 
     def loop(self) -> bool | object:
         raise NotImplementedError()
 
-    def send_msg(self, msg: mm.Msg):
-        pack = mm.make_packet(msg.buf)
-        ser = self.dump._ser
-        ser.write(pack)
-        ser.flush()
-
-    def recv_msg(self) -> mm.Msg:
-        self._rx()
-        return mm.fetch(self.msg_buf)
-
-    def _rx(self) -> int:
-
-        len1 = 0
-        buf = self.rx_buf
-        while True:
-            len2 = self.ser.readinto(buf)
-            if len2 > 0:
-                self.msg_buf.extend(memoryview(buf)[:len2])
-                len1 += len2
-            if len2 < len(buf):
-                break
-
-        return len1
-
 
 class _Init(_State):
-    def __init__(self, dump):
-        super().__init__(dump)
 
     def loop(self) -> _State:
-        if self._rx():
-            print(".", end="")
-            return self
-
-        print()
+        if not self.session.wait_quiet():
+            return None
         return _DeviceInfo(self.dump)
 
-    def _rx(self) -> int:
-        return self.ser.readinto(self.rx_buf)
-
 
 class _DeviceInfo(_State):
 
     def __init__(self, dump):
         super().__init__(dump)
-        self.expect_resp = False
-        self.timestamp = 0
+        print("Examing device info..")
+        self.session.hello()
 
     def loop(self) -> _State:
 
-        if not self.expect_resp:
-            print("Examing device info..")
-            self.send_request()
-            self.expect_resp = True
-            return
-
-        msg = self.recv_msg()
-        if not msg:
-            return
-
-        if 0x0515 != msg.get_msg_type():
+        self.session.loop()
+        info = self.session.dev_info
+        if info is None:
             return
 
-        # version string
-        end = msg.buf.find(b"\0", 4, 20)
-        if -1 == end:
-            end = 20
-        ver = msg.buf[4:end].decode("ascii")
-
-        has_AES_key = msg.buf[20]
-        lock_screen = msg.buf[21]
-        AES_challenge = (
-            msg.get_word_LE(24),
-            msg.get_word_LE(28),
-            msg.get_word_LE(32),
-            msg.get_word_LE(36),
-        )
-
-        dev_info = _DevInfo()
-        dev_info.ver = ver
-        dev_info.has_AES_key = has_AES_key
-        dev_info.lock_screen = lock_screen
-        dev_info.AES_challenge = AES_challenge
-        # self.dump._dev_info = dev_info
-
+        AES_challenge = info.AES_challenge
         print(
-            f"Device info: version = '{ver}', AES key = {has_AES_key}, lock screen = {lock_screen}"
+            f"Device info: version = '{info.ver}', AES key = {info.has_AES_key}, lock screen = {info.lock_screen}"
         )
         print(
             f"AES challenge: {AES_challenge[0]:08x} {AES_challenge[1]:08x} {AES_challenge[2]:08x} {AES_challenge[3]:08x}"
         )
 
-        # return _AccessRequest(self.dump, dev_info, self.timestamp)
+        # return _AccessRequest(self.dump)
         try:
-            return _DumpEeprom(self.dump, self.timestamp)
-        except:
-            #
+            return _write_state(self.dump)
+        except OSError:
             return False
 
-    def send_request(self):
-
-        ts = int(datetime.now().timestamp()) & 0xFFFFFFFF
-        self.timestamp = ts
-
-        msg = mm.Msg(8)
-        msg.set_msg_type(0x0514)
-        msg.set_word_LE(4, ts)
-        self.send_msg(msg)
-
 
 class _AccessRequest(_State):
 
-    def __init__(self, dump, dev_info: _DevInfo, timestamp: int):
+    def __init__(self, dump):
         super().__init__(dump)
-        self.dev_info = dev_info
-        self.timestamp = timestamp
-        self.expect_resp = False
-
-    def loop(self) -> _State | bool:
+        self.result = None
 
-        if not self.expect_resp:
-            print("Obtaining access permission..")
-            # TODO: AES challenge ..
-            AES_resp = [0, 0, 0, 0]
-            self.send_request(AES_resp)
-            self.expect_resp = True
-            return
+        print("Obtaining access permission..")
+        # TODO: AES challenge ..
+        AES_resp = [0, 0, 0, 0]
+        self.send_request(AES_resp)
 
-        msg = self.recv_msg()
-        if not msg:
-            return
+    def loop(self) -> _State | bool:
 
-        if 0x052E != msg.get_msg_type():
+        self.session.loop()
+        if self.result is None:
             return
 
-        err = msg.buf[4]
-        if err:
+        if self.result:
             print("Access rejected")
             return False
 
         print("Access granted")
 
         try:
-            return _DumpEeprom(self.dump, self.timestamp)
-        except:
-            #
+            return _write_state(self.dump)
+        except OSError:
             return False
 
     def send_request(self, AES_resp):
@@ -215,138 +140,136 @@ class _AccessRequest(_State):
         msg.set_word_LE(8, AES_resp[1])
         msg.set_word_LE(12, AES_resp[2])
         msg.set_word_LE(16, AES_resp[3])
-        self.send_msg(msg)
+
+        def on_reply(msg: mm.Msg):
+            self.result = msg.buf[4]
+
+        self.session.submit(ss.Request(msg, 0x052E, None, on_reply))
 
 
 class _DumpEeprom(_State):
 
-    def __init__(self, dump: EepromDump, timestamp: int):
+    def __init__(self, dump: EepromDump):
         super().__init__(dump)
-        self.timestamp = timestamp
-
-        what = dump._dump_what
-        if DUMP_CONFIG == what:
-            off = 0
-            size = 0x1E00
-        elif DUMP_CALIB == what:
-            off = 0x1E00
-            size = 0x2000 - 0x1E00
-        else:
-            off = 0
-            size = 0x2000
 
+        off, size = dd.dump_range(dump._dump_what)
         self.offset = off
-        self.size = size
-
-        data = bytearray()
-        self.data = data
 
         file = dump._dump_file
         try:
-            data1 = open(file, "rb").read()
+            if dump._dump_data is not None:
+                data = dump._dump_data
+            else:
+                data = open(file, "rb").read()
         except Exception as e:
             print("Error loading dump file: " + str(e))
             raise OSError()
 
-        if len(data1) != size:
-            print(
-                "Dump file size error: expect {} actually {}".format(size, len(data1))
-            )
+        try:
+            data = dd.image_part(data, dump._dump_what)
+        except ValueError as e:
+            print("Dump file error: {}".format(e))
             raise OSError()
 
-        data.extend(data1)
+        # Regions only: gaps between them ignore writes
+        self.blocks = {}
+        for blk in ll.region_blocks(off, off + size):
+            self.blocks[blk] = data[blk - off : blk - off + 16]
 
-        self.expect_resp = False
-        self.AES_key = None
+        self.done = set()
+        self.failed = set()
+        self.per = -1
 
-    def loop(self) -> bool | _State:
+        # AES key goes last: writing it may lock further access
+        for off in self.blocks:
+            if off not in _AES_KEY_BLOCKS:
+                self.write_block(off)
+        self.AES_pending = [off for off in self.blocks if off in _AES_KEY_BLOCKS]
 
-        if not self.expect_resp:
+    def write_block(self, off: int):
+        self.session.write(off, self.blocks[off], self.on_written, cached=False)
 
-            # AES key
-            if 0 == self.size and self.AES_key is not None:
-                print("Writting data.. 100%")
-                self.send_request(0x0F30, self.AES_key)
-                self.expect_resp = True
-                return
+    def on_written(self, off: int):
+        self.done.add(off)
 
-            off1 = len(self.data) - self.size
+    def loop(self) -> bool | _State:
 
-            # Check AES key
-            if 0x0F30 == self.offset:
-                self.AES_key = self.data[off1 : off1 + 16]
-                self.offset += 16
-                self.size -= 16
-                return
-            else:
-                per = off1 * 100 // len(self.data)
+        if self.session.loop():
+            per = len(self.done) * 100 // len(self.blocks)
+            if per != self.per:
+                self.per = per
                 print(f"Writting data.. {per}%")
-                self.send_request(self.offset, self.data[off1 : off1 + 16])
-                self.expect_resp = True
-                return
-
-        # Receive resposne ----------
-
-        msg = self.recv_msg()
-        if not msg:
             return
 
-        if 0x051E != msg.get_msg_type():
+        if self.AES_pending and not self.failed:
+            for off in self.AES_pending:
+                self.write_block(off)
+            self.AES_pending = []
             return
 
-        off = msg.get_hw_LE(4)
+        return self.finish()
 
-        # AES key
-        if 0 == self.size and (self.AES_key is not None):
-            if off != 0x0F30:
-                print("Invalid response. Retry..")
-                # print(f"{off:04x}")
-                self.expect_resp = False
-                return
-            else:
-                # Mark as done
-                self.AES_key = None
-        else:
-            if off != self.offset:
-                print("Invalid response. Retry..")
-                self.expect_resp = False
-                return
-            else:
-                self.offset += 16
-                self.size -= 16
+    def finish(self) -> bool | _State:
+        print("Writting data.. 100%")
+        print("Done")
+        return _Reboot(self.dump)
+
+
+class _VerifyEeprom(_DumpEeprom):
+    """
+    Pipelined write with read-back: each block is read again (0x051B) as soon
+    as its write is acknowledged, and written again on mismatch
+    """
+
+    def __init__(self, dump: EepromDump):
+        self.retries = {}
+        super().__init__(dump)
+
+    def on_written(self, off: int):
+        self.session.read(off, 16, self.on_read_back, cached=False)
 
-        self.expect_resp = False
+    def on_read_back(self, off: int, data: bytes):
+
+        if data == self.blocks[off]:
+            self.done.add(off)
+            return
 
-        if self.size > 0 or self.AES_key is not None:
+        n = self.retries.get(off, 0) + 1
+        self.retries[off] = n
+        if n > VERIFY_RETRY:
+            print(f"Verify failed at {off:04x}")
+            self.failed.add(off)
             return
 
-        # Finished ------
+        print(f"Verify mismatch at {off:04x}. Retry..")
+        self.write_block(off)
+
+    def finish(self) -> bool | _State:
+
+        print(
+            "Verified {} of {} blocks, {} re-written".format(
+                len(self.done), len(self.blocks), len(self.retries)
+            )
+        )
+
+        if self.failed or self.AES_pending:
+            print("Verify failed. Device not rebooted")
+            return False
 
         print("Done")
         return _Reboot(self.dump)
 
-    def send_request(self, off: int, data: bytes):
 
-        msg = mm.Msg(28)
-        msg.set_msg_type(0x051D)
-        msg.set_hw_LE(4, off)
-        msg.set_hw_LE(6, 16)  # size
-        msg.buf[7] = 1  # allow password
-        msg.set_word_LE(8, self.timestamp)
-        msg.buf[12:28] = data[:16]
-        self.send_msg(msg)
+def _write_state(dump: EepromDump) -> _State:
+    if dump._verify:
+        return _VerifyEeprom(dump)
+    return _DumpEeprom(dump)
 
 
 class _Reboot(_State):
 
-    def __init__(self, dump):
-        super().__init__(dump)
-
     def loop(self) -> bool:
-
+        self.dump.ok = True
         print("Rebooting device..")
-
-        msg = mm.Msg(4)
-        msg.set_msg_type(0x05DD)
-        self.send_msg(msg)
+        self.session.reboot()
         return False
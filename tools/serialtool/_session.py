@@ -0,0 +1,509 @@
+# Copyright (c) 2025 muzkr
+#
+#   https://github.com/muzkr
+#
+# Licensed under the MIT License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at the root of this repository.
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+
+"""
+Pipelined serial config session
+
+Requests are sent ahead of replies as long as the bytes in flight fit the
+firmware's 256-byte receive ring; replies are matched back to requests by
+type and offset, so they may complete in any order.
+
+Each request has its own deadline. A request that times out is sent again
+with its timeout doubled, up to `tries` times, after which SessionError is
+raised. When requests keep timing out, or nothing has been heard for longer
+than the radio's serial config window, the session is opened again (0x0514
+with the same timestamp) ahead of the resends, in case the radio restarted.
+
+With `cache` set, reads and writes go through the radio's cached memory
+image (_cache) once 0x0515 is in; what is asked for while the image is being
+checked is held until then.
+"""
+
+from serial import Serial
+from datetime import datetime
+import time
+import msg as mm
+
+MSG_SESSION_INIT = 0x0514
+MSG_SESSION_INFO = 0x0515
+MSG_READ_EEPROM = 0x051B
+MSG_READ_EEPROM_RESP = 0x051C
+MSG_WRITE_EEPROM = 0x051D
+MSG_WRITE_EEPROM_RESP = 0x051E
+MSG_REBOOT = 0x05DD
+
+# Largest data size of one 0x051B reply (REPLY_051B_t)
+READ_MAX = 128
+
+# Request bytes allowed in flight. Firmware RX ring is 256 bytes
+RX_WINDOW = 160
+
+REQ_TIMEOUT = 0.5
+
+# Upper bound of a backed-off timeout
+MAX_TIMEOUT = 4.0
+
+# Sends of a request before giving up
+MAX_TRIES = 6
+
+# Radio's serial config window after 0x0514 (gSerialConfigCountDown_500ms)
+SESSION_WINDOW = 6.0
+
+# Set to a _profile.Profile to have step() passes accounted
+profile = None
+
+# Set to a _cache.MemCache to have sessions read through it
+cache = None
+
+
+class SessionError(Exception):
+    pass
+
+
+class DevInfo:
+
+    def __init__(self, msg: mm.Msg):
+        end = msg.buf.find(b"\0", 4, 20)
+        if -1 == end:
+            end = 20
+        self.ver = msg.buf[4:end].decode("ascii", errors="replace")
+        self.has_AES_key = msg.buf[20]
+        self.lock_screen = msg.buf[21]
+        self.AES_challenge = (
+            msg.get_word_LE(24),
+            msg.get_word_LE(28),
+            msg.get_word_LE(32),
+            msg.get_word_LE(36),
+        )
+
+
+class Request:
+
+    def __init__(
+        self,
+        msg: mm.Msg,
+        resp_type: int,
+        key=None,
+        on_reply=None,
+        timeout: float = REQ_TIMEOUT,
+        tries: int = MAX_TRIES,
+    ):
+        self.packet = mm.make_packet(msg.buf)
+        self.msg_type = msg.get_msg_type()
+        self.resp_type = resp_type
+        self.key = key
+        self.on_reply = on_reply
+        self.timeout = timeout
+        self.max_tries = tries
+        self.deadline = 0.0
+        self.tries = 0
+
+
+class Session:
+
+    # Bytes received by all sessions, for profiling
+    rx_total = 0
+
+    def __init__(self, ser: Serial):
+        self._ser = ser
+        self.rx_buf = bytearray(256)
+        self.msg_buf = bytearray()
+        self.timestamp = 0
+        self.dev_info: DevInfo | None = None
+
+        # Called with replies no request waits for
+        self.on_other = None
+
+        self._queue: list[Request] = []
+        self._inflight: list[Request] = []
+        self._inflight_bytes = 0
+        self._hello_sent = False
+        self._hello: Request | None = None
+        self._last_reply = time.monotonic()
+
+        # Memory image, once the cache binder is done with it
+        self.image = None
+        self._binder = None
+        self._held = []
+        self._served = []
+
+    # ------------------
+    #  Messages
+
+    def send_msg(self, msg: mm.Msg):
+        pack = mm.make_packet(msg.buf)
+        self._ser.write(pack)
+        self._ser.flush()
+
+    def recv_msg(self) -> mm.Msg | None:
+        self._rx()
+        return mm.fetch(self.msg_buf)
+
+    def drain(self) -> int:
+        """Discard pending input. Returns number of bytes discarded"""
+        len1 = self._rx()
+        del self.msg_buf[:]
+        return len1
+
+    def _rx(self) -> int:
+
+        len1 = 0
+        buf = self.rx_buf
+        while True:
+            len2 = self._ser.readinto(buf)
+            if len2 > 0:
+                self.msg_buf.extend(memoryview(buf)[:len2])
+                len1 += len2
+            if len2 < len(buf):
+                break
+
+        Session.rx_total += len1
+        return len1
+
+    # ------------------
+    #  Requests
+
+    def submit(self, req: Request):
+        self._queue.append(req)
+
+    def pending(self) -> int:
+        return (
+            len(self._queue) + len(self._inflight) + len(self._held) + len(self._served)
+        )
+
+    def loop(self) -> bool:
+        """Push requests, dispatch replies. Returns False when nothing is pending"""
+
+        now = time.monotonic()
+
+        # Resend what timed out
+        expired = [req for req in self._inflight if now >= req.deadline]
+        if expired:
+            self._reopen(expired, now)
+        for req in expired:
+            if req.tries >= req.max_tries:
+                raise SessionError(
+                    "No reply to {:04x} after {} tries".format(
+                        req.msg_type, req.tries
+                    )
+                )
+            self._send(req, now)
+
+        while self._queue:
+            req = self._queue[0]
+            if self._inflight and (
+                self._inflight_bytes + len(req.packet) > RX_WINDOW
+            ):
+                break
+            self._queue.pop(0)
+            self._inflight.append(req)
+            self._inflight_bytes += len(req.packet)
+            self._send(req, now)
+
+        while True:
+            len1 = len(self.msg_buf)
+            msg = self.recv_msg()
+            if msg:
+                self._dispatch(msg)
+            elif len(self.msg_buf) == len1:
+                break
+
+        # Requests the image answered
+        while self._served:
+            served = self._served
+            self._served = []
+            for fn in served:
+                fn()
+
+        if self.pending():
+            return True
+
+        if self.image is not None and self.image.dirty:
+            try:
+                self.image.cache.save(self.image)
+            except OSError as e:
+                print("Cache: cannot save image: {}".format(e))
+                self.image.dirty = False
+        return False
+
+    def _send(self, req: Request, now: float):
+        req.deadline = now + min(req.timeout * (1 << req.tries), MAX_TIMEOUT)
+        req.tries += 1
+        self._ser.write(req.packet)
+        self._ser.flush()
+
+    def _reopen(self, expired: list[Request], now: float):
+        """Open the session again ahead of resends, if it may have been lost"""
+
+        hello = self._hello
+        if hello is None or hello in self._inflight:
+            return
+        if now - self._last_reply < SESSION_WINDOW and all(
+            req.tries < 2 for req in expired
+        ):
+            return
+
+        print("Reopening session..")
+        hello.tries = 0
+        self._inflight.insert(0, hello)
+        self._inflight_bytes += len(hello.packet)
+        self._send(hello, now)
+
+    def _dispatch(self, msg: mm.Msg):
+
+        msg_type = msg.get_msg_type()
+        key = _reply_key(msg)
+        self._last_reply = time.monotonic()
+
+        for i, req in enumerate(self._inflight):
+            if req.resp_type == msg_type and req.key == key:
+                del self._inflight[i]
+                self._inflight_bytes -= len(req.packet)
+                if req.on_reply:
+                    req.on_reply(msg)
+                return
+
+        if self.on_other:
+            self.on_other(msg)
+
+    def connect(self) -> bool:
+        """
+        Wait for the line to go quiet, then open the session. Returns True
+        once device info is in
+        """
+
+        if not self._hello_sent:
+            if not self.wait_quiet():
+                return False
+            print("Examing device info..")
+            self.hello()
+            self._hello_sent = True
+
+        self.loop()
+        if self.dev_info is None:
+            return False
+
+        info = self.dev_info
+        print(
+            f"Device info: version = '{info.ver}', AES key = {info.has_AES_key}, lock screen = {info.lock_screen}"
+        )
+        return True
+
+    def wait_quiet(self) -> bool:
+        """Discard input until the line goes quiet. Returns True once it is"""
+
+        if self.drain():
+            print(".", end="", flush=True)
+            return False
+        print()
+        return True
+
+    # ------------------
+    #  Commands
+
+    def hello(self, on_info=None):
+        """Start serial config session (0x0514)"""
+
+        ts = int(datetime.now().timestamp()) & 0xFFFFFFFF
+        self.timestamp = ts
+
+        msg = mm.Msg(8)
+        msg.set_msg_type(MSG_SESSION_INIT)
+        msg.set_word_LE(4, ts)
+
+        def on_reply(msg: mm.Msg):
+            first = self.dev_info is None
+            self.dev_info = DevInfo(msg)
+            if first and cache is not None:
+                self._binder = cache.bind(self, self.dev_info.ver)
+            if first and on_info:
+                on_info(self.dev_info)
+
+        self._hello = Request(msg, MSG_SESSION_INFO, None, on_reply)
+        self.submit(self._hello)
+
+    def read(self, off: int, size: int, on_data, cached: bool = True):
+        """
+        Read `size` bytes from `off`; `on_data(off, data)` per reply.
+        `cached` False always asks the radio, eg. to verify a write
+        """
+
+        if self._binder is not None:
+            self._held.append(lambda: self.read(off, size, on_data, cached))
+            return
+
+        img = self.image
+        if img is None:
+            self.read_raw(off, size, on_data)
+            return
+
+        while size > 0:
+            len1 = min(size, READ_MAX)
+            if cached and img.has(off, len1):
+                img.cache.hits += 1
+                data = img.get(off, len1)
+                self._served.append(lambda off=off, data=data: on_data(off, data))
+            else:
+                img.cache.misses += 1
+
+                def on_read(off: int, data: bytes):
+                    img.update(off, data)
+                    on_data(off, data)
+
+                self.read_raw(off, len1, on_read)
+            off += len1
+            size -= len1
+
+    def read_raw(self, off: int, size: int, on_data):
+        """read() bypassing the cache"""
+
+        while size > 0:
+            len1 = min(size, READ_MAX)
+
+            msg = mm.Msg(12)
+            msg.set_msg_type(MSG_READ_EEPROM)
+            msg.set_hw_LE(4, off)
+            msg.buf[6] = len1
+            msg.set_word_LE(8, self.timestamp)
+
+            def on_reply(msg: mm.Msg, off=off, len1=len1):
+                on_data(off, bytes(msg.buf[8 : 8 + len1]))
+
+            self.submit(Request(msg, MSG_READ_EEPROM_RESP, (off, len1), on_reply))
+            off += len1
+            size -= len1
+
+    def write(self, off: int, data: bytes, on_done=None, cached: bool = True):
+        """
+        Write one block; `on_done(off)` when acknowledged. `cached` False
+        always sends it, eg. to restore an exact image
+        """
+
+        if self._binder is not None:
+            self._held.append(lambda: self.write(off, data, on_done, cached))
+            return
+
+        img = self.image
+        if img is None:
+            self.write_raw(off, data, on_done)
+            return
+
+        # The radio was seen holding it in this session
+        if cached and img.held(off, data):
+            img.cache.skipped_writes += 1
+            if on_done:
+                self._served.append(lambda: on_done(off))
+            return
+
+        def on_written(off: int):
+            img.update(off, data)
+            if on_done:
+                on_done(off)
+
+        self.write_raw(off, data, on_written)
+
+    def write_raw(self, off: int, data: bytes, on_done=None):
+        """write() bypassing the cache"""
+
+        msg = mm.Msg(12 + len(data))
+        msg.set_msg_type(MSG_WRITE_EEPROM)
+        msg.set_hw_LE(4, off)
+        msg.buf[6] = len(data)
+        msg.buf[7] = 1  # allow password
+        msg.set_word_LE(8, self.timestamp)
+        msg.buf[12:] = data
+
+        def on_reply(msg: mm.Msg):
+            if on_done:
+                on_done(off)
+
+        self.submit(Request(msg, MSG_WRITE_EEPROM_RESP, off, on_reply))
+
+    def bound(self, image):
+        """Cache binder done: requests made meanwhile go out now"""
+
+        self.image = image
+        self._binder = None
+        held = self._held
+        self._held = []
+        for fn in held:
+            fn()
+
+    def post(self, packet: bytes):
+        """Send packets no reply comes for, eg. 0x0602, bypassing the queue"""
+        self._ser.write(packet)
+        self._ser.flush()
+
+    def reboot(self):
+        msg = mm.Msg(4)
+        msg.set_msg_type(MSG_REBOOT)
+        self.send_msg(msg)
+
+
+def step(op) -> bool:
+    """
+    One loop() pass of an operation: run `op._state`, move on to the state
+    it returns. Returns False when done or failed
+    """
+
+    if profile is not None:
+        return profile.step(op, _step)
+    return _step(op)
+
+
+def _step(op) -> bool:
+
+    try:
+        next = op._state.loop()
+    except SessionError as e:
+        print("Session error: {}".format(e))
+        return False
+
+    if isinstance(next, bool):
+        return next
+    elif next:
+        op._state = next
+
+    return True
+
+
+def _reply_key(msg: mm.Msg):
+
+    match msg.get_msg_type():
+        case 0x051C:
+            return (msg.get_hw_LE(4), msg.buf[6])
+        case 0x051E:
+            return msg.get_hw_LE(4)
+        case 0x0601:
+            return msg.buf[4]
+        case mm.MSG_PROG_FW_RESP:
+            return msg.get_hw_LE(8)
+
+    return None
+
+
+def coalesce(blocks, max_size: int = READ_MAX, block_size: int = 16) -> list:
+    """Merge sorted block addresses into (off, size) runs of at most `max_size`"""
+
+    runs = []
+    for blk in sorted(set(blocks)):
+        if runs:
+            off, size = runs[-1]
+            if off + size == blk and size + block_size <= max_size:
+                runs[-1] = (off, size + block_size)
+                continue
+        runs.append((blk, block_size))
+
+    return runs
@@ -0,0 +1,424 @@
+# Copyright (c) 2025 muzkr
+#
+#   https://github.com/muzkr
+#
+# Licensed under the MIT License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at the root of this repository.
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+
+"""
+Production-line station
+
+Watches the serial port list. Each new port is opened and the device on it
+identified: a bootloader beacons 0x0518, a running firmware answers 0x0514.
+The unit then runs the pipeline
+
+    flash (bootloader only) -> wait for reboot -> restore config -> verify
+
+with the existing Programmer and restore ops. Units on different ports are
+stepped from one loop, so they run at the same time. The output of each unit
+goes to its own log file; one line per unit is appended to results.log.
+
+A unit whose port stays plugged in (radio swapped on the cable) is taken
+again when a bootloader beacon shows up on the port.
+"""
+
+from serial import Serial
+from serial.tools import list_ports
+import contextlib
+from datetime import datetime
+import fnmatch
+import os
+import sys
+import time
+import msg as mm
+import _session as ss
+import _prog as pp
+import _dump as dd
+import _restore as rr
+
+# Port list poll interval
+SCAN_INTERVAL = 1.0
+
+# From the end of programming to the firmware answering 0x0514
+REBOOT_TIMEOUT = 30.0
+
+# Silence on a finished port before a bootloader there counts as a new radio
+REARM_QUIET = 2.0
+
+
+def open_port(name: str) -> Serial:
+    return Serial(name, baudrate=38400, timeout=0.0001, write_timeout=None)
+
+
+class Station:
+
+    def __init__(
+        self,
+        fw_image: bytes | None,
+        bl_ver: str,
+        config: bytes | None,
+        verify: bool,
+        log_dir: str,
+        match: str = "*",
+        present: bool = False,
+    ):
+        self.fw_image = fw_image
+        self.bl_ver = bl_ver
+        self.config = config
+        self.verify = verify
+        self.log_dir = log_dir
+        self._match = match
+
+        # Port name -> _Unit being worked on, or _Idle port after it
+        self._ports: dict[str, _Unit | _Idle] = {}
+        self._ignored = set() if present else set(self.list_ports())
+        self._next_scan = 0.0
+        self.passed = 0
+        self.failed = 0
+
+        os.makedirs(log_dir, exist_ok=True)
+        print("Station ready. Log directory: {}".format(log_dir))
+        if self._ignored:
+            print(
+                "Ports present at start ignored: {}".format(
+                    ", ".join(sorted(self._ignored))
+                )
+            )
+
+    def list_ports(self) -> list[str]:
+        return [
+            p.device
+            for p in list_ports.comports()
+            if fnmatch.fnmatch(p.device, self._match)
+        ]
+
+    def open_port(self, name: str) -> Serial:
+        return open_port(name)
+
+    def scan(self):
+
+        now = time.monotonic()
+        if now < self._next_scan:
+            return
+        self._next_scan = now + SCAN_INTERVAL
+
+        names = set(self.list_ports())
+        self._ignored &= names
+
+        for name in sorted(names - self._ignored):
+            port = self._ports.get(name)
+            if port is None:
+                try:
+                    ser = self.open_port(name)
+                except Exception as e:
+                    print(f"{name}: cannot open: {e}")
+                    self._ignored.add(name)
+                    continue
+                print(f"{name}: plugged in")
+                self._ports[name] = _Unit(self, name, ser)
+            elif isinstance(port, _Unit) and port.ser is None:
+                try:
+                    port.attach(self.open_port(name))
+                except Exception:
+                    pass
+
+        for name in list(self._ports):
+            if name in names:
+                continue
+            port = self._ports[name]
+            if isinstance(port, _Unit):
+                if port.detach():
+                    continue
+                port.result = "unplugged"
+                self.finish(port)
+            print(f"{name}: unplugged")
+            port.close()
+            del self._ports[name]
+
+    def loop(self) -> bool:
+        """Never done by itself; stop with Ctrl-C"""
+
+        self.scan()
+
+        for name, port in list(self._ports.items()):
+            if port.loop():
+                continue
+            if isinstance(port, _Unit):
+                self.finish(port)
+                if port.ser:
+                    self._ports[name] = _Idle(port.ser)
+                else:
+                    del self._ports[name]
+            else:
+                print(f"{name}: new unit")
+                self._ports[name] = _Unit(self, name, port.ser)
+
+        return True
+
+    def finish(self, unit: "_Unit"):
+
+        if unit.ok:
+            self.passed += 1
+        else:
+            self.failed += 1
+
+        dt = time.monotonic() - unit.t0
+        line = "{} {} {} {} {:.1f}s {}".format(
+            unit.start,
+            unit.name,
+            unit.uid or "-",
+            "PASS" if unit.ok else "FAIL",
+            dt,
+            unit.result,
+        )
+        with open(os.path.join(self.log_dir, "results.log"), "a") as fd:
+            fd.write(line + "\n")
+
+        unit.status(
+            "{} in {:.1f} s: {}".format("PASS" if unit.ok else "FAIL", dt, unit.result)
+        )
+        unit.log.close()
+        print("Passed {}, failed {}".format(self.passed, self.failed))
+
+    def close(self):
+        for port in self._ports.values():
+            if isinstance(port, _Unit):
+                port.result = "interrupted"
+                self.finish(port)
+            port.close()
+        self._ports = {}
+
+
+class _Idle:
+    """
+    Port of a finished unit, listening for the next bootloader. A unit that
+    failed in the bootloader keeps beaconing, so the port must go quiet
+    (radio off or swapped) before beacons count again
+    """
+
+    def __init__(self, ser: Serial):
+        self.ser = ser
+        self._session = ss.Session(ser)
+        self._last = time.monotonic()
+
+    def loop(self) -> bool:
+        """False when a bootloader beacons after a quiet spell"""
+
+        if self._session is None:
+            return True
+        try:
+            msg = self._session.recv_msg()
+        except OSError:
+            self._session = None
+            return True
+
+        if msg is None or mm.MSG_NOTIFY_DEV_INFO != msg.get_msg_type():
+            return True
+
+        now = time.monotonic()
+        quiet = now - self._last
+        self._last = now
+        return quiet < REARM_QUIET
+
+    def close(self):
+        self.ser.close()
+
+
+class _Unit:
+
+    def __init__(self, station: Station, name: str, ser: Serial):
+        self.station = station
+        self.name = name
+        self.ser = ser
+        self.uid = None
+        self.ok = False
+        self.result = ""
+        self.steps = []
+
+        self.t0 = time.monotonic()
+        self.start = datetime.now().isoformat(timespec="seconds")
+        file = "{}-{}.log".format(
+            datetime.now().strftime("%Y%m%d-%H%M%S"),
+            os.path.basename(name).replace(":", ""),
+        )
+        self.log = open(os.path.join(station.log_dir, file), "w")
+        self.console = sys.stdout
+
+        self._state = _Identify(self)
+
+    def status(self, s: str):
+        print(f"{self.name}: {s}", file=self.console)
+        print(f"== {s}", file=self.log, flush=True)
+
+    def end(self, result: str) -> bool:
+        self.result = result
+        return False
+
+    def attach(self, ser: Serial):
+        self.ser = ser
+        self.status("port back")
+
+    def detach(self) -> bool:
+        """Port went away. True if the unit can wait for it to come back"""
+
+        if not isinstance(self._state, _WaitReboot):
+            return False
+        if self.ser:
+            self.ser.close()
+            self.ser = None
+        return True
+
+    def loop(self) -> bool:
+
+        with contextlib.redirect_stdout(self.log):
+            try:
+                next = self._state.loop()
+            except OSError as e:
+                if self.detach():
+                    return True
+                return self.end(f"port error: {e}")
+
+        if isinstance(next, bool):
+            return next
+        elif next:
+            self._state = next
+        return True
+
+    def close(self):
+        if self.ser:
+            self.ser.close()
+
+
+class _State:
+    def __init__(self, unit: _Unit):
+        self.unit = unit
+        self.station = unit.station
+
+    def loop(self) -> bool | object:
+        raise NotImplementedError()
+
+    def after_firmware(self):
+        if self.station.config is None:
+            self.unit.ok = bool(self.unit.steps)
+            return self.unit.end(" -> ".join(self.unit.steps) or "nothing to do")
+        return _Restore(self.unit)
+
+
+class _Identify(_State):
+    """0x0514 goes out at once; a beacon or the 0x0515 reply decides"""
+
+    def __init__(self, unit: _Unit):
+        super().__init__(unit)
+        self.session = ss.Session(unit.ser)
+        self.beacon = None
+
+        def on_other(msg: mm.Msg):
+            if mm.MSG_NOTIFY_DEV_INFO == msg.get_msg_type():
+                self.beacon = msg
+
+        self.session.on_other = on_other
+        self.session.hello()
+
+    def loop(self):
+
+        try:
+            self.session.loop()
+        except ss.SessionError:
+            return self.unit.end("no bootloader or firmware answering")
+
+        if self.beacon is not None:
+            self.unit.uid = bytes(self.beacon.buf[4:20]).hex()
+            bl_ver = pp._Init.get_bl_ver(self.beacon)
+            self.unit.status(f"bootloader {bl_ver}, UID {self.unit.uid}")
+            if self.station.fw_image is None:
+                return self.unit.end("in bootloader, no firmware given")
+            return _Flash(self.unit)
+
+        info = self.session.dev_info
+        if info is not None:
+            self.unit.status(f"firmware '{info.ver}' running, flash skipped")
+            return self.after_firmware()
+
+        return None
+
+
+class _Flash(_State):
+
+    def __init__(self, unit: _Unit):
+        super().__init__(unit)
+        unit.status("flashing..")
+        self.prog = pp.Programmer(unit.ser, self.station.fw_image, self.station.bl_ver)
+
+    def loop(self):
+
+        if self.prog.loop():
+            return None
+
+        if not self.prog.ok:
+            return self.unit.end("flash failed")
+
+        self.unit.steps.append("flash")
+        self.unit.status("flashed, waiting for reboot..")
+        return _WaitReboot(self.unit)
+
+
+class _WaitReboot(_State):
+
+    def __init__(self, unit: _Unit):
+        super().__init__(unit)
+        self.session = None
+        self.deadline = time.monotonic() + REBOOT_TIMEOUT
+
+    def loop(self):
+
+        if time.monotonic() > self.deadline:
+            return self.unit.end("no firmware after flash; power-cycle and retry")
+
+        if self.unit.ser is None:
+            self.session = None
+            return None
+        if self.session is None:
+            self.session = ss.Session(self.unit.ser)
+
+        try:
+            if not self.session.connect():
+                return None
+        except ss.SessionError:
+            # Still booting; start over
+            self.session = None
+            return None
+
+        self.unit.status(f"firmware '{self.session.dev_info.ver}' up")
+        return self.after_firmware()
+
+
+class _Restore(_State):
+
+    def __init__(self, unit: _Unit):
+        super().__init__(unit)
+        verify = self.station.verify
+        unit.status("restoring config{}..".format(" with verify" if verify else ""))
+        # Every region but calibration: channels, names, attributes, VFO, settings
+        self.op = rr.EepromDump(
+            unit.ser, dd.DUMP_CONFIG, None, self.station.config, verify
+        )
+
+    def loop(self):
+
+        if self.op.loop():
+            return None
+
+        if not self.op.ok:
+            return self.unit.end("restore failed")
+
+        self.unit.steps.append("restore+verify" if self.station.verify else "restore")
+        self.unit.ok = True
+        return self.unit.end(" -> ".join(self.unit.steps))
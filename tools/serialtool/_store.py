@@ -0,0 +1,384 @@
+# Copyright (c) 2025 muzkr
+#
+#   https://github.com/muzkr
+#
+# Licensed under the MIT License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at the root of this repository.
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+
+"""
+Deduplicated backup store
+
+Layout of a store directory:
+
+    CURRENT             name of the live generation directory
+    <gen>/blocks.pack   every unique 16-byte block once, block id = offset / 16
+    <gen>/manifests/<h> dump size + zlib'ed block ids, <h> = SHA-256 of the dump
+    radios/<uid>        one line per backup: '<time> <h> <size>'
+    lock                held by add and gc
+
+A 16-byte block is its own content address (a digest would be no smaller),
+so the in-memory index maps block bytes to block id. Manifests are named by
+the hash of the whole dump, hence identical nightly dumps share a manifest
+and cost one line of history.
+
+Block ids change when gc repacks, so the pack and the manifests that point
+into it are one generation: gc writes a complete new generation, then
+switches CURRENT to it with one atomic rename. A crash leaves either the old
+or the new generation live, never a mix. Until the first gc the store root
+is the generation.
+"""
+
+from array import array
+from datetime import datetime
+import hashlib
+import os
+import shutil
+import sys
+import time
+import zlib
+import _layout as ll
+
+_BS = ll.BLOCK_SIZE
+
+# Seconds to wait for another add / gc to release the lock
+LOCK_TIMEOUT = 10.0
+
+
+class StoreError(Exception):
+    pass
+
+
+class BackupStore:
+
+    def __init__(self, root: str):
+        self.root = root
+        self._current_file = os.path.join(root, "CURRENT")
+        self._lock_file = os.path.join(root, "lock")
+        self._radio_dir = os.path.join(root, "radios")
+
+        # Generation the in-memory pack was loaded from, and its size on disk
+        self._gen: str | None = None
+        self._pack_size = 0
+        self._pack: bytearray | None = None
+        self._index: dict[bytes, int] | None = None
+
+        os.makedirs(self._radio_dir, exist_ok=True)
+
+    # ------------------
+    #  Generations
+
+    def _generation(self) -> str:
+        """Directory of the live generation"""
+
+        try:
+            with open(self._current_file, "r") as fd:
+                name = fd.read().strip()
+        except FileNotFoundError:
+            return self.root
+        return os.path.join(self.root, name)
+
+    def _lock(self) -> "_Lock":
+        return _Lock(self._lock_file)
+
+    # ------------------
+    #  Blocks
+
+    def _load(self):
+
+        gen = self._generation()
+        pack_file = os.path.join(gen, "blocks.pack")
+        try:
+            size = os.path.getsize(pack_file)
+        except FileNotFoundError:
+            size = 0
+
+        # Up to date unless gc or another add ran meanwhile
+        if self._pack is not None and gen == self._gen and size == self._pack_size:
+            return
+
+        pack = bytearray()
+        if size:
+            with open(pack_file, "rb") as fd:
+                pack.extend(fd.read())
+
+        # Drop a torn tail
+        del pack[len(pack) // _BS * _BS :]
+
+        index = {}
+        with memoryview(pack) as view:
+            for i in range(len(pack) // _BS):
+                index.setdefault(bytes(view[i * _BS : (i + 1) * _BS]), i)
+
+        self._gen = gen
+        self._pack_size = size
+        self._pack = pack
+        self._index = index
+
+    def block_count(self) -> int:
+        self._load()
+        return len(self._pack) // _BS
+
+    # ------------------
+    #  Dumps
+
+    def add(self, uid: str, data: bytes, when: str | None = None) -> str:
+        """Store a dump of radio `uid`. Returns its manifest id"""
+
+        _check_uid(uid)
+        if when is None:
+            when = datetime.now().isoformat(timespec="seconds")
+
+        h = hashlib.sha256(data).hexdigest()[:32]
+
+        with self._lock():
+            self._load()
+            man_dir = os.path.join(self._gen, "manifests")
+            man_file = os.path.join(man_dir, h)
+
+            if not os.path.exists(man_file):
+                padded = bytes(data) + b"\xff" * (-len(data) % _BS)
+                ids = array("I")
+                new = bytearray()
+                next_id = len(self._pack) // _BS
+                for off in range(0, len(padded), _BS):
+                    blk = padded[off : off + _BS]
+                    id = self._index.get(blk)
+                    if id is None:
+                        id = next_id
+                        next_id += 1
+                        self._index[blk] = id
+                        new.extend(blk)
+                    ids.append(id)
+
+                if new or self._pack_size != len(self._pack):
+                    # Append after the last whole block, over a torn tail
+                    pack_file = os.path.join(self._gen, "blocks.pack")
+                    with open(pack_file, "r+b" if self._pack_size else "wb") as fd:
+                        fd.seek(len(self._pack))
+                        fd.truncate()
+                        fd.write(new)
+                    self._pack.extend(new)
+                    self._pack_size = len(self._pack)
+
+                os.makedirs(man_dir, exist_ok=True)
+                _write_manifest(man_file, len(data), ids)
+
+            with open(os.path.join(self._radio_dir, uid), "a") as fd:
+                fd.write(f"{when} {h} {len(data)}\n")
+
+        return h
+
+    def get(self, h: str) -> bytes:
+        """Rebuild a dump from its manifest"""
+
+        self._load()
+        size, ids = _read_manifest(os.path.join(self._gen, "manifests", h))
+
+        out = bytearray(len(ids) * _BS)
+        pack = self._pack
+        for i, id in enumerate(ids):
+            out[i * _BS : (i + 1) * _BS] = pack[id * _BS : (id + 1) * _BS]
+
+        del out[size:]
+        return bytes(out)
+
+    def uids(self) -> list[str]:
+        return sorted(
+            name for name in os.listdir(self._radio_dir) if not name.endswith(".tmp")
+        )
+
+    def history(self, uid: str) -> list[tuple[str, str, int]]:
+        """(time, manifest id, size) of each backup, oldest first"""
+
+        _check_uid(uid)
+        file = os.path.join(self._radio_dir, uid)
+        if not os.path.exists(file):
+            return []
+
+        entries = []
+        with open(file, "r") as fd:
+            for line in fd:
+                parts = line.split()
+                if 3 == len(parts):
+                    entries.append((parts[0], parts[1], int(parts[2])))
+
+        entries.sort(key=lambda e: e[0])
+        return entries
+
+    def find(self, spec: str) -> tuple[str, str, int]:
+        """
+        'uid' -> latest backup of the radio; 'uid@2025-06' -> latest one
+        whose time starts with '2025-06'
+        """
+
+        uid, _, at = spec.partition("@")
+        entries = [e for e in self.history(uid) if e[0].startswith(at)]
+        if not entries:
+            raise StoreError("No backup matches '{}'".format(spec))
+        return entries[-1]
+
+    # ------------------
+    #  Garbage collection
+
+    def gc(self, keep: int | None = None) -> tuple[int, int, int]:
+        """
+        Drop all but the latest `keep` backups per radio (None keeps all),
+        then repack unreferenced blocks and manifests away.
+        Returns (blocks before, blocks after, manifests removed)
+        """
+
+        with self._lock():
+            return self._gc(keep)
+
+    def _gc(self, keep: int | None) -> tuple[int, int, int]:
+
+        if keep is not None:
+            for uid in self.uids():
+                entries = self.history(uid)
+                if len(entries) > keep:
+                    self._write_history(uid, entries[len(entries) - keep :])
+
+        live = set()
+        for uid in self.uids():
+            live.update(h for _, h, _ in self.history(uid))
+
+        self._load()
+        old = self._gen
+        before = len(self._pack) // _BS
+
+        man_dir = os.path.join(old, "manifests")
+        manifests = {}
+        removed = 0
+        for h in os.listdir(man_dir) if os.path.isdir(man_dir) else []:
+            if h.endswith(".tmp"):
+                continue
+            if h in live:
+                manifests[h] = _read_manifest(os.path.join(man_dir, h))
+            else:
+                removed += 1
+
+        # Repack in order of first use
+        remap = {}
+        pack = bytearray()
+        for h in sorted(manifests):
+            size, ids = manifests[h]
+            for i, id in enumerate(ids):
+                id2 = remap.get(id)
+                if id2 is None:
+                    id2 = len(remap)
+                    remap[id] = id2
+                    pack.extend(self._pack[id * _BS : (id + 1) * _BS])
+                ids[i] = id2
+
+        # New generation, complete on disk before it goes live
+        n = 0 if old == self.root else int(os.path.basename(old)[4:])
+        name = "gen-{:06d}".format(n + 1)
+        gen = os.path.join(self.root, name)
+        # Left over by a gc that crashed before the switch
+        shutil.rmtree(gen, ignore_errors=True)
+        os.makedirs(os.path.join(gen, "manifests"))
+        for h, (size, ids) in manifests.items():
+            _write_manifest(os.path.join(gen, "manifests", h), size, ids)
+        with open(os.path.join(gen, "blocks.pack"), "wb") as fd:
+            fd.write(pack)
+            fd.flush()
+            os.fsync(fd.fileno())
+
+        tmp = self._current_file + ".tmp"
+        with open(tmp, "w") as fd:
+            fd.write(name + "\n")
+            fd.flush()
+            os.fsync(fd.fileno())
+        os.replace(tmp, self._current_file)
+
+        # Old generation is garbage now
+        if old == self.root:
+            shutil.rmtree(man_dir, ignore_errors=True)
+            try:
+                os.remove(os.path.join(old, "blocks.pack"))
+            except FileNotFoundError:
+                pass
+        else:
+            shutil.rmtree(old, ignore_errors=True)
+
+        self._gen = None
+        self._pack = None
+        self._index = None
+        return before, len(pack) // _BS, removed
+
+    def _write_history(self, uid: str, entries: list):
+        file = os.path.join(self._radio_dir, uid)
+        with open(file + ".tmp", "w") as fd:
+            for when, h, size in entries:
+                fd.write(f"{when} {h} {size}\n")
+        os.replace(file + ".tmp", file)
+
+
+class _Lock:
+    """Lock file, created exclusively; held for the `with` block"""
+
+    def __init__(self, file: str):
+        self.file = file
+
+    def __enter__(self):
+
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while True:
+            try:
+                fd = os.open(self.file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if time.monotonic() >= deadline:
+                    raise StoreError(
+                        "Store is locked. If no other store command is running,"
+                        " remove '{}'".format(self.file)
+                    )
+                time.sleep(0.1)
+                continue
+            os.write(fd, "{}\n".format(os.getpid()).encode())
+            os.close(fd)
+            return self
+
+    def __exit__(self, *exc):
+        os.remove(self.file)
+
+
+def _check_uid(uid: str):
+    if not uid or any(c in uid for c in "/\\@ \t\n") or uid.startswith("."):
+        raise StoreError("Invalid radio UID '{}'".format(uid))
+
+
+def _write_manifest(file: str, size: int, ids: array):
+    ids = array("I", ids)
+    if "little" != sys.byteorder:
+        ids.byteswap()
+
+    tmp = file + ".tmp"
+    with open(tmp, "wb") as fd:
+        fd.write(size.to_bytes(4, "little"))
+        fd.write(zlib.compress(ids.tobytes(), 9))
+        fd.flush()
+        os.fsync(fd.fileno())
+    os.replace(tmp, file)
+
+
+def _read_manifest(file: str) -> tuple[int, array]:
+    try:
+        with open(file, "rb") as fd:
+            raw = fd.read()
+    except OSError as e:
+        raise StoreError("Cannot read manifest: {}".format(e))
+
+    ids = array("I")
+    ids.frombytes(zlib.decompress(raw[4:]))
+    if "little" != sys.byteorder:
+        ids.byteswap()
+
+    return int.from_bytes(raw[:4], "little"), ids
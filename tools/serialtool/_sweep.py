@@ -0,0 +1,291 @@
+# Copyright (c) 2025 muzkr
+#
+#   https://github.com/muzkr
+#
+# Licensed under the MIT License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at the root of this repository.
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+
+"""
+Host-driven spectrum sweep
+
+Each step is one packet run: 0x0602 writes of REG_38/39 (frequency) and a
+REG_30 toggle to retune, `settle` + 1 0x0527 RSSI polls, then a 0x0601 read
+of REG_38. The firmware handles one command per main-loop pass, so the extra
+polls give the receiver time to settle; the last RSSI before the REG_38 reply
+belongs to the frequency that reply carries, which keeps steps matched even
+when a reply is lost. REG_38 alone repeats every 655.36 kHz, so on rows where
+it does the step also reads REG_39 just before it. Steps are pipelined; lost
+ones are swept again at the end of the row.
+
+The RX filter path (GPIO) is not switched, so keep a sweep on one side of
+280 MHz.
+
+Waterfall file: NumPy .npz with 'rssi' (rows x steps, raw 0x0527 units),
+'freq' (Hz) and 'time' (row start, seconds since epoch).
+"""
+
+from serial import Serial
+import time
+import msg as mm
+import _session as ss
+import _regs as rg
+import _telemetry as tm
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+REG_30 = 0x30
+REG_38 = 0x38
+REG_39 = 0x39
+
+# Sweeps of lost steps per row
+ROW_RETRY = 3
+
+
+class Sweep:
+
+    def __init__(
+        self,
+        ser: Serial,
+        start: int,
+        stop: int,
+        step: int,
+        rows: int | None = None,
+        file: str | None = None,
+        settle: int = 1,
+        plot: bool = False,
+    ):
+        self._session = ss.Session(ser)
+        self._freqs = np.arange(start, stop + 1, step, dtype=np.uint32)
+        self._rows = rows
+        self._file = file
+        self._settle = settle
+        self._plot = _Plot(self._freqs) if plot else None
+        self._waterfall = []
+        self._times = []
+        self._saved = {}
+        self._state = _Connect(self)
+
+    def loop(self) -> bool:
+        return ss.step(self)
+
+    def after_row(self, row, when: float) -> bool:
+        self._waterfall.append(row)
+        self._times.append(when)
+        if self._plot:
+            self._plot.update(self._waterfall)
+        return self._rows is None or len(self._waterfall) < self._rows
+
+    def close(self):
+        """Restore tuning and save the waterfall"""
+
+        if self._saved:
+            # Only what was read: Ctrl-C may come before all of it is in
+            saved = self._saved
+            self._saved = {}
+            packet = b"".join(
+                rg.write_packet(reg, saved[reg]) for reg in (REG_38, REG_39) if reg in saved
+            )
+            if REG_30 in saved:
+                packet += rg.write_packet(REG_30, 0) + rg.write_packet(REG_30, saved[REG_30])
+            self._session.post(packet)
+
+        if self._file and self._waterfall:
+            np.savez_compressed(
+                self._file,
+                rssi=np.stack(self._waterfall),
+                freq=self._freqs,
+                time=np.array(self._times),
+            )
+            print(
+                "{} rows x {} steps saved to {}".format(
+                    len(self._waterfall), len(self._freqs), self._file
+                )
+            )
+
+
+class _State:
+    def __init__(self, op: Sweep):
+        self.op = op
+        self.session: ss.Session = op._session
+
+    def loop(self) -> bool | object:
+        raise NotImplementedError()
+
+
+class _Connect(_State):
+
+    def __init__(self, op: Sweep):
+        super().__init__(op)
+        self.quiet = False
+
+    def loop(self):
+
+        if not self.quiet:
+            if not self.session.wait_quiet():
+                return None
+            self.quiet = True
+
+            def on_value(reg: int, value: int):
+                self.op._saved[reg] = value
+
+            for reg in (REG_30, REG_38, REG_39):
+                rg.read_reg(self.session, reg, on_value)
+
+        if self.session.loop():
+            return None
+
+        print(
+            "Sweep {:.4f} - {:.4f} MHz, {} steps..".format(
+                self.op._freqs[0] / 1e6, self.op._freqs[-1] / 1e6, len(self.op._freqs)
+            )
+        )
+        return _SweepRow(self.op)
+
+
+class _SweepRow(_State):
+
+    def __init__(self, op: Sweep):
+        super().__init__(op)
+        self.freqs = op._freqs
+        self.reg30 = op._saved[REG_30]
+        self.row = np.zeros(len(self.freqs), dtype=np.uint16)
+        self.done = np.zeros(len(self.freqs), dtype=bool)
+        self.rssi = None
+        self.tries = 1
+        self.start = time.time()
+        self.t0 = time.monotonic()
+
+        # (REG_39, REG_38) -> step; REG_39 is None on rows where REG_38 is unique
+        self.steps = {}
+        lows = [int(f) // 10 & 0xFFFF for f in self.freqs]
+        self.wide = len(set(lows)) < len(lows)
+        self.reg39 = None
+        self.session.on_other = self.on_other
+
+        for i in range(len(self.freqs)):
+            self.submit(i)
+
+    def submit(self, i: int, refill: bool = False):
+
+        f = int(self.freqs[i]) // 10
+        self.steps[(f >> 16 if self.wide else None, f & 0xFFFF)] = i
+
+        # REG_39 only when it changes along the row
+        packet = rg.write_packet(REG_38, f & 0xFFFF)
+        if refill or 0 == i or f >> 16 != int(self.freqs[i - 1]) // 10 >> 16:
+            packet += rg.write_packet(REG_39, f >> 16)
+
+        poll = mm.Msg(4)
+        poll.set_msg_type(tm.MSG_RSSI)
+        poll = mm.make_packet(poll.buf)
+
+        def on_value(reg: int, value: int):
+            self.on_step(value)
+
+        # REG_39 read has no request of its own: on_other() takes its reply
+        read39 = b""
+        if self.wide:
+            read39 = rg.read_request(REG_39, None).packet
+
+        req = rg.read_request(REG_38, on_value)
+        req.packet = (
+            packet
+            + rg.write_packet(REG_30, 0)
+            + rg.write_packet(REG_30, self.reg30)
+            + poll * (1 + self.op._settle)
+            + read39
+            + req.packet
+        )
+        self.session.submit(req)
+
+    def on_other(self, msg: mm.Msg):
+        msg_type = msg.get_msg_type()
+        if tm.MSG_RSSI_RESP == msg_type:
+            self.rssi = msg.get_hw_LE(4)
+        elif rg.MSG_READ_REG == msg_type and REG_39 == msg.buf[4]:
+            self.reg39 = msg.get_hw_LE(5)
+
+    def on_step(self, value: int):
+        i = self.steps.get((self.reg39, value))
+        if i is not None and self.rssi is not None:
+            self.row[i] = self.rssi
+            self.done[i] = True
+        self.rssi = None
+        self.reg39 = None
+
+    def loop(self):
+
+        if self.session.loop():
+            return None
+
+        missing = np.flatnonzero(~self.done)
+        if len(missing) and self.tries <= ROW_RETRY:
+            self.tries += 1
+            for i in missing:
+                self.submit(int(i), True)
+            return None
+
+        t = time.monotonic() - self.t0
+        peak = int(np.argmax(self.row))
+        print(
+            "Row {}: {:.0f} steps/s, peak {:.1f} dBm at {:.4f} MHz{}".format(
+                len(self.op._waterfall) + 1,
+                len(self.freqs) / t,
+                tm.rssi_dBm(self.row[peak]),
+                self.freqs[peak] / 1e6,
+                f", {len(missing)} lost" if len(missing) else "",
+            )
+        )
+
+        self.session.on_other = None
+        if not self.op.after_row(self.row, self.start):
+            return False
+        return _SweepRow(self.op)
+
+
+class _Plot:
+
+    def __init__(self, freqs):
+        try:
+            import matplotlib.pyplot as plt
+        except ImportError:
+            print("matplotlib not installed. No live plot")
+            self._plt = None
+            return
+
+        self._plt = plt
+        self._extent = (freqs[0] / 1e6, freqs[-1] / 1e6, 0, 1)
+        plt.ion()
+        self._fig, self._ax = plt.subplots()
+        self._image = None
+
+    def update(self, waterfall: list):
+        plt = self._plt
+        if plt is None:
+            return
+
+        dBm = tm.rssi_dBm(np.stack(waterfall[::-1]).astype(float))
+        extent = self._extent[:3] + (len(waterfall),)
+        if self._image is None:
+            self._image = self._ax.imshow(
+                dBm, aspect="auto", extent=extent, cmap="viridis"
+            )
+            self._ax.set_xlabel("MHz")
+            self._ax.set_ylabel("row")
+            self._fig.colorbar(self._image, label="dBm")
+        else:
+            self._image.set_data(dBm)
+            self._image.set_extent(extent)
+            self._image.autoscale()
+        plt.pause(0.001)
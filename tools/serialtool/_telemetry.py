@@ -0,0 +1,301 @@
+# Copyright (c) 2025 muzkr
+#
+#   https://github.com/muzkr
+#
+# Licensed under the MIT License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at the root of this repository.
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+
+"""
+Radio telemetry sampler
+
+Polls 0x0527 (RSSI, noise, glitch) and, less often, 0x0529 (battery) with
+several requests in flight. Samples go into a fixed-size columnar ring and
+are streamed to a file in batches, so memory stays flat however long it runs.
+
+Binary file format: 8-byte magic, then one little-endian RECORD per sample.
+"""
+
+from serial import Serial
+from array import array
+import csv
+import struct
+import time
+import msg as mm
+import _session as ss
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MSG_RSSI = 0x0527
+MSG_RSSI_RESP = 0x0528
+MSG_BATTERY = 0x0529
+MSG_BATTERY_RESP = 0x052A
+
+# Requests kept in flight
+DEPTH = 8
+
+# One battery poll per this many RSSI polls
+BATTERY_EVERY = 16
+
+# Rows written to the output file at a time
+FLUSH_ROWS = 256
+
+MAGIC = b"K5TELEM1"
+
+COLUMNS = (
+    ("time", "d"),
+    ("rssi", "H"),
+    ("noise", "B"),
+    ("glitch", "B"),
+    ("voltage", "H"),
+    ("current", "H"),
+)
+
+RECORD = struct.Struct("<dHBBHH")
+
+
+def rssi_dBm(rssi: float) -> float:
+    return rssi / 2 - 160
+
+
+class Ring:
+    """Fixed-size ring of samples, one array per column"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.count = 0  # Samples ever pushed
+        self.cols = {}
+        for name, code in COLUMNS:
+            if np is not None:
+                self.cols[name] = np.zeros(size, dtype=np.dtype(code))
+            else:
+                self.cols[name] = array(code, bytes(size * array(code).itemsize))
+
+    def push(self, row: tuple):
+        i = self.count % self.size
+        for (name, _), v in zip(COLUMNS, row):
+            self.cols[name][i] = v
+        self.count += 1
+
+    def rows(self, start: int, end: int):
+        """Samples [start, end) by overall sample number, still in the ring"""
+
+        start = max(start, end - self.size, 0)
+        cols = [self.cols[name] for name, _ in COLUMNS]
+        for n in range(start, end):
+            i = n % self.size
+            yield tuple(col[i] for col in cols)
+
+    def column(self, name: str, start: int, end: int) -> list:
+        start = max(start, end - self.size, 0)
+        col = self.cols[name]
+        if start >= end:
+            return []
+
+        i, j = start % self.size, end % self.size
+        if i < j or 0 == j:
+            return col[i : j or self.size]
+        if np is not None:
+            return np.concatenate((col[i:], col[:j]))
+        return col[i:] + col[:j]
+
+
+class SampleWriter:
+
+    def __init__(self, file: str):
+        self._csv = file.lower().endswith(".csv")
+        if self._csv:
+            self._fd = open(file, "w", newline="")
+            self._w = csv.writer(self._fd)
+            self._w.writerow([name for name, _ in COLUMNS])
+        else:
+            self._fd = open(file, "wb")
+            self._fd.write(MAGIC)
+
+    def write(self, rows):
+        if self._csv:
+            self._w.writerows(
+                (f"{r[0]:.4f}", *(int(v) for v in r[1:])) for r in rows
+            )
+        else:
+            self._fd.write(b"".join(RECORD.pack(*r) for r in rows))
+        self._fd.flush()
+
+    def close(self):
+        self._fd.close()
+
+
+def read_samples(file: str) -> list[tuple]:
+    """Load a binary sample file"""
+
+    with open(file, "rb") as fd:
+        raw = fd.read()
+    if raw[: len(MAGIC)] != MAGIC:
+        raise ValueError("Not a telemetry file")
+
+    raw = raw[len(MAGIC) :]
+    raw = raw[: len(raw) // RECORD.size * RECORD.size]
+    return list(RECORD.iter_unpack(raw))
+
+
+class Telemetry:
+
+    def __init__(
+        self,
+        ser: Serial,
+        file: str | None = None,
+        ring_size: int = 65536,
+        duration: float | None = None,
+        interval: float = 1.0,
+    ):
+        self._session = ss.Session(ser)
+        self._ring = Ring(max(ring_size, FLUSH_ROWS * 2))
+        self._writer = SampleWriter(file) if file else None
+        self._duration = duration
+        self._interval = interval
+        self._state = _Connect(self)
+
+    def loop(self) -> bool:
+        return ss.step(self)
+
+    def close(self):
+        """Write out what is left in the ring"""
+        if isinstance(self._state, _Sample):
+            self._state.flush(True)
+        if self._writer:
+            self._writer.close()
+
+
+class _State:
+    def __init__(self, op: Telemetry):
+        self.op = op
+        self.session: ss.Session = op._session
+
+    def loop(self) -> bool | object:
+        raise NotImplementedError()
+
+
+class _Connect(_State):
+
+    def loop(self):
+        if not self.session.wait_quiet():
+            return None
+        print("Sampling..")
+        return _Sample(self.op)
+
+
+class _Sample(_State):
+
+    def __init__(self, op: Telemetry):
+        super().__init__(op)
+        self.ring = op._ring
+        self.polls = 0
+        self.voltage = 0
+        self.current = 0
+        self.written = 0
+
+        now = time.monotonic()
+        self.start = now
+        self.end = None if op._duration is None else now + op._duration
+        self.next_report = now + op._interval
+        self.reported = 0
+
+    def on_rssi(self, msg: mm.Msg):
+        self.ring.push(
+            (
+                time.time(),
+                msg.get_hw_LE(4),
+                msg.buf[6],
+                msg.buf[7],
+                self.voltage,
+                self.current,
+            )
+        )
+
+    def on_battery(self, msg: mm.Msg):
+        self.voltage = msg.get_hw_LE(4)
+        self.current = msg.get_hw_LE(6)
+
+    def poll(self):
+        if 0 == self.polls % BATTERY_EVERY:
+            msg = mm.Msg(4)
+            msg.set_msg_type(MSG_BATTERY)
+            self.session.submit(ss.Request(msg, MSG_BATTERY_RESP, None, self.on_battery))
+
+        msg = mm.Msg(4)
+        msg.set_msg_type(MSG_RSSI)
+        self.session.submit(ss.Request(msg, MSG_RSSI_RESP, None, self.on_rssi))
+        self.polls += 1
+
+    def flush(self, all: bool = False):
+        writer = self.op._writer
+        count = self.ring.count
+        if writer is None or count - self.written < (1 if all else FLUSH_ROWS):
+            return
+
+        if count - self.written > self.ring.size:
+            print(f"{count - self.written - self.ring.size} samples lost")
+        writer.write(self.ring.rows(self.written, count))
+        self.written = count
+
+    def report(self, now: float):
+        ring = self.ring
+        start, end = self.reported, ring.count
+        rate = (end - start) / (now - self.next_report + self.op._interval)
+        self.reported = end
+        self.next_report = now + self.op._interval
+
+        if start == end:
+            print(f"{end} samples, no reply")
+            return
+
+        rssi = _stats(ring.column("rssi", start, end))
+        noise = _stats(ring.column("noise", start, end))
+        glitch = _stats(ring.column("glitch", start, end))
+        print(
+            "{} samples, {:.0f}/s, RSSI {:.1f} dBm ({:.1f}..{:.1f}), noise {:.1f}, glitch {:.1f}, battery {}".format(
+                end,
+                rate,
+                rssi_dBm(rssi[0]),
+                rssi_dBm(rssi[1]),
+                rssi_dBm(rssi[2]),
+                noise[0],
+                glitch[0],
+                self.voltage,
+            )
+        )
+
+    def loop(self):
+
+        now = time.monotonic()
+        if self.end is not None and now >= self.end:
+            self.report(now)
+            return False
+
+        while self.session.pending() < DEPTH:
+            self.poll()
+        self.session.loop()
+
+        self.flush()
+        if now >= self.next_report:
+            self.report(now)
+
+        return None
+
+
+def _stats(col) -> tuple[float, int, int]:
+    """(mean, min, max) of a non-empty column"""
+
+    if np is not None:
+        return float(col.mean()), int(col.min()), int(col.max())
+    return sum(col) / len(col), min(col), max(col)
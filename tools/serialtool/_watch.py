@@ -0,0 +1,286 @@
+# Copyright (c) 2025 muzkr
+#
+#   https://github.com/muzkr
+#
+# Licensed under the MIT License (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at the root of this repository.
+#
+#     Unless required by applicable law or agreed to in writing, software
+#     distributed under the License is distributed on an "AS IS" BASIS,
+#     WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#     See the License for the specific language governing permissions and
+#     limitations under the License.
+#
+
+"""
+Live memory change watcher
+
+Watched regions are cut into READ_MAX spans, each read with one 0x051B.
+A CRC of the span tells whether anything moved; only then are its blocks
+compared and the changed fields decoded and printed.
+
+Polling is adaptive: a span that just changed is polled as fast as the
+pipeline allows, then less and less often until it is back at the idle
+interval. Its neighbours are warmed up too, since settings edits tend to
+touch adjacent fields.
+"""
+
+from serial import Serial
+from datetime import datetime
+import heapq
+import time
+import zlib
+import _layout as ll
+import _session as ss
+
+# Reads in flight. A 0x051B packet is 20 bytes on the wire
+DEPTH = 6
+
+# Poll interval of a span that just changed
+HOT_INTERVAL = 0.05
+
+# Seconds of poll interval gained per second without change
+COOL_RATE = 0.2
+
+# Statistics line interval
+STATS_EVERY = 10.0
+
+
+def parse_regions(spec: str | None) -> list[tuple[int, int]]:
+    """'settings,vfo,b000-b0c0' -> [(begin, end)]. None -> settings and VFO"""
+
+    names = {name: (begin, end) for name, begin, end in ll.REGIONS}
+    if not spec:
+        return [names["settings"], names["vfo"]]
+
+    regions = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if part in names:
+            regions.append(names[part])
+            continue
+        try:
+            a, b = part.split("-", 1)
+            a, b = int(a, 16), int(b, 16)
+        except ValueError:
+            raise ValueError(
+                "Invalid region '{}'. Use {} or hex 'begin-end'".format(
+                    part, ", ".join(names)
+                )
+            )
+        if a >= b or b > 0x10000:
+            raise ValueError("Invalid region '{}'".format(part))
+        regions.append((a, b))
+
+    return regions
+
+
+def describe_change(blk: int, old: bytes, new: bytes) -> list[str]:
+    """Decoded differences within one block"""
+
+    lines = []
+    seen = set()
+    for i in range(len(new)):
+        if old[i] == new[i]:
+            continue
+        addr = blk + i
+        name = ll.describe(addr)
+        if name in seen:
+            continue
+        seen.add(name)
+        lines.extend(_describe_field(name, addr, blk, old, new))
+    return lines
+
+
+def _describe_field(
+    name: str, addr: int, blk: int, old: bytes, new: bytes
+) -> list[str]:
+
+    # Settings fields: whole value, as far as the block holds it
+    for off, size, field in ll.SETTINGS_FIELDS:
+        if off <= addr < off + size:
+            a = max(off, blk) - blk
+            b = min(off + size, blk + len(new)) - blk
+            if size <= 2 and size == b - a:
+                va = int.from_bytes(old[a:b], "little")
+                vb = int.from_bytes(new[a:b], "little")
+                return [f"{name}: {va} -> {vb}"]
+            return [f"{name}: {old[a:b].hex(' ')} -> {new[a:b].hex(' ')}"]
+
+    # Channel records decode on their own; name and attributes live elsewhere
+    if name.startswith("channel "):
+        ch = (blk - ll.CHANNEL_BASE) // ll.CHANNEL_SIZE
+        empty = b"\xff" * ll.NAME_SIZE
+        da = ll.decode_channel(ch, old, empty, 0)
+        db = ll.decode_channel(ch, new, empty, 0)
+        return [
+            f"{name} {k}: {da[k]} -> {db[k]}"
+            for k in ll.CHANNEL_FIELDS
+            if da[k] != db[k] and k not in ("name", "compander", "scanlist")
+        ]
+
+    if name.startswith("name "):
+        return [
+            "{}: '{}' -> '{}'".format(name, ll.decode_name(old), ll.decode_name(new))
+        ]
+
+    i = addr - blk
+    return [f"{name}: {old[i]:02x} -> {new[i]:02x} @{addr:04x}"]
+
+
+class _Span:
+
+    def __init__(self, off: int, size: int):
+        self.off = off
+        self.size = size
+        self.data = None
+        self.crc = None
+        # Long ago: starts at the idle interval
+        self.changed = -1e9
+
+
+class Watch:
+
+    def __init__(
+        self,
+        ser: Serial,
+        regions: list[tuple[int, int]],
+        duration: float | None = None,
+        idle: float = 1.0,
+    ):
+        self._session = ss.Session(ser)
+
+        # Overlapping regions read once
+        merged = []
+        for begin, end in sorted(regions):
+            if merged and begin <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([begin, end])
+
+        self._spans = []
+        for begin, end in merged:
+            for off in range(begin, end, ss.READ_MAX):
+                self._spans.append(_Span(off, min(ss.READ_MAX, end - off)))
+        self._duration = duration
+        self._idle = idle
+        self._state = _Connect(self)
+
+    def loop(self) -> bool:
+        return ss.step(self)
+
+    def close(self):
+        if isinstance(self._state, _Watch):
+            self._state.stop(time.monotonic())
+
+
+class _State:
+    def __init__(self, op: Watch):
+        self.op = op
+        self.session: ss.Session = op._session
+
+    def loop(self) -> bool | object:
+        raise NotImplementedError()
+
+
+class _Connect(_State):
+
+    def loop(self):
+        if not self.session.connect():
+            return None
+        return _Watch(self.op)
+
+
+class _Watch(_State):
+
+    def __init__(self, op: Watch):
+        super().__init__(op)
+        self.spans = op._spans
+        self.index = {span.off: i for i, span in enumerate(self.spans)}
+        self.idle = op._idle
+        self.t0 = time.monotonic()
+        self.end = None if op._duration is None else self.t0 + op._duration
+
+        # (due time, span index), spans not in flight
+        self.due = [(self.t0, i) for i in range(len(self.spans))]
+        self.reads = 0
+        self.changes = 0
+        self.next_stats = self.t0 + STATS_EVERY
+
+        size = sum(span.size for span in self.spans)
+        print(f"Watching {size} bytes in {len(self.spans)} spans. Ctrl-C to stop")
+
+    def interval(self, span: _Span, now: float) -> float:
+        return min(self.idle, HOT_INTERVAL + (now - span.changed) * COOL_RATE)
+
+    def on_data(self, off: int, data: bytes):
+
+        now = time.monotonic()
+        self.reads += 1
+
+        i = self.index[off]
+        span = self.spans[i]
+        crc = zlib.crc32(data)
+
+        if span.crc is not None and crc != span.crc:
+            self.report(span, data)
+            span.changed = now
+
+            # Warm up the neighbours, half way down from hot
+            for j in (i - 1, i + 1):
+                if 0 <= j < len(self.spans):
+                    n = self.spans[j]
+                    n.changed = max(n.changed, now - self.idle / COOL_RATE / 2)
+
+        span.data = data
+        span.crc = crc
+        heapq.heappush(self.due, (now + self.interval(span, now), i))
+
+    def report(self, span: _Span, data: bytes):
+
+        ts = datetime.now().strftime("%H:%M:%S.%f")[:-4]
+        BS = ll.BLOCK_SIZE
+        for k in range(0, len(data), BS):
+            old = span.data[k : k + BS]
+            new = data[k : k + BS]
+            if old == new:
+                continue
+            self.changes += 1
+            for line in describe_change(span.off + k, old, new):
+                print(f"{ts}  {line}")
+
+    def loop(self):
+
+        now = time.monotonic()
+        if self.end is not None and now >= self.end:
+            return self.stop(now)
+
+        # Keep DEPTH reads in flight, most due first
+        while self.due and self.session.pending() < DEPTH and self.due[0][0] <= now:
+            _, i = heapq.heappop(self.due)
+            span = self.spans[i]
+            self.session.read(span.off, span.size, self.on_data, cached=False)
+
+        self.session.loop()
+
+        if now >= self.next_stats:
+            self.next_stats = now + STATS_EVERY
+            hot = sum(1 for span in self.spans if now - span.changed < 2.0)
+            print(
+                "-- {:.0f} reads/s, {} hot spans, {} block changes".format(
+                    self.reads / (now - self.t0), hot, self.changes
+                )
+            )
+
+        return None
+
+    def stop(self, now: float) -> bool:
+        print(
+            "Watched {:.0f} s: {} reads, {} block changes".format(
+                now - self.t0, self.reads, self.changes
+            )
+        )
+        return False
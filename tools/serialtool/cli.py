@@ -19,13 +19,27 @@
 import argparse
 import serial
 import signal
-from time import sleep
+from time import sleep, monotonic
+from datetime import datetime
 import os
 
 import _prog as pp
 import _dump as dd
 import _restore as rr
 import _button as bb
+import _channels as ch
+import _diff as df
+import _store as st
+import _telemetry as tm
+import _regs as rg
+import _sweep as sw
+import _clone as cl
+import _index as ix
+import _profile as pf
+import _station as sn
+import _cache as mc
+import _watch as wa
+import _session as ss
 
 
 def load_image(file: str) -> bytes:
@@ -77,11 +91,22 @@ def main_dump(args, ser: serial.Serial):
 def main_restore(args, ser: serial.Serial):
 
     dump_file: str = args.file
-
-    print("Dump file: {}".format(dump_file))
-    if not os.path.exists(dump_file):
-        print("Dump file not exist")
-        return
+    dump_data = None
+
+    if args.store:
+        try:
+            store = st.BackupStore(args.store)
+            when, h, _ = store.find(dump_file)
+            dump_data = store.get(h)
+        except Exception as e:
+            print("Cannot load backup '{}': {}".format(dump_file, e))
+            return
+        print("Backup: {} of {}".format(dump_file, when))
+    else:
+        print("Dump file: {}".format(dump_file))
+        if not os.path.exists(dump_file):
+            print("Dump file not exist")
+            return
 
     if args.config:
         dump_what = dd.DUMP_CONFIG
@@ -101,7 +126,7 @@ def main_restore(args, ser: serial.Serial):
 
     signal.signal(signal.SIGINT, quit_handler)
 
-    dump = rr.EepromDump(ser, dump_what, dump_file)
+    dump = rr.EepromDump(ser, dump_what, dump_file, dump_data, args.verify)
     while (not quit_flag) and dump.loop():
         sleep(0)
 
@@ -141,6 +166,341 @@ def main_flash(args, ser: serial.Serial):
 
 
 
+def main_channels(args, ser: serial.Serial):
+
+    try:
+        if "export" == args.action:
+            chs = ch.parse_channels(args.channels)
+        else:
+            rows = ch.load_rows(args.file)
+    except Exception as e:
+        print("Cannot load channels: {}".format(e))
+        return
+
+    quit_flag = False
+
+    def quit_handler(sig, frame):
+        nonlocal quit_flag
+        quit_flag = True
+
+    signal.signal(signal.SIGINT, quit_handler)
+
+    if "export" == args.action:
+        print("Export channels to {}..".format(args.file))
+        op = ch.ChannelExport(ser, args.file, chs, args.all)
+    else:
+        print("Import {} channels from {}..".format(len(rows), args.file))
+        op = ch.ChannelImport(ser, rows, args.dry_run, not args.no_reboot)
+
+    while (not quit_flag) and op.loop():
+        sleep(0)
+
+
+def main_diff(args):
+
+    files = df.list_dumps(args.files)
+    if not files:
+        print("No dump to compare")
+        return
+
+    try:
+        ref = load_image(args.ref)
+        images = [load_image(file) for file in files]
+        for file, data in zip([args.ref] + files, [ref] + images):
+            df.image_base(file, data)
+    except Exception as e:
+        print("Cannot load dump: {}".format(e))
+        return
+
+    if 1 == len(files):
+        df.report_pair(args.ref, ref, files[0], images[0], args.verbose)
+    else:
+        df.report_fleet(args.ref, ref, files, images)
+
+
+def main_store(args):
+
+    try:
+        store = st.BackupStore(args.store)
+
+        match args.action:
+            case "add":
+                for file in args.files:
+                    when = args.time
+                    if when is None:
+                        mtime = os.path.getmtime(file)
+                        when = datetime.fromtimestamp(mtime).isoformat(timespec="seconds")
+                    h = store.add(args.uid, load_image(file), when)
+                    print("{}: {} @ {} -> {}".format(file, args.uid, when, h))
+                print("{} blocks in store".format(store.block_count()))
+
+            case "list":
+                for uid in [args.uid] if args.uid else store.uids():
+                    for when, h, size in store.history(uid):
+                        print("{}  {}  {}  {}".format(uid, when, h, size))
+
+            case "get":
+                when, h, _ = store.find(args.backup)
+                data = store.get(h)
+                with open(args.file, "wb") as fd:
+                    fd.write(data)
+                print("{} of {} saved to {}".format(args.backup, when, args.file))
+
+            case "gc":
+                before, after, removed = store.gc(args.keep)
+                print(
+                    "Blocks: {} -> {}, manifests removed: {}".format(
+                        before, after, removed
+                    )
+                )
+
+    except (OSError, st.StoreError) as e:
+        print("Store error: {}".format(e))
+
+
+def main_index(args):
+
+    try:
+        index = ix.FleetIndex(args.db)
+    except Exception as e:
+        print("Cannot open index: {}".format(e))
+        return
+
+    try:
+        match args.action:
+            case "update":
+                if args.store:
+                    added, same, dropped, skipped = index.update_store(
+                        st.BackupStore(args.store)
+                    )
+                else:
+                    added, same, dropped, skipped = index.update_files(
+                        df.list_dumps(args.files)
+                    )
+                print(
+                    "Dumps: {} added, {} unchanged, {} dropped, {} skipped".format(
+                        added, same, dropped, skipped
+                    )
+                )
+                print("{} dumps of {} radios, {} channels".format(*index.stats()))
+
+            case "query":
+                t0 = monotonic()
+                cols, rows = index.query(args.table, args.where, args.all)
+                ix.print_rows(cols, rows, args.limit)
+                print("Query took {:.1f} ms".format((monotonic() - t0) * 1000))
+
+    except (OSError, ValueError, st.StoreError) as e:
+        print("Index error: {}".format(e))
+    finally:
+        index.close()
+
+
+def main_telemetry(args, ser: serial.Serial):
+
+    if args.file:
+        print("Samples to {}".format(args.file))
+
+    quit_flag = False
+
+    def quit_handler(sig, frame):
+        nonlocal quit_flag
+        quit_flag = True
+
+    signal.signal(signal.SIGINT, quit_handler)
+
+    try:
+        op = tm.Telemetry(ser, args.file, args.ring, args.duration, args.interval)
+    except OSError as e:
+        print("Cannot open output file: {}".format(e))
+        return
+
+    try:
+        while (not quit_flag) and op.loop():
+            sleep(0)
+    finally:
+        op.close()
+
+
+def main_regs(args, ser: serial.Serial | None):
+
+    try:
+        if "snap" == args.action:
+            regs = rg.parse_regs(args.regs)
+        elif "diff" == args.action:
+            a = rg.load_snapshot(args.file_a)
+            b = rg.load_snapshot(args.file_b)
+        else:
+            loaded = rg.load_snapshot(args.file)
+            values = rg.select_regs(loaded, args.regs)
+    except Exception as e:
+        print("Cannot load registers: {}".format(e))
+        return
+
+    if "diff" == args.action:
+        rg.report_diff(args.file_a, args.file_b, rg.diff_snapshots(a, b))
+        return
+
+    quit_flag = False
+
+    def quit_handler(sig, frame):
+        nonlocal quit_flag
+        quit_flag = True
+
+    signal.signal(signal.SIGINT, quit_handler)
+
+    if "snap" == args.action:
+        print("Snapshot {} registers to {}..".format(len(regs), args.file))
+        op = rg.RegSnapshot(ser, args.file, regs)
+    else:
+        print("Write {} registers from {}..".format(len(values), args.file))
+        if len(values) < len(loaded):
+            print("{} registers left out, see --regs".format(len(loaded) - len(values)))
+        op = rg.RegWrite(ser, values, args.dry_run)
+
+    while (not quit_flag) and op.loop():
+        sleep(0)
+
+
+def main_sweep(args, ser: serial.Serial):
+
+    if sw.np is None:
+        print("NumPy is required for sweep")
+        return
+
+    start = round(args.start * 1e6)
+    stop = round(args.stop * 1e6)
+    step = round(args.step * 1e3)
+    if step <= 0 or stop < start:
+        print("Invalid sweep range")
+        return
+
+    quit_flag = False
+
+    def quit_handler(sig, frame):
+        nonlocal quit_flag
+        quit_flag = True
+
+    signal.signal(signal.SIGINT, quit_handler)
+
+    op = sw.Sweep(
+        ser, start, stop, step, args.rows, args.file, args.settle, args.plot
+    )
+    try:
+        while (not quit_flag) and op.loop():
+            sleep(0)
+    finally:
+        op.close()
+
+
+def main_clone(args, ser: serial.Serial):
+
+    targets = []
+    for port in args.target:
+        try:
+            t = serial.Serial(port, baudrate=38400, timeout=0.0001, write_timeout=None)
+        except Exception as e:
+            print("Cannot open port '{}': {}".format(port, e))
+            for _, t in targets:
+                t.close()
+            return
+        targets.append((port, t))
+
+    if args.calib:
+        print("Clone including calibration..")
+    print("Clone {} to {}..".format(args.port, ", ".join(args.target)))
+
+    quit_flag = False
+
+    def quit_handler(sig, frame):
+        nonlocal quit_flag
+        quit_flag = True
+
+    signal.signal(signal.SIGINT, quit_handler)
+
+    op = cl.Clone(ser, targets, args.calib, not args.no_reboot)
+    while (not quit_flag) and op.loop():
+        sleep(0)
+
+    for _, t in targets:
+        t.close()
+
+
+def main_watch(args, ser: serial.Serial):
+
+    try:
+        regions = wa.parse_regions(args.regions)
+    except ValueError as e:
+        print(e)
+        return
+
+    quit_flag = False
+
+    def quit_handler(sig, frame):
+        nonlocal quit_flag
+        quit_flag = True
+
+    signal.signal(signal.SIGINT, quit_handler)
+
+    op = wa.Watch(ser, regions, args.duration, args.idle)
+    while (not quit_flag) and op.loop():
+        sleep(0)
+
+    if quit_flag:
+        op.close()
+
+
+def main_station(args):
+
+    fw_image = None
+    if args.firmware:
+        try:
+            fw_image = load_image(args.firmware)
+        except Exception as e:
+            print("Cannot load firmware image '{}': {}".format(args.firmware, e))
+            return
+        print("Firmware image loaded: {}, size = {}".format(args.firmware, len(fw_image)))
+
+    config = None
+    if args.config:
+        # Config part of a config or a full dump, as restore takes it
+        try:
+            config = dd.image_part(load_image(args.config), dd.DUMP_CONFIG)
+        except Exception as e:
+            print("Cannot load config dump '{}': {}".format(args.config, e))
+            return
+        print("Config dump: {}".format(args.config))
+
+    if fw_image is None and config is None:
+        print("Nothing to do: give --firmware and/or --config")
+        return
+
+    quit_flag = False
+
+    def quit_handler(sig, frame):
+        nonlocal quit_flag
+        quit_flag = True
+
+    signal.signal(signal.SIGINT, quit_handler)
+
+    op = sn.Station(
+        fw_image,
+        args.bl_ver,
+        config,
+        args.verify,
+        args.log_dir,
+        args.match,
+        args.present,
+    )
+    print("Waiting for radios. Press Ctrl-C to quit")
+    try:
+        while (not quit_flag) and op.loop():
+            # Mostly idle for hours; do not spin a core
+            sleep(0.001)
+    finally:
+        op.close()
+
+
 def main_button(args, ser: serial.Serial):
 
     ok, msg = bb.send_button(
@@ -160,16 +520,46 @@ def main_button(args, ser: serial.Serial):
 def main():
 
     # Usage:
-    # serialtool.py --port <port> subcmd ..
+    # serialtool.py [--profile <report> [--trace-alloc]] [--cache <dir>] --port <port> subcmd ..
     # serialtool.py .. flash [--bl-ver <ver>] <file>
     # serialtool.py .. dump {--config | --calib [| --all]} file
     # serialtool.py .. restore {--config | --calib [| --all]} file
+    # serialtool.py .. channels {export [--channels <list>] | import [--dry-run]} file
+    # serialtool.py diff [-v] ref file|dir ..
+    # serialtool.py store {add --uid <uid> | list | get | gc} store ..
+    # serialtool.py index {update [--store <dir>] db [file|dir ..] | query db table where}
+    # serialtool.py .. telemetry [--duration <s>] [file]
+    # serialtool.py .. sweep --start <MHz> --stop <MHz> [--step <kHz>] [file]
+    # serialtool.py .. clone --target <port> [--target <port> ..] [--calib]
+    # serialtool.py .. watch [--regions <list>] [--duration <s>] [--idle <s>]
+    # serialtool.py station [--firmware <file>] [--config <file> [--verify]] [--match <glob>]
+    # serialtool.py regs {snap [--regs <list>] | diff a | write [--regs <list>] [--dry-run]} file
     ap = argparse.ArgumentParser(description="UV-K5 V2 serial tool")
 
     # TODO: have to add option to each of subcommands ??
     # ap.add_argument(
     #     "--port", "-p", help="serial port, eg., '/dev/ttyUSB0'", required=False
     # )
+    ap.add_argument(
+        "--profile",
+        metavar="REPORT",
+        help="profile the run and write a report file (raw data to REPORT.pstats)",
+    )
+    ap.add_argument(
+        "--trace-alloc",
+        action="store_true",
+        help="trace memory allocations into the profile report",
+    )
+    ap.add_argument(
+        "--cache",
+        metavar="DIR",
+        help="read radio memory through a local cache kept in DIR",
+    )
+    ap.add_argument(
+        "--cache-uid",
+        metavar="UID",
+        help="radio UID for the cache. Default a hash of its calibration data",
+    )
     sp = ap.add_subparsers(required=True, dest="subcommand")
 
     ap_flash = sp.add_parser("flash", help="flash firmware")
@@ -214,8 +604,231 @@ def main():
         action="store_true",
         help="restore both configuration and calibration data. This is default",
     )
+    ap_restore.add_argument(
+        "--store", help="restore from backup store; file is 'uid[@time]'"
+    )
+    ap_restore.add_argument(
+        "--verify",
+        action="store_true",
+        help="read back every written block and re-write mismatches",
+    )
     ap_restore.add_argument("file", help="input dump file")
 
+    ap_channels = sp.add_parser(
+        "channels", help="export or import memory channels as CSV/JSON"
+    )
+    sp_channels = ap_channels.add_subparsers(required=True, dest="action")
+
+    ap_export = sp_channels.add_parser("export", help="save channels to a file")
+    ap_export.add_argument(
+        "--port", "-p", help="serial port, eg., '/dev/ttyUSB0'", required=True
+    )
+    ap_export.add_argument(
+        "--channels", help="channels to export, eg. '1-50,60'. Default all"
+    )
+    ap_export.add_argument(
+        "--all", "-a", action="store_true", help="include empty channels"
+    )
+    ap_export.add_argument("file", help="output file, '.json' or '.csv'")
+
+    ap_import = sp_channels.add_parser(
+        "import", help="write channels from a file, changed blocks only"
+    )
+    ap_import.add_argument(
+        "--port", "-p", help="serial port, eg., '/dev/ttyUSB0'", required=True
+    )
+    ap_import.add_argument(
+        "--dry-run", action="store_true", help="show changed blocks, write nothing"
+    )
+    ap_import.add_argument(
+        "--no-reboot", action="store_true", help="do not reboot device after writing"
+    )
+    ap_import.add_argument("file", help="input file, '.json' or '.csv'")
+
+    ap_diff = sp.add_parser(
+        "diff", help="compare dumps block by block against a reference dump"
+    )
+    ap_diff.add_argument(
+        "--verbose", "-v", action="store_true", help="show bytes of differing blocks"
+    )
+    ap_diff.add_argument("ref", help="reference dump file")
+    ap_diff.add_argument("files", nargs="+", help="dump files or directories")
+
+    ap_store = sp.add_parser("store", help="deduplicated backup store")
+    sp_store = ap_store.add_subparsers(required=True, dest="action")
+
+    ap_add = sp_store.add_parser("add", help="add dump files to the store")
+    ap_add.add_argument("--uid", required=True, help="radio UID")
+    ap_add.add_argument("--time", help="backup time, ISO format. Default file mtime")
+    ap_add.add_argument("store", help="store directory")
+    ap_add.add_argument("files", nargs="+", help="dump files")
+
+    ap_list = sp_store.add_parser("list", help="list backups")
+    ap_list.add_argument("store", help="store directory")
+    ap_list.add_argument("uid", nargs="?", help="radio UID. Default all")
+
+    ap_get = sp_store.add_parser("get", help="rebuild a dump file from the store")
+    ap_get.add_argument("store", help="store directory")
+    ap_get.add_argument("backup", help="'uid' (latest) or 'uid@time-prefix'")
+    ap_get.add_argument("file", help="output dump file")
+
+    ap_gc = sp_store.add_parser("gc", help="drop old backups and unused blocks")
+    ap_gc.add_argument(
+        "--keep", type=int, help="keep only the latest N backups per radio"
+    )
+    ap_gc.add_argument("store", help="store directory")
+
+    ap_index = sp.add_parser("index", help="channel and settings index of a fleet")
+    sp_index = ap_index.add_subparsers(required=True, dest="action")
+
+    ap_update = sp_index.add_parser("update", help="index new and changed dumps")
+    ap_update.add_argument("--store", help="index a backup store instead of files")
+    ap_update.add_argument("db", help="index file")
+    ap_update.add_argument(
+        "files", nargs="*", help="dump files or directories; file name is the UID"
+    )
+
+    ap_query = sp_index.add_parser("query", help="query the index")
+    ap_query.add_argument(
+        "--all", action="store_true", help="all dumps, not only the latest per radio"
+    )
+    ap_query.add_argument("--limit", type=int, default=50, help="rows to print")
+    ap_query.add_argument("db", help="index file")
+    ap_query.add_argument("table", choices=ix.TABLES)
+    ap_query.add_argument(
+        "where",
+        nargs="?",
+        help="SQL condition, eg., \"channel = 37 AND offset = 600000\" or \"aes_key_set\"",
+    )
+
+    ap_telemetry = sp.add_parser(
+        "telemetry", help="sample RSSI, noise, glitch and battery"
+    )
+    ap_telemetry.add_argument(
+        "--port", "-p", help="serial port, eg., '/dev/ttyUSB0'", required=True
+    )
+    ap_telemetry.add_argument(
+        "--duration", type=float, help="seconds to sample. Default until Ctrl-C"
+    )
+    ap_telemetry.add_argument(
+        "--interval", type=float, default=1.0, help="summary interval in seconds"
+    )
+    ap_telemetry.add_argument(
+        "--ring", type=int, default=65536, help="samples kept in memory"
+    )
+    ap_telemetry.add_argument(
+        "file", nargs="?", help="output file, '.csv' or binary. Default none"
+    )
+
+    ap_regs = sp.add_parser("regs", help="BK4819 register snapshot, diff and write")
+    sp_regs = ap_regs.add_subparsers(required=True, dest="action")
+
+    ap_snap = sp_regs.add_parser("snap", help="save registers to a file")
+    ap_snap.add_argument(
+        "--port", "-p", help="serial port, eg., '/dev/ttyUSB0'", required=True
+    )
+    ap_snap.add_argument(
+        "--regs", help="registers to read (hex), eg. '0-3f,67'. Default all"
+    )
+    ap_snap.add_argument("file", help="output snapshot file")
+
+    ap_rdiff = sp_regs.add_parser("diff", help="compare two snapshots")
+    ap_rdiff.add_argument("file_a", help="snapshot file")
+    ap_rdiff.add_argument("file_b", help="snapshot file")
+
+    ap_rwrite = sp_regs.add_parser(
+        "write", help="write changed registers from a snapshot, verified"
+    )
+    ap_rwrite.add_argument(
+        "--port", "-p", help="serial port, eg., '/dev/ttyUSB0'", required=True
+    )
+    ap_rwrite.add_argument(
+        "--regs",
+        help="registers to write (hex), eg. '30-3f'. Default all but status registers",
+    )
+    ap_rwrite.add_argument(
+        "--dry-run", action="store_true", help="show changed registers, write nothing"
+    )
+    ap_rwrite.add_argument("file", help="input snapshot file")
+
+    ap_sweep = sp.add_parser("sweep", help="spectrum sweep to a waterfall file")
+    ap_sweep.add_argument(
+        "--port", "-p", help="serial port, eg., '/dev/ttyUSB0'", required=True
+    )
+    ap_sweep.add_argument("--start", type=float, required=True, help="start, MHz")
+    ap_sweep.add_argument("--stop", type=float, required=True, help="stop, MHz")
+    ap_sweep.add_argument("--step", type=float, default=12.5, help="step, kHz")
+    ap_sweep.add_argument(
+        "--rows", type=int, help="sweeps to run. Default until Ctrl-C"
+    )
+    ap_sweep.add_argument(
+        "--settle", type=int, default=1, help="extra RSSI polls per step"
+    )
+    ap_sweep.add_argument("--plot", action="store_true", help="live waterfall plot")
+    ap_sweep.add_argument("file", nargs="?", help="output file, '.npz'")
+
+    ap_watch = sp.add_parser("watch", help="print memory changes as they happen")
+    ap_watch.add_argument(
+        "--port", "-p", help="serial port, eg., '/dev/ttyUSB0'", required=True
+    )
+    ap_watch.add_argument(
+        "--regions",
+        help="region names or hex ranges, eg. 'settings,vfo,0000-0100'. Default settings,vfo",
+    )
+    ap_watch.add_argument(
+        "--duration", type=float, help="seconds to watch. Default until Ctrl-C"
+    )
+    ap_watch.add_argument(
+        "--idle",
+        type=float,
+        default=1.0,
+        help="poll interval of spans that do not change, seconds",
+    )
+
+    ap_station = sp.add_parser(
+        "station", help="flash and restore radios as they are plugged in"
+    )
+    ap_station.add_argument("--firmware", help="firmware image for units in bootloader")
+    ap_station.add_argument(
+        "--bl-ver",
+        help="bootloader version, eg. '1.01'. Max 4 characters. Default '?'",
+        default="?",
+    )
+    ap_station.add_argument("--config", help="config or full dump to restore, calibration excepted")
+    ap_station.add_argument(
+        "--verify", action="store_true", help="read back the restored configuration"
+    )
+    ap_station.add_argument(
+        "--log-dir", default="station-logs", help="unit logs and results.log"
+    )
+    ap_station.add_argument(
+        "--match", default="*", help="ports to watch, eg. '/dev/ttyUSB*'. Default all"
+    )
+    ap_station.add_argument(
+        "--present",
+        action="store_true",
+        help="also take ports already present at start",
+    )
+
+    ap_clone = sp.add_parser(
+        "clone", help="copy a radio's configuration to other radios"
+    )
+    ap_clone.add_argument(
+        "--port", "-p", help="source serial port, eg., '/dev/ttyUSB0'", required=True
+    )
+    ap_clone.add_argument(
+        "--target",
+        "-t",
+        action="append",
+        required=True,
+        help="target serial port. Repeat for more targets",
+    )
+    ap_clone.add_argument(
+        "--calib", action="store_true", help="include calibration data"
+    )
+    ap_clone.add_argument(
+        "--no-reboot", action="store_true", help="do not reboot targets after writing"
+    )
 
     ap_button = sp.add_parser("button", help="send remote button event")
     ap_button.add_argument(
@@ -227,12 +840,57 @@ def main():
     ap_button.add_argument("--timeout", type=float, default=0.4, help="ack timeout in seconds")
 
     args = ap.parse_args()
-    port: str = args.port
-    sub_name: str = args.subcommand
+    if args.trace_alloc and not args.profile:
+        ap.error("--trace-alloc needs --profile")
 
     print(ap.description)
     # print("Press Ctrl-C to quit")
 
+    if args.cache:
+        ss.cache = mc.MemCache(args.cache, args.cache_uid)
+
+    if not args.profile:
+        run(args)
+    else:
+        prof = pf.Profile(args.profile, args.trace_alloc)
+        prof.start()
+        try:
+            run(args)
+        finally:
+            prof.stop()
+            try:
+                prof.write()
+            except OSError as e:
+                print("Cannot write profile report: {}".format(e))
+
+    if ss.cache is not None:
+        print(ss.cache.report())
+
+
+def run(args):
+
+    sub_name: str = args.subcommand
+
+    # Offline subcommands
+    match sub_name:
+        case "diff":
+            main_diff(args)
+            return
+        case "store":
+            main_store(args)
+            return
+        case "index":
+            main_index(args)
+            return
+        case "station":
+            main_station(args)
+            return
+        case "regs" if "diff" == args.action:
+            main_regs(args, None)
+            return
+
+    port: str = args.port
+
     try:
         ser = serial.Serial(port, baudrate=38400, timeout=0.0001, write_timeout=None)
     except Exception as e:
@@ -246,6 +904,18 @@ def main():
             main_dump(args, ser)
         case "restore":
             main_restore(args, ser)
+        case "channels":
+            main_channels(args, ser)
+        case "telemetry":
+            main_telemetry(args, ser)
+        case "regs":
+            main_regs(args, ser)
+        case "sweep":
+            main_sweep(args, ser)
+        case "clone":
+            main_clone(args, ser)
+        case "watch":
+            main_watch(args, ser)
         case "button":
             main_button(args, ser)
 
@@ -24,6 +24,9 @@ MSG_PROG_FW_RESP = 0x051A
 MSG_PROG_f80 = 0x0516
 MSG_PROG_f80_RESP = 0x0517
 
+# Longest message either side sends (0x0519: 4 + 268)
+MAX_MSG_LEN = 512
+
 # _MSG_LOG = 0x4C4C  # 'L' 'L'
 # _MSG_LOG_OBFUSCATED = 0x205A
 
@@ -84,8 +87,16 @@ def fetch(buf: bytearray) -> Msg | None:
         return None
 
     msg_len = _get_hw_LE(buf, pack_begin + 2)
+    if msg_len > MAX_MSG_LEN:
+        del buf[: pack_begin + 2]
+        return None
+
     pack_end = pack_begin + 6 + msg_len
 
+    # Rest of the packet still on its way
+    if len(buf) < pack_end + 2:
+        return None
+
     if not buf.startswith(b"\xdc\xba", pack_end):
         # We've got wrong beginning
         del buf[: pack_begin + 2]